@@ -0,0 +1,36 @@
+"""
+Бэкенды кэша Django, учитывающие попадания и промахи в замерах
+текущего запроса (config.timing).
+"""
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+from config.timing import record_cache_lookup
+
+MISSING = object()
+
+
+class CacheLookupMixin:
+    def get(self, key, default=None, version=None):
+        value = super().get(key, MISSING, version)
+        if value is MISSING:
+            record_cache_lookup(0, 1)
+            return default
+        record_cache_lookup(1, 0)
+        return value
+
+
+class InstrumentedLocMemCache(CacheLookupMixin, LocMemCache):
+    """
+    LocMemCache с учётом обращений. get_many базового класса
+    вызывает get для каждого ключа, поэтому отдельно не учитывается.
+    """
+
+
+class InstrumentedRedisCache(CacheLookupMixin, RedisCache):
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = super().get_many(keys, version)
+        record_cache_lookup(len(values), len(keys) - len(values))
+        return values
@@ -1,8 +1,21 @@
 from __future__ import absolute_import, unicode_literals
 
 import os
+import time
 
 from celery import Celery
+from celery.signals import (
+    before_task_publish,
+    task_failure,
+    task_postrun,
+    task_prerun,
+    task_retry,
+    worker_init,
+)
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.dateparse import parse_datetime
+from kombu.exceptions import ChannelError
 
 # настройки Django для Celery
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
@@ -17,6 +30,119 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
 
+@task_prerun.connect
+@task_postrun.connect
+def close_old_db_connections(task=None, **kwargs):
+    """
+    Закрывает соединения с БД, которые устарели (CONN_MAX_AGE) или сломаны,
+    как Django делает в начале и в конце каждого HTTP-запроса.
+    Рабочие соединения переиспользуются следующей задачей.
+    """
+    if task is not None and getattr(task.request, "is_eager", False):
+        return
+    close_old_connections()
+
+
+def get_metrics():
+    """
+    Метрики Prometheus (config.metrics) или None, если они отключены.
+    """
+    if not settings.METRICS_ENABLED:
+        return None
+    from config import metrics
+
+    return metrics
+
+
+# Время начала выполняемых задач по task_id (для расчёта длительности)
+_task_started = {}
+
+
+@worker_init.connect
+def clear_metrics_files(**kwargs):
+    metrics = get_metrics()
+    if metrics is not None:
+        metrics.clear_process_files()
+
+
+@before_task_publish.connect
+def add_enqueued_at(headers=None, **kwargs):
+    """
+    Отмечает время постановки задачи в очередь (в том числе при повторе).
+    Заголовок сообщения доступен в задаче как task.request.enqueued_at.
+    """
+    if headers is not None:
+        headers["enqueued_at"] = time.time()
+
+
+def queue_wait(request, started_at):
+    """
+    Время ожидания задачи в очереди. Для отложенных задач (countdown, eta)
+    отсчитывается от запланированного времени запуска.
+    """
+    enqueued_at = request.get("enqueued_at")
+    if enqueued_at is None:
+        return None
+    eta = parse_datetime(request.eta) if isinstance(request.eta, str) else request.eta
+    if eta is not None:
+        enqueued_at = max(enqueued_at, eta.timestamp())
+    return max(started_at - enqueued_at, 0.0)
+
+
+@task_prerun.connect
+def record_task_started(task_id=None, task=None, **kwargs):
+    metrics = get_metrics()
+    if metrics is None:
+        return
+    _task_started[task_id] = time.perf_counter()
+    wait = queue_wait(task.request, time.time())
+    if wait is not None:
+        metrics.CELERY_TASK_QUEUE_WAIT.labels(task.name).observe(wait)
+
+
+@task_postrun.connect
+def record_task_finished(task_id=None, task=None, state=None, **kwargs):
+    metrics = get_metrics()
+    started = _task_started.pop(task_id, None)
+    if metrics is None or started is None:
+        return
+    metrics.CELERY_TASK_RUNTIME.labels(task.name).observe(time.perf_counter() - started)
+    metrics.CELERY_TASKS.labels(task.name, state or "UNKNOWN").inc()
+
+
+@task_retry.connect
+def record_task_retry(sender=None, **kwargs):
+    metrics = get_metrics()
+    if metrics is not None:
+        metrics.CELERY_TASK_RETRIES.labels(sender.name).inc()
+
+
+@task_failure.connect
+def record_task_failure(sender=None, **kwargs):
+    metrics = get_metrics()
+    if metrics is not None:
+        metrics.CELERY_TASK_FAILURES.labels(sender.name).inc()
+
+
+@app.task(ignore_result=True)
+def sample_queue_lengths():
+    """
+    Периодическая задача (beat): количество сообщений в очередях брокера.
+    """
+    metrics = get_metrics()
+    if metrics is None:
+        return
+    with app.connection_for_read() as connection:
+        channel = connection.default_channel
+        for queue in settings.QUEUE_LENGTH_QUEUES:
+            try:
+                _, length, _ = channel.queue_declare(queue=queue, passive=True)
+            except ChannelError:
+                # Очередь ещё не создана (в Redis - пустой список)
+                length = 0
+            metrics.CELERY_QUEUE_LENGTH.labels(queue).set(length)
+
+
 @app.task(bind=True)
 def debug_task(self):
     print(f"Request: {self.request!r}")
@@ -0,0 +1,85 @@
+"""
+Операции миграций, зависящие от СУБД.
+
+В продакшене используется PostgreSQL, а тесты по умолчанию выполняются
+на SQLite, поэтому специфичные для PostgreSQL операции должны
+корректно деградировать на других СУБД.
+"""
+
+from django.contrib.postgres.indexes import PostgresIndex
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db.migrations.operations import AddIndex, CreateModel
+
+
+class AddIndexConcurrentlyIfPostgres(AddIndexConcurrently):
+    """
+    Создаёт индекс через CREATE INDEX CONCURRENTLY на PostgreSQL
+    (без блокировки записи в таблицу) и обычным CREATE INDEX на других СУБД.
+    Индексы, специфичные для PostgreSQL (GIN, GiST и т.п.), на других СУБД
+    не создаются.
+
+    Миграция с этой операцией должна быть объявлена с atomic = False.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        elif not isinstance(self.index, PostgresIndex):
+            AddIndex.database_forwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        elif not isinstance(self.index, PostgresIndex):
+            AddIndex.database_backwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+
+class CreateRangePartitionedModelIfPostgres(CreateModel):
+    """
+    Создаёт таблицу модели, секционированную по диапазону значений колонки
+    partition_key (PARTITION BY RANGE), на PostgreSQL и обычную таблицу
+    на других СУБД.
+
+    PostgreSQL требует, чтобы первичный ключ секционированной таблицы
+    включал ключ секционирования, поэтому первичный ключ в БД -
+    (pk, partition_key). Секции создаются отдельно.
+    """
+
+    def __init__(self, name, fields, partition_key, **kwargs):
+        self.partition_key = partition_key
+        super().__init__(name, fields, **kwargs)
+
+    def deconstruct(self):
+        name, args, kwargs = super().deconstruct()
+        kwargs["partition_key"] = self.partition_key
+        return name, args, kwargs
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.name)
+        if schema_editor.connection.vendor != "postgresql" or not (
+            self.allow_migrate_model(schema_editor.connection.alias, model)
+        ):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+            return
+
+        pk = model._meta.pk
+        key = model._meta.get_field(self.partition_key)
+        quote = schema_editor.quote_name
+        # Колонка первичного ключа создаётся без PRIMARY KEY, ограничение составное
+        pk.primary_key = False
+        try:
+            sql, params = schema_editor.table_sql(model)
+        finally:
+            pk.primary_key = True
+        schema_editor.execute(
+            f"{sql[:-1]}, PRIMARY KEY ({quote(pk.column)}, {quote(key.column)})) "
+            f"PARTITION BY RANGE ({quote(key.column)})",
+            params or None,
+        )
+        # Индексы секционированной таблицы наследуются всеми секциями
+        for index in model._meta.indexes:
+            schema_editor.add_index(model, index)
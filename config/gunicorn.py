@@ -0,0 +1,88 @@
+"""
+Конфигурация gunicorn для продакшена:
+gunicorn -c config/gunicorn.py
+
+Все параметры можно переопределить переменными окружения GUNICORN_*.
+"""
+
+import multiprocessing
+import os
+
+
+def env_int(name, default):
+    return int(os.getenv(name) or default)
+
+
+# WSGI (по умолчанию) или ASGI: GUNICORN_APP=config.asgi:application
+# и GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker
+wsgi_app = os.getenv("GUNICORN_APP") or "config.wsgi:application"
+worker_class = os.getenv("GUNICORN_WORKER_CLASS") or "gthread"
+bind = os.getenv("GUNICORN_BIND") or "0.0.0.0:8000"
+
+# Процессы по числу CPU (2 * CPU + 1, но не больше 4), потоки - для ожидания
+# БД и Redis. В контейнере cpu_count() видит все CPU хоста, поэтому на больших
+# хостах количество воркеров задаётся явно
+workers = env_int("GUNICORN_WORKERS", min(multiprocessing.cpu_count() * 2 + 1, 4))
+threads = env_int("GUNICORN_THREADS", 4)
+
+# Каждый поток держит своё постоянное соединение с PostgreSQL (CONN_MAX_AGE),
+# поэтому контейнер открывает до workers * threads соединений. Вместе с
+# Celery-воркерами и другими репликами они должны помещаться в max_connections
+# PostgreSQL (по умолчанию 100)
+max_db_connections = env_int("GUNICORN_MAX_DB_CONNECTIONS", 40)
+if workers * threads > max_db_connections:
+    raise RuntimeError(
+        f"GUNICORN_WORKERS * GUNICORN_THREADS = {workers * threads} превышает "
+        f"GUNICORN_MAX_DB_CONNECTIONS = {max_db_connections}: уменьшите количество "
+        f"воркеров или потоков либо увеличьте лимит с учётом max_connections PostgreSQL"
+    )
+
+# Код Django импортируется один раз в мастер-процессе и разделяется
+# воркерами через copy-on-write
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") == "True"
+
+# Перезапуск воркеров после N запросов (защита от утечек памяти);
+# jitter разносит перезапуски воркеров во времени
+max_requests = env_int("GUNICORN_MAX_REQUESTS", 1000)
+max_requests_jitter = env_int("GUNICORN_MAX_REQUESTS_JITTER", 100)
+
+timeout = env_int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = env_int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+# Соединения от nginx держатся открытыми между запросами
+keepalive = env_int("GUNICORN_KEEPALIVE", 5)
+
+# Heartbeat воркеров в памяти, а не на диске контейнера
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL") or "info"
+
+
+def on_starting(server):
+    """
+    Метрики воркеров хранятся в PROMETHEUS_MULTIPROC_DIR (config.metrics);
+    файлы завершившихся процессов этого хоста удаляются.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from config.metrics import clear_process_files
+
+        clear_process_files()
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from config.metrics import mark_process_dead
+
+        mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    """
+    Соединения, открытые мастер-процессом при preload, не должны
+    использоваться несколькими воркерами одновременно.
+    """
+    from django.db import connections
+
+    for connection in connections.all(initialized_only=True):
+        connection.close()
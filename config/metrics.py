@@ -0,0 +1,211 @@
+"""
+Метрики приложения в формате Prometheus (необязательная зависимость
+prometheus_client, см. METRICS_ENABLED).
+
+Под gunicorn каждый воркер - отдельный процесс, поэтому при заданной
+переменной окружения PROMETHEUS_MULTIPROC_DIR значения хранятся в файлах
+этого каталога (режим multiprocess prometheus_client), а /metrics суммирует
+их по всем процессам. Без неё используется реестр текущего процесса
+(разработка, тесты).
+"""
+
+import glob
+import os
+import socket
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    values,
+)
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+
+def host_identifier():
+    # "_" - разделитель частей имени файла метрик
+    return socket.gethostname().replace("_", "-")
+
+
+def process_identifier(pid=None):
+    """
+    Идентификатор процесса в именах файлов метрик. Включает имя хоста:
+    PID в разных контейнерах с общим каталогом метрик совпадают.
+    """
+    return f"{host_identifier()}-{pid or os.getpid()}"
+
+
+if MULTIPROC_DIR:
+    values.ValueClass = values.MultiProcessValue(process_identifier)
+
+# Границы гистограмм длительности (секунды)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "Количество запросов",
+    ["view", "method", "status"],
+)
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Общее время обработки запроса",
+    ["view", "method"],
+    buckets=DURATION_BUCKETS,
+)
+DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Время запросов к БД за запрос",
+    ["view"],
+    buckets=DURATION_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Количество запросов к БД за запрос",
+    ["view"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+VIEW_DURATION = Histogram(
+    "http_request_view_duration_seconds",
+    "Время кода представления и сериализаторов без запросов к БД",
+    ["view"],
+    buckets=DURATION_BUCKETS,
+)
+RENDER_DURATION = Histogram(
+    "http_request_render_duration_seconds",
+    "Время рендеринга ответа",
+    ["view"],
+    buckets=DURATION_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    "http_request_cache_lookups_total",
+    "Обращения к кэшу при обработке запросов",
+    ["view", "result"],
+)
+
+# Задачи Celery (сигналы в config/celery.py). Границы ожидания в очереди
+# включают 60 секунд - порог задержки напоминаний
+TASK_WAIT_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+CELERY_TASK_QUEUE_WAIT = Histogram(
+    "celery_task_queue_wait_seconds",
+    "Время от постановки задачи в очередь до начала выполнения",
+    ["task"],
+    buckets=TASK_WAIT_BUCKETS,
+)
+CELERY_TASK_RUNTIME = Histogram(
+    "celery_task_runtime_seconds",
+    "Время выполнения задачи",
+    ["task"],
+    buckets=DURATION_BUCKETS + (30, 60, 300),
+)
+CELERY_TASKS = Counter(
+    "celery_tasks_total",
+    "Завершённые выполнения задач по состоянию (SUCCESS, RETRY, FAILURE)",
+    ["task", "state"],
+)
+CELERY_TASK_RETRIES = Counter(
+    "celery_task_retries_total",
+    "Повторы задач",
+    ["task"],
+)
+CELERY_TASK_FAILURES = Counter(
+    "celery_task_failures_total",
+    "Задачи, завершившиеся ошибкой",
+    ["task"],
+)
+CELERY_QUEUE_LENGTH = Gauge(
+    "celery_queue_length",
+    "Количество сообщений в очереди брокера (последний замер)",
+    ["queue"],
+    multiprocess_mode="mostrecent",
+)
+
+
+def view_label(request):
+    """
+    Имя маршрута вместо пути: пути с id дали бы неограниченное число рядов.
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return match.view_name
+
+
+def observe_request(request, response, timings):
+    view = view_label(request)
+    REQUESTS.labels(view, request.method, response.status_code).inc()
+    REQUEST_DURATION.labels(view, request.method).observe(timings.total)
+    DB_DURATION.labels(view).observe(timings.db_time)
+    DB_QUERIES.labels(view).observe(timings.db_queries)
+    VIEW_DURATION.labels(view).observe(timings.view)
+    RENDER_DURATION.labels(view).observe(timings.render)
+    if timings.cache_hits:
+        CACHE_LOOKUPS.labels(view, "hit").inc(timings.cache_hits)
+    if timings.cache_misses:
+        CACHE_LOOKUPS.labels(view, "miss").inc(timings.cache_misses)
+
+
+def get_registry():
+    if not MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """
+    Метрики всех процессов в текстовом формате Prometheus.
+    При заданном METRICS_TOKEN требуется заголовок Authorization: Bearer <токен>.
+    """
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(
+        generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST
+    )
+
+
+def mark_process_dead(pid):
+    """
+    Вызывается при завершении процесса (gunicorn child_exit):
+    удаляет его значения gauge с режимом live*.
+    """
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(process_identifier(pid), MULTIPROC_DIR)
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def clear_process_files():
+    """
+    Удаляет файлы метрик завершившихся процессов этого хоста, оставшиеся
+    от прошлого запуска (при старте gunicorn и воркера Celery).
+    """
+    if not MULTIPROC_DIR:
+        return
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+    prefix = f"{host_identifier()}-"
+    for path in glob.glob(os.path.join(MULTIPROC_DIR, f"*_{prefix}*.db")):
+        pid = os.path.basename(path)[:-3].rsplit(prefix, 1)[-1]
+        if pid.isdigit() and not is_alive(int(pid)):
+            os.remove(path)
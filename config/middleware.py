@@ -0,0 +1,168 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.handlers.exception import convert_exception_to_response
+from django.db import DatabaseError, connections
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+
+from config.timing import RequestTimings, current_timings, record_query
+
+
+class HealthCheckMiddleware:
+    """
+    Отвечает на /healthz и /readyz до остальных middleware:
+    без сессий и проверки ALLOWED_HOSTS (healthcheck контейнера
+    обращается к localhost).
+
+    - /healthz - процесс жив и обрабатывает запросы (без обращения к БД);
+    - /readyz - доступны БД (SELECT 1) и кэш, приложение готово принимать трафик.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path == "/healthz":
+            return JsonResponse({"status": "ok"})
+        if request.path == "/readyz":
+            unavailable = self.check_dependencies()
+            if unavailable:
+                return JsonResponse(
+                    {"status": "unavailable", "unavailable": unavailable}, status=503
+                )
+            return JsonResponse({"status": "ready"})
+        return self.get_response(request)
+
+    def check_dependencies(self):
+        """
+        Возвращает список недоступных зависимостей (пустой, если всё доступно).
+        """
+        unavailable = []
+        try:
+            with connections["default"].cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except DatabaseError:
+            unavailable.append("database")
+        try:
+            caches["default"].get("readyz")
+        except Exception:
+            unavailable.append("cache")
+        return unavailable
+
+
+class FullStackMiddleware:
+    """
+    Профиль middleware "api": цепочка из settings.FULL_STACK_MIDDLEWARE
+    (сессии, CSRF, аутентификация Django, сообщения, clickjacking)
+    выполняется только для путей вне API_PATH_PREFIXES - админки и страниц
+    документации. JWT-эндпоинты /habits/ и /users/ проходят мимо неё.
+
+    Вложенные middleware подключаются так же, как это делает Django
+    в BaseHandler.load_middleware, включая process_view,
+    process_template_response и process_exception.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.api_prefixes = tuple(settings.API_PATH_PREFIXES)
+        self.view_hooks = []
+        self.template_response_hooks = []
+        self.exception_hooks = []
+
+        handler = convert_exception_to_response(get_response)
+        for path in reversed(settings.FULL_STACK_MIDDLEWARE):
+            middleware = import_string(path)(handler)
+            if hasattr(middleware, "process_view"):
+                self.view_hooks.insert(0, middleware.process_view)
+            if hasattr(middleware, "process_template_response"):
+                self.template_response_hooks.append(
+                    middleware.process_template_response
+                )
+            if hasattr(middleware, "process_exception"):
+                self.exception_hooks.append(middleware.process_exception)
+            handler = convert_exception_to_response(middleware)
+        self.full_stack = handler
+
+    def is_api(self, request):
+        return request.path_info.startswith(self.api_prefixes)
+
+    def __call__(self, request):
+        if self.is_api(request):
+            return self.get_response(request)
+        return self.full_stack(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.is_api(request):
+            return None
+        for hook in self.view_hooks:
+            response = hook(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        if not self.is_api(request):
+            for hook in self.template_response_hooks:
+                response = hook(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        if self.is_api(request):
+            return None
+        for hook in self.exception_hooks:
+            response = hook(request, exception)
+            if response is not None:
+                return response
+        return None
+
+
+class RequestMetricsMiddleware:
+    """
+    Замеряет обработку запроса (config.timing): общее время, количество
+    и время запросов к БД, попадания и промахи кэша, время представления
+    и рендеринга ответа.
+
+    Замеры попадают в гистограммы по представлениям (config.metrics, /metrics)
+    при METRICS_ENABLED и в заголовок Server-Timing при SERVER_TIMING_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.observe = None
+        if settings.METRICS_ENABLED:
+            from config.metrics import observe_request
+
+            self.observe = observe_request
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(record_query))
+                response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        timings.finish()
+
+        if self.observe is not None:
+            self.observe(request, response, timings)
+        if settings.SERVER_TIMING_ENABLED:
+            response["Server-Timing"] = timings.server_timing()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = current_timings.get()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Вызывается после представления, перед response.render()
+        timings = current_timings.get()
+        if timings is not None:
+            timings.render_started = time.perf_counter()
+        return response
@@ -0,0 +1,172 @@
+"""
+Схема OpenAPI как готовый артефакт.
+
+Генерация схемы drf_spectacular (обход всех представлений и хук camelize)
+выполняется один раз: командой build_schema при сборке/запуске контейнера
+либо при первом запросе в процессе, если файлов в OPENAPI_SCHEMA_DIR нет.
+Схема отдаётся уже сжатой (gzip) со строгим ETag по хэшу содержимого.
+Swagger и Redoc загружают её по адресу с хэшем, который кэшируется
+клиентом на год. В DEBUG схема генерируется заново на каждый запрос.
+"""
+
+import gzip
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotAllowed, HttpResponseRedirect
+from django.urls import reverse
+from django.utils.http import parse_etags
+from drf_spectacular.generators import SchemaGenerator
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.views import SpectacularRedocView, SpectacularSwaggerView
+
+FORMATS = {
+    "yaml": "application/vnd.oai.openapi; charset=utf-8",
+    "json": "application/vnd.oai.openapi+json",
+}
+
+# Адрес с хэшем неизменен, адрес без хэша перепроверяется по ETag
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class SchemaArtifact:
+    """
+    Схема в форматах YAML и JSON, исходная и сжатая gzip.
+    """
+
+    def __init__(self, documents, compressed=None):
+        self.documents = documents
+        # mtime=0: одинаковая схема даёт одинаковые байты и ETag
+        self.compressed = compressed or {
+            fmt: gzip.compress(data, compresslevel=9, mtime=0)
+            for fmt, data in documents.items()
+        }
+        self.digest = hashlib.sha256(documents["json"]).hexdigest()[:16]
+
+    def etag(self, fmt, compressed):
+        # Строгий ETag у каждого представления (формат и сжатие) свой
+        return f'"{self.digest}-{fmt}{"-gzip" if compressed else ""}"'
+
+    def content(self, fmt, compressed):
+        return (self.compressed if compressed else self.documents)[fmt]
+
+    def write(self, directory):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for fmt, data in self.documents.items():
+            (directory / f"schema.{fmt}").write_bytes(data)
+            (directory / f"schema.{fmt}.gz").write_bytes(self.compressed[fmt])
+
+    @classmethod
+    def read(cls, directory):
+        """
+        Загружает собранную схему вместе со сжатыми копиями .gz
+        или возвращает None, если файлов нет.
+        """
+        directory = Path(directory)
+        try:
+            documents = {
+                fmt: (directory / f"schema.{fmt}").read_bytes() for fmt in FORMATS
+            }
+            compressed = {
+                fmt: (directory / f"schema.{fmt}.gz").read_bytes() for fmt in FORMATS
+            }
+        except FileNotFoundError:
+            return None
+        return cls(documents, compressed)
+
+
+def generate_schema():
+    """
+    Генерирует схему так же, как SpectacularAPIView (без привязки к запросу).
+    """
+    generator = SchemaGenerator()
+    schema = generator.get_schema(
+        request=None, public=spectacular_settings.SERVE_PUBLIC
+    )
+    return SchemaArtifact(
+        {
+            "yaml": OpenApiYamlRenderer().render(schema),
+            "json": OpenApiJsonRenderer().render(schema, renderer_context={}),
+        }
+    )
+
+
+@lru_cache
+def load_schema():
+    return SchemaArtifact.read(settings.OPENAPI_SCHEMA_DIR) or generate_schema()
+
+
+def get_schema():
+    if settings.DEBUG:
+        return generate_schema()
+    return load_schema()
+
+
+def negotiate_format(request):
+    fmt = request.GET.get("format")
+    if fmt in FORMATS:
+        return fmt
+    return "json" if "json" in request.headers.get("Accept", "") else "yaml"
+
+
+def schema_view(request, digest=None):
+    """
+    Схема OpenAPI. Формат выбирается параметром format или заголовком Accept
+    (по умолчанию YAML, как у SpectacularAPIView).
+    """
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET", "HEAD"])
+
+    schema = get_schema()
+    if digest is not None and digest != schema.digest:
+        # Страница документации ссылается на схему предыдущей версии
+        return HttpResponseRedirect(schema_url(schema))
+
+    fmt = negotiate_format(request)
+    compressed = "gzip" in request.headers.get("Accept-Encoding", "")
+    etag = schema.etag(fmt, compressed)
+
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(
+            schema.content(fmt, compressed), content_type=FORMATS[fmt]
+        )
+        response["Content-Disposition"] = f'inline; filename="schema.{fmt}"'
+        if compressed:
+            response["Content-Encoding"] = "gzip"
+
+    response["ETag"] = etag
+    response["Vary"] = "Accept, Accept-Encoding"
+    if settings.DEBUG:
+        response["Cache-Control"] = "no-cache"
+    elif digest is not None:
+        response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response["Cache-Control"] = f"public, max-age={settings.OPENAPI_SCHEMA_MAX_AGE}"
+    return response
+
+
+def schema_url(schema):
+    return reverse("schema-versioned", args=[schema.digest])
+
+
+class SchemaUrlMixin:
+    """
+    Swagger и Redoc загружают схему по адресу с хэшем.
+    """
+
+    def _get_schema_url(self, request):
+        return schema_url(get_schema())
+
+
+class SwaggerView(SchemaUrlMixin, SpectacularSwaggerView):
+    pass
+
+
+class RedocView(SchemaUrlMixin, SpectacularRedocView):
+    pass
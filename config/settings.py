@@ -1,8 +1,11 @@
+import importlib.util
 import os
 import sys
 from datetime import timedelta
 from pathlib import Path
 
+import django
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -32,7 +35,6 @@ INSTALLED_APPS = [
     "rest_framework",
     "django_filters",
     "rest_framework_simplejwt",
-    "drf_yasg",
     "corsheaders",
     "users",
     "django_extensions",
@@ -40,11 +42,19 @@ INSTALLED_APPS = [
     "habits",
 ]
 
+# Основная документация API - drf_spectacular (/swagger/, /redoc/).
+# Альтернативная схема drf_yasg подключается только при ENABLE_DRF_YASG=True
+# и установленном пакете (/yasg/swagger/, /yasg/redoc/)
+ENABLE_DRF_YASG = (
+    os.getenv("ENABLE_DRF_YASG") == "True" and
+    importlib.util.find_spec("drf_yasg") is not None
+)
+if ENABLE_DRF_YASG:
+    INSTALLED_APPS.append("drf_yasg")
+
 REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": ("django_filters.rest_framework.DjangoFilterBackend",),
-    "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    ),
+    "DEFAULT_AUTHENTICATION_CLASSES": ("users.authentication.CachedJWTAuthentication",),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.AllowAny",),
     # "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_RENDERER_CLASSES": (
@@ -55,6 +65,8 @@ REST_FRAMEWORK = {
         "djangorestframework_camel_case.parser.CamelCaseJSONParser",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # Количество прокси перед приложением (nginx) для определения IP клиента
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES") or 1),
 }
 
 SPECTACULAR_SETTINGS = {
@@ -64,17 +76,62 @@ SPECTACULAR_SETTINGS = {
     ],
 }
 
-MIDDLEWARE = [
-    "django.middleware.security.SecurityMiddleware",
+# Собранная схема OpenAPI (python manage.py build_schema, config/schema.py)
+OPENAPI_SCHEMA_DIR = Path(os.getenv("OPENAPI_SCHEMA_DIR") or BASE_DIR / "openapi")
+# Время кэширования /api/schema/ без хэша в адресе (секунды)
+OPENAPI_SCHEMA_MAX_AGE = int(os.getenv("OPENAPI_SCHEMA_MAX_AGE") or 3600)
+
+# Middleware, нужные админке и HTML-страницам (сессии, CSRF, сообщения)
+FULL_STACK_MIDDLEWARE = [
     "django.contrib.sessions.middleware.SessionMiddleware",
-    "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "corsheaders.middleware.CorsMiddleware",
 ]
 
+# Пути JSON API с JWT-аутентификацией: в профиле "api" обходят FULL_STACK_MIDDLEWARE
+API_PATH_PREFIXES = ["/habits/", "/users/", "/async/"]
+
+# Профиль middleware: "api" - минимальная цепочка для API, полный стек
+# только для остальных путей (/admin/, документация); "full" - полный стек везде
+MIDDLEWARE_PROFILE = os.getenv("MIDDLEWARE_PROFILE") or "api"
+
+# CorsMiddleware стоит первым: preflight-запросы (OPTIONS) отвечаются
+# до остальных middleware
+if MIDDLEWARE_PROFILE == "full":
+    MIDDLEWARE = [
+        "config.middleware.HealthCheckMiddleware",
+        "corsheaders.middleware.CorsMiddleware",
+        "django.middleware.security.SecurityMiddleware",
+        "django.middleware.common.CommonMiddleware",
+        *FULL_STACK_MIDDLEWARE,
+    ]
+else:
+    MIDDLEWARE = [
+        "config.middleware.HealthCheckMiddleware",
+        "corsheaders.middleware.CorsMiddleware",
+        "django.middleware.security.SecurityMiddleware",
+        "django.middleware.common.CommonMiddleware",
+        "config.middleware.FullStackMiddleware",
+    ]
+    # Проверки админки ищут middleware сессий, аутентификации и сообщений
+    # в MIDDLEWARE, а здесь они подключены через FullStackMiddleware
+    SILENCED_SYSTEM_CHECKS = ["admin.E408", "admin.E409", "admin.E410"]
+
+# Метрики Prometheus на /metrics (config.metrics, нужен пакет prometheus_client)
+METRICS_ENABLED = (
+    os.getenv("METRICS_ENABLED", "True") == "True" and
+    importlib.util.find_spec("prometheus_client") is not None
+)
+# Если задан, /metrics требует заголовок Authorization: Bearer <токен>
+METRICS_TOKEN = os.getenv("METRICS_TOKEN") or ""
+# Заголовок Server-Timing с замерами запроса (БД, кэш, представление, рендеринг)
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED") == "True"
+
+if METRICS_ENABLED or SERVER_TIMING_ENABLED:
+    MIDDLEWARE.insert(1, "config.middleware.RequestMetricsMiddleware")
+
 ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
@@ -103,9 +160,34 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("POSTGRES_HOST"),
         "PORT": os.getenv("POSTGRES_PORT"),
+        # Постоянные соединения: переиспользуются между запросами/задачами
+        # в течение DB_CONN_MAX_AGE секунд и проверяются перед использованием.
+        # Под ASGI соединения привязаны к потокам sync_to_async, поэтому
+        # по умолчанию отключены (DJANGO_SERVER_INTERFACE задаёт config/asgi.py)
+        "CONN_MAX_AGE": int(
+            os.getenv("DB_CONN_MAX_AGE") or
+            (0 if os.getenv("DJANGO_SERVER_INTERFACE") == "asgi" else 60)
+        ),
+        "CONN_HEALTH_CHECKS": True,
+        # Ограничение времени подключения (секунды), в том числе для /readyz
+        "OPTIONS": {"connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT") or 5)},
     }
 }
 
+# Пул соединений psycopg (Django 5.1+ с psycopg 3): DB_POOL=True.
+# Пул несовместим с CONN_MAX_AGE, поэтому постоянные соединения отключаются
+if (
+    os.getenv("DB_POOL") == "True" and
+    django.VERSION >= (5, 1) and
+    importlib.util.find_spec("psycopg") is not None
+):
+    DATABASES["default"]["ENGINE"] = "django.db.backends.postgresql"
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE") or 2),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE") or 10),
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -152,9 +234,26 @@ STATICFILES_DIRS = (
 
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 
+# collectstatic добавляет к именам файлов хэш содержимого и пишет сжатые копии .gz:
+# nginx отдаёт их через gzip_static и кэширует файлы с хэшем на год (nginx/nginx.conf)
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "config.storage.CompressedManifestStaticFilesStorage"},
+}
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Загрузки больше этого размера Django пишет во временный файл на диске,
+# а не держит в памяти воркера
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+
+# Аватары: ограничения загрузки и миниатюры (users.tasks.make_avatar_thumbnails)
+AVATAR_MAX_UPLOAD_SIZE = int(os.getenv("AVATAR_MAX_UPLOAD_SIZE") or 5 * 1024 * 1024)
+AVATAR_MAX_PIXELS = int(os.getenv("AVATAR_MAX_PIXELS") or 40_000_000)
+AVATAR_THUMBNAIL_SIZES = {"small": 64, "medium": 256}
+AVATAR_THUMBNAIL_QUALITY = 85
+
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = os.getenv("EMAIL_HOST")
 EMAIL_PORT = os.getenv("EMAIL_PORT")
@@ -166,6 +265,17 @@ EMAIL_USE_SSL = True
 SERVER_EMAIL = EMAIL_HOST_USER
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Отправка писем через Celery (users.tasks.send_email_batch)
+# максимальное количество писем в одной задаче (одно SMTP-соединение)
+EMAIL_BATCH_SIZE = 50
+# экспоненциальная задержка повторов (в секундах)
+EMAIL_RETRY_BACKOFF = 10
+EMAIL_RETRY_BACKOFF_MAX = 600
+# письма queue_email копятся в Redis (кэш по умолчанию) и раз в
+# EMAIL_OUTBOX_FLUSH_INTERVAL секунд отправляются пачками (users.tasks.flush_email_outbox)
+EMAIL_OUTBOX_KEY = "email-outbox"
+EMAIL_OUTBOX_FLUSH_INTERVAL = int(os.getenv("EMAIL_OUTBOX_FLUSH_INTERVAL") or 5)
+
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/"
 CRISPY_TEMPLATE_PACK = "bootstrap4"
@@ -174,21 +284,59 @@ LOGIN_URL = "/users/login/"
 
 CACHE_ENABLED = os.getenv("CACHE_ENABLED") == "True"
 
+# Бэкенды из config.cache учитывают попадания и промахи в метриках запроса
 if CACHE_ENABLED:
     CACHES = {
         "default": {
-            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "BACKEND": "config.cache.InstrumentedRedisCache",
             "LOCATION": os.getenv("LOCATION"),
         }
     }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "config.cache.InstrumentedLocMemCache",
+        }
+    }
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=15),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
 }
 
+# Кеширование пользователя при JWT-аутентификации (в секундах):
+# общий кеш (Redis) и локальный кеш процесса
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL") or 60)
+AUTH_USER_LOCAL_CACHE_TTL = int(os.getenv("AUTH_USER_LOCAL_CACHE_TTL") or 5)
+
 AUTH_USER_MODEL = "users.User"
 
+# Ограничение частоты запросов (config.throttling), формат "<количество>/<период>".
+# "<scope>" - лимит на IP, "<scope>_account" - лимит на учётную запись (email)
+THROTTLE_CACHE_ALIAS = "default"
+THROTTLE_RATES = {
+    "login": os.getenv("THROTTLE_LOGIN_RATE") or "20/min",
+    "login_account": os.getenv("THROTTLE_LOGIN_ACCOUNT_RATE") or "5/min",
+    "register": os.getenv("THROTTLE_REGISTER_RATE") or "10/hour",
+    "register_account": os.getenv("THROTTLE_REGISTER_ACCOUNT_RATE") or "3/hour",
+    "password_reset": os.getenv("THROTTLE_PASSWORD_RESET_RATE") or "10/hour",
+    "password_reset_account": (
+        os.getenv("THROTTLE_PASSWORD_RESET_ACCOUNT_RATE") or "3/hour"
+    ),
+    "public": os.getenv("THROTTLE_PUBLIC_RATE") or "120/min",
+}
+
+# Размер пачки при потоковой выгрузке пользователей (/users/export/)
+USERS_EXPORT_CHUNK_SIZE = 2000
+
+# Время жизни одноразовых токенов (users.OneTimeToken) по назначению
+ONE_TIME_TOKEN_LIFETIME = {
+    "email_confirm": timedelta(days=3),
+    "password_reset": timedelta(hours=1),
+}
+# Размер пачки при удалении истёкших токенов
+ONE_TIME_TOKEN_PURGE_BATCH_SIZE = 1000
+
 # Настройки для Celery
 
 # URL-адрес брокера сообщений (Например, Redis,
@@ -209,7 +357,23 @@ CELERY_TASK_TIME_LIMIT = 30 * 60
 
 #  чтобы задачи не смешивались с другими проектами
 CELERY_TASK_DEFAULT_QUEUE = "habit_tracker_queue"
+# отдельная очередь для писем, чтобы медленный SMTP не задерживал напоминания
+EMAIL_CELERY_QUEUE = "habit_tracker_email_queue"
+CELERY_TASK_ROUTES = {
+    "users.tasks.send_email_batch": {"queue": EMAIL_CELERY_QUEUE},
+    "users.tasks.flush_email_outbox": {"queue": EMAIL_CELERY_QUEUE},
+    # Замер очередей не должен ждать в очереди напоминаний, которую он измеряет
+    "config.celery.sample_queue_lengths": {"queue": EMAIL_CELERY_QUEUE},
+}
+# Очереди, длина которых публикуется в метрике celery_queue_length
+QUEUE_LENGTH_QUEUES = [CELERY_TASK_DEFAULT_QUEUE, EMAIL_CELERY_QUEUE]
+# Интервал замера длины очередей (секунды)
+QUEUE_LENGTH_PROBE_INTERVAL = int(os.getenv("QUEUE_LENGTH_PROBE_INTERVAL") or 15)
 CELERY_IGNORE_RESULT = True
+# Celery по умолчанию закрывает соединение с БД до и после каждой задачи.
+# Соединение переиспользуется по правилам CONN_MAX_AGE (config/celery.py)
+# и принудительно пересоздаётся раз в CELERY_DB_REUSE_MAX задач
+CELERY_DB_REUSE_MAX = int(os.getenv("CELERY_DB_REUSE_MAX") or 1000)
 #  для безопасности
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
@@ -222,6 +386,33 @@ CELERY_BEAT_SCHEDULE = {
         "schedule": timedelta(minutes=1),
         # "schedule": crontab(hour=8, minute=0),  # Ежедневно в 8:00 утра
     },
+    "flush-email-outbox": {
+        "task": "users.tasks.flush_email_outbox",
+        "schedule": timedelta(seconds=EMAIL_OUTBOX_FLUSH_INTERVAL),
+        "options": {"expires": EMAIL_OUTBOX_FLUSH_INTERVAL},
+    },
+    "purge-expired-one-time-tokens": {
+        "task": "users.tasks.purge_expired_tokens",
+        "schedule": timedelta(hours=1),
+    },
+    "create-habit-completion-partitions": {
+        "task": "habits.tasks.create_completion_partitions",
+        "schedule": timedelta(days=1),
+    },
+    "archive-habit-completions": {
+        "task": "habits.tasks.archive_habit_completions",
+        "schedule": timedelta(days=1),
+    },
+    "reconcile-habit-rollups": {
+        "task": "habits.tasks.reconcile_habit_rollups",
+        "schedule": crontab(hour=3, minute=30),
+    },
+    "sample-queue-lengths": {
+        "task": "config.celery.sample_queue_lengths",
+        "schedule": timedelta(seconds=QUEUE_LENGTH_PROBE_INTERVAL),
+        # Устаревший замер не выполняется, если воркер не успел его взять
+        "options": {"expires": QUEUE_LENGTH_PROBE_INTERVAL},
+    },
 }
 
 # Разрешаем CORS для localhost на разных портах
@@ -255,15 +446,43 @@ CORS_ALLOW_CREDENTIALS = True
 # настройки для телеграм - бота
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 
+# Ограничения для массовых операций с привычками (/habits/bulk/)
+# максимальное количество привычек в одном запросе
+HABITS_BULK_MAX_ITEMS = int(os.getenv("HABITS_BULK_MAX_ITEMS") or 100)
+# размер пачки для bulk_create/bulk_update
+HABITS_BULK_BATCH_SIZE = int(os.getenv("HABITS_BULK_BATCH_SIZE") or 50)
+
+# Журнал выполнения привычек (habits.HabitCompletion, /habits/completions/)
+# за сколько дней назад можно отметить выполнение
+HABIT_COMPLETION_BACKFILL_DAYS = int(os.getenv("HABIT_COMPLETION_BACKFILL_DAYS") or 7)
+# на сколько месяцев вперёд создаются секции таблицы (PostgreSQL)
+HABIT_COMPLETION_PARTITIONS_AHEAD = int(
+    os.getenv("HABIT_COMPLETION_PARTITIONS_AHEAD") or 3
+)
+# срок хранения в месяцах: более старые месяцы архивируются и удаляются
+HABIT_COMPLETION_RETENTION_MONTHS = int(
+    os.getenv("HABIT_COMPLETION_RETENTION_MONTHS") or 24
+)
+# выгружать удаляемые месяцы в CSV (gzip) в хранилище по умолчанию
+HABIT_COMPLETION_ARCHIVE = os.getenv("HABIT_COMPLETION_ARCHIVE", "True") == "True"
+HABIT_COMPLETION_ARCHIVE_DIR = "archive/habit_completions"
+
 # CICD ([flake8])
 # это нужно, чтобы при запуске тестов использовалась легкая SQLite, а не PostgreSQL
 
 if "test" in sys.argv:
     CELERY_TASK_ALWAYS_EAGER = True  # Выполнять задачи синхронно
     CELERY_TASK_EAGER_PROPAGATES = True  # Пропускать ошибки из задач
-    DATABASES = {
-        "default": {
-            "ENGINE": "django.db.backends.sqlite3",
-            "NAME": BASE_DIR / "test_db.sqlite3",
-        }
+    THROTTLE_RATES = {}  # Лимиты включаются в тестах через override_settings
+    # В тестах collectstatic не выполняется, манифеста статики нет
+    STORAGES["staticfiles"] = {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
     }
+    # TEST_DATABASE=postgres - запуск тестов на PostgreSQL (нужно для EXPLAIN-тестов индексов)
+    if os.getenv("TEST_DATABASE") != "postgres":
+        DATABASES = {
+            "default": {
+                "ENGINE": "django.db.backends.sqlite3",
+                "NAME": BASE_DIR / "test_db.sqlite3",
+            }
+        }
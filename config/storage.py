@@ -0,0 +1,46 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage, который при collectstatic пишет рядом
+    с текстовыми файлами сжатые копии .gz. nginx отдаёт их без сжатия
+    на лету (gzip_static), файлы с хэшем в имени кэшируются на год.
+    """
+
+    compress_extensions = (".css", ".js", ".map", ".svg", ".json", ".txt", ".html")
+    # Маленькие файлы сжимать невыгодно
+    compress_min_size = 1024
+
+    def post_process(self, paths, dry_run=False, **options):
+        compressed = set()
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            yield name, hashed_name, processed
+            if dry_run or isinstance(processed, Exception):
+                continue
+            # Файлы меняются между проходами обработки, сжимается итоговая версия
+            for path in (name, hashed_name):
+                if path and path not in compressed:
+                    compressed.add(path)
+        for path in compressed:
+            self.compress(path)
+
+    def compress(self, name):
+        if not name.endswith(self.compress_extensions):
+            return
+        path = self.path(name)
+        with open(path, "rb") as file:
+            data = file.read()
+        # mtime=0: одинаковые файлы дают одинаковые архивы при каждой сборке
+        content = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(data) >= self.compress_min_size and len(content) < len(data):
+            with open(f"{path}.gz", "wb") as file:
+                file.write(content)
+        elif os.path.exists(f"{path}.gz"):
+            # Копия от прошлой сборки не должна подменять изменившийся файл
+            os.remove(f"{path}.gz")
@@ -0,0 +1,324 @@
+import shutil
+import tempfile
+from datetime import time, timedelta
+from io import BytesIO
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.test import override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from config.testing import QueryBudgetMixin, endpoint, task
+from habits.models import Habit
+from habits.rollups import reconcile
+from habits.tasks import (
+    reconcile_habit_rollups,
+    send_daily_reminders,
+    send_telegram_reminder,
+)
+from users.models import OneTimeToken, User
+from users.tasks import make_avatar_thumbnails, purge_expired_tokens, send_email_batch
+
+PASSWORD = "password123"
+
+HABIT = {
+    "location": "Дом",
+    "time": "08:00:00",
+    "action": "Зарядка",
+    "duration": 60,
+    "frequency": 1,
+    "reward": "Кофе",
+}
+
+
+def make_habits(owner, rows, **fields):
+    """
+    Создаёт rows привычек, связанных с приятной привычкой другого пользователя
+    (связанная привычка выводится в ответах и напоминаниях).
+    """
+    pleasant = Habit.objects.create(
+        owner=User.objects.create_user(email="pleasant@example.com"),
+        location="Дом",
+        time=time(hour=7),
+        action="Кофе",
+        is_pleasant=True,
+        duration=60,
+    )
+    return Habit.objects.bulk_create(
+        Habit(
+            owner=owner,
+            location="Парк",
+            time=time(hour=index % 24),
+            action=f"Привычка {index}",
+            linked_action=pleasant,
+            duration=60,
+            **fields,
+        )
+        for index in range(rows)
+    )
+
+
+def own_habits(test, rows):
+    habits = make_habits(test.user, rows)
+    # Записи привычек обновляют существующие строки счётчиков
+    reconcile()
+    return {"pk": habits[0].pk, "ids": [habit.pk for habit in habits]}
+
+
+def public_habits(test, rows):
+    make_habits(test.other, rows, is_public=True)
+
+
+def rollup_habits(test, rows):
+    """
+    Привычки rows владельцев в разное время суток (счётчики пересчитаны).
+    """
+    owners = User.objects.bulk_create(
+        User(email=f"owner{index}@example.com") for index in range(rows)
+    )
+    Habit.objects.bulk_create(
+        Habit(
+            owner=owner,
+            location="Дом",
+            time=time(hour=index % 24, minute=index % 60),
+            action="Зарядка",
+            duration=60,
+            is_public=index % 2 == 0,
+        )
+        for index, owner in enumerate(owners)
+    )
+    reconcile()
+
+
+def new_habits(test, rows):
+    return {"rows": rows}
+
+
+def users(test, rows):
+    User.objects.bulk_create(
+        User(email=f"user{index}@example.com", password="!", is_active=True)
+        for index in range(rows)
+    )
+    return {"pk": test.user.pk, "email": test.user.email}
+
+
+def refresh_token(test, rows):
+    users(test, rows)
+    return {"refresh": str(RefreshToken.for_user(test.user))}
+
+
+def one_time_token(purpose):
+    def seed(test, rows):
+        users(test, rows)
+        if purpose == OneTimeToken.EMAIL_CONFIRM:
+            User.objects.filter(pk=test.user.pk).update(is_active=False)
+        return {"token": OneTimeToken.objects.issue(test.user, purpose)}
+
+    return seed
+
+
+def reminder_habits(test, rows):
+    """
+    Привычки, о которых напоминает send_daily_reminders: половина владельцев
+    получает напоминание в Telegram, остальные - письмо.
+    """
+    owners = User.objects.bulk_create(
+        User(email=f"owner{index}@example.com", tg_id=index or None)
+        for index in range(2)
+    )
+    for index, habit in enumerate(make_habits(owners[0], rows)):
+        if index % 2:
+            habit.owner = owners[1]
+            habit.save(update_fields=["owner"])
+    Habit.objects.filter(is_pleasant=True).update(time=time(hour=23, minute=59))
+    Habit.objects.filter(is_pleasant=False).update(time=time(0))
+
+
+def expired_tokens(test, rows):
+    OneTimeToken.objects.bulk_create(
+        OneTimeToken(
+            user=test.user,
+            purpose=OneTimeToken.EMAIL_CONFIRM,
+            token_hash=f"{index:064d}",
+            expires_at=timezone.now() - timedelta(minutes=1),
+        )
+        for index in range(rows)
+    )
+
+
+def avatar(test, rows):
+    buffer = BytesIO()
+    Image.new("RGB", (64, 64), "red").save(buffer, "JPEG")
+    test.user.avatar.save("avatar.jpg", ContentFile(buffer.getvalue()))
+    return {"args": (test.user.pk, test.user.avatar.name)}
+
+
+def emails(test, rows):
+    email = {"subject": "Тема", "message": "Текст", "recipient_list": ["a@b.c"]}
+    return {"args": ([email] * rows,)}
+
+
+def reminder(test, rows):
+    return {"args": (1, "Напоминание")}
+
+
+# Точное число SQL-запросов эндпоинтов и задач Celery при 1, 10 и 100 строках.
+# Аутентифицированные запросы выполняются с пустым кэшем пользователей
+# (включают загрузку пользователя по JWT). Изменение бюджета должно быть
+# осознанным: меньше - обновите таблицу, больше - ищите N+1.
+QUERY_BUDGETS = (
+    # Привычки
+    endpoint("GET", "/habits/?page_size=100", 3, own_habits),
+    endpoint("GET", "/habits/{pk}/", 2, own_habits),
+    endpoint("POST", "/habits/", 7, own_habits, data=HABIT, status=201),
+    # Без If-Match новая версия читается после UPDATE в транзакции
+    endpoint("PATCH", "/habits/{pk}/", 7, own_habits, data={"duration": 90}),
+    endpoint("DELETE", "/habits/{pk}/", 8, own_habits, status=204),
+    endpoint(
+        "POST",
+        "/habits/bulk/",
+        7,
+        new_habits,
+        data=lambda rows: [HABIT] * rows,
+        status=201,
+        # SQLite ограничивает запрос 999 параметрами: 100 привычек
+        # не помещаются в один INSERT
+        row_counts=(1, 10, 50),
+    ),
+    endpoint(
+        "PATCH",
+        "/habits/bulk/",
+        6,
+        own_habits,
+        # Время напоминания учитывается в счётчиках привычек
+        data=lambda ids, **params: [
+            {"id": pk, "duration": 90, "time": "09:30:00"} for pk in ids
+        ],
+    ),
+    endpoint(
+        "DELETE",
+        "/habits/bulk/",
+        11,
+        own_habits,
+        data=lambda ids, **params: {"ids": ids},
+        status=204,
+    ),
+    endpoint(
+        "POST",
+        "/habits/completions/",
+        5,
+        own_habits,
+        data=lambda ids, **params: [{"habit": pk} for pk in ids],
+        status=201,
+    ),
+    endpoint("GET", "/habits/public/?page_size=100", 2, public_habits, user=None),
+    endpoint("GET", "/habits/summary/", 2, own_habits),
+    endpoint("GET", "/habits/stats/", 3, rollup_habits, user="admin"),
+    endpoint("GET", "/async/habits/?page_size=100", 3, own_habits),
+    endpoint("GET", "/async/habits/{pk}/", 2, own_habits),
+    endpoint("GET", "/async/habits/public/?page_size=100", 2, public_habits, user=None),
+    # Пользователи
+    endpoint("GET", "/users/?page_size=500", 2, users),
+    endpoint("GET", "/users/{pk}/", 2, users),
+    endpoint("PATCH", "/users/update/{pk}/", 3, users, data={"tg_nick": "nick"}),
+    endpoint("DELETE", "/users/delete/{pk}/", 11, own_habits, status=204),
+    endpoint("GET", "/users/export/csv/", 2, users, user="admin"),
+    endpoint("GET", "/users/export/ndjson/", 2, users, user="admin"),
+    endpoint(
+        "POST",
+        "/users/register/",
+        9,
+        users,
+        data={"email": "new@example.com", "password": PASSWORD},
+        user=None,
+        status=201,
+    ),
+    endpoint(
+        "POST",
+        "/users/login/",
+        1,
+        users,
+        data=lambda email, **params: {"email": email, "password": PASSWORD},
+        user=None,
+    ),
+    endpoint(
+        "POST",
+        "/users/token/refresh/",
+        1,
+        refresh_token,
+        data=lambda refresh: {"refresh": refresh},
+        user=None,
+    ),
+    endpoint(
+        "POST",
+        "/users/password-reset/",
+        5,
+        users,
+        data=lambda email, **params: {"email": email},
+        user=None,
+    ),
+    endpoint(
+        "POST",
+        "/users/password-reset-confirm/{token}/",
+        # проверка токена, затем удаление токена и смена пароля в одной транзакции
+        6,
+        one_time_token(OneTimeToken.PASSWORD_RESET),
+        data={"new_password": "new-password123"},
+        user=None,
+    ),
+    endpoint(
+        "GET",
+        "/users/email-confirm/{token}/",
+        2,
+        one_time_token(OneTimeToken.EMAIL_CONFIRM),
+        user=None,
+    ),
+    # Задачи Celery
+    task(send_daily_reminders, 2, reminder_habits),
+    task(send_telegram_reminder, 0, reminder),
+    task(send_email_batch, 0, emails),
+    task(purge_expired_tokens, 3, expired_tokens),
+    task(make_avatar_thumbnails, 1, avatar),
+    # bulk_create в подготовке данных обходит счётчики - задача их исправляет
+    task(reconcile_habit_rollups, 10, public_habits),
+)
+
+
+# Массовые операции пишут пачками по HABITS_BULK_BATCH_SIZE - это ожидаемый
+# рост числа запросов. Пачка вмещает весь запрос, чтобы он не маскировал N+1
+@override_settings(HABITS_BULK_BATCH_SIZE=100)
+class QueryBudgetTest(QueryBudgetMixin, APITestCase):
+    """
+    Регрессионный тест числа SQL-запросов (таблица QUERY_BUDGETS).
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password=PASSWORD, is_active=True
+        )
+        self.other = User.objects.create_user(email="other@example.com")
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password=PASSWORD, is_active=True
+        )
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        # Напоминания в Telegram не отправляются
+        bot_patcher = patch("habits.tasks.get_bot")
+        bot_patcher.start()
+        self.addCleanup(bot_patcher.stop)
+
+    def test_query_budgets(self):
+        """
+        Тест: число запросов совпадает с бюджетом и не зависит от объёма данных.
+        """
+        for budget in QUERY_BUDGETS:
+            with self.subTest(budget.name):
+                self.assertQueryBudget(budget)
@@ -0,0 +1,133 @@
+"""
+Бюджеты SQL-запросов для регрессионных тестов (config/test_query_budgets.py).
+
+Бюджет - точное число запросов, которое выполняет эндпоинт или задача Celery.
+Проверка повторяется при 1, 10 и 100 строках в БД: если число запросов
+растёт вместе с данными (N+1) или отличается от бюджета, тест падает
+и выводит перехваченный SQL.
+"""
+
+import json
+from typing import Callable, NamedTuple
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.cache import invalidate_cached_user
+
+ROW_COUNTS = (1, 10, 100)
+
+
+class QueryBudget(NamedTuple):
+    """
+    Строка таблицы бюджетов.
+
+    seed(test, rows) создаёт данные и возвращает параметры (dict) для run,
+    run(test, **params) выполняет проверяемое действие. row_counts заменяет
+    размеры данных по умолчанию (ROW_COUNTS).
+    """
+
+    name: str
+    queries: int
+    seed: Callable
+    run: Callable
+    row_counts: tuple = None
+
+
+def endpoint(
+    method, path, queries, seed, data=None, user="user", status=200, row_counts=None
+):
+    """
+    Бюджет эндпоинта API.
+
+    Arguments:
+        path (str): адрес с подстановками из параметров seed ("/habits/{pk}/")
+        data: тело запроса (JSON) или функция, строящая его по параметрам seed
+        user (str): атрибут теста с пользователем для JWT, None - без токена
+        status (int): ожидаемый код ответа
+    """
+
+    def prepare(test, rows):
+        params = seed(test, rows) or {}
+        if user is not None:
+            # Пользователь загружается из БД, как при первом запросе с токеном
+            invalidate_cached_user(getattr(test, user).pk)
+        return params
+
+    def run(test, **params):
+        body = data(**params) if callable(data) else data
+        headers = {}
+        if user is not None:
+            token = AccessToken.for_user(getattr(test, user))
+            headers["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+        response = test.client.generic(
+            method,
+            path.format(**params),
+            json.dumps(body) if body is not None else "",
+            content_type="application/json",
+            **headers,
+        )
+        if response.streaming:
+            # Потоковый ответ читает БД при отдаче содержимого
+            b"".join(response.streaming_content)
+        test.assertEqual(
+            response.status_code,
+            status,
+            f"{method} {path}: {getattr(response, 'data', None)}",
+        )
+
+    return QueryBudget(f"{method} {path}", queries, prepare, run, row_counts)
+
+
+def task(task, queries, seed, row_counts=None):
+    """
+    Бюджет задачи Celery. seed возвращает параметры с ключами args и kwargs.
+    """
+
+    def run(test, args=(), kwargs=None):
+        task.apply(args=args, kwargs=kwargs, throw=True)
+
+    return QueryBudget(f"task {task.name}", queries, seed, run, row_counts)
+
+
+def format_queries(budget, captured):
+    """
+    Сообщение об ошибке: число запросов по размерам данных
+    и SQL для каждого размера, на котором бюджет нарушен.
+    """
+    counts = ", ".join(
+        f"{len(queries)} при {rows} строк." for rows, queries in captured.items()
+    )
+    lines = [f"{budget.name}: бюджет {budget.queries} запросов, выполнено {counts}"]
+    for rows, queries in captured.items():
+        if len(queries) == budget.queries:
+            continue
+        lines.append(f"\nSQL при {rows} строк.:")
+        lines.extend(
+            f"{index}. {query['sql']}" for index, query in enumerate(queries, 1)
+        )
+    return "\n".join(lines)
+
+
+class QueryBudgetMixin:
+    """
+    Миксин TestCase: assertQueryBudget(budget) проверяет бюджет
+    на каждом размере данных из row_counts. Данные каждого прогона
+    создаются в отдельной транзакции и откатываются.
+    """
+
+    row_counts = ROW_COUNTS
+
+    def assertQueryBudget(self, budget):
+        captured = {}
+        for rows in budget.row_counts or self.row_counts:
+            with transaction.atomic():
+                params = budget.seed(self, rows) or {}
+                with CaptureQueriesContext(connection) as context:
+                    budget.run(self, **params)
+                captured[rows] = context.captured_queries
+                transaction.set_rollback(True)
+
+        if any(len(queries) != budget.queries for queries in captured.values()):
+            self.fail(format_queries(budget, captured))
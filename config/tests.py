@@ -0,0 +1,439 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from io import StringIO
+from pathlib import Path
+from unittest import skipUnless
+from unittest.mock import MagicMock, Mock, patch
+
+from celery.app.task import Context
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from drf_spectacular.drainage import GENERATOR_STATS
+from kombu.exceptions import ChannelError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.celery import (
+    add_enqueued_at,
+)
+from config.celery import app as celery_app
+from config.celery import (
+    close_old_db_connections,
+    debug_task,
+    queue_wait,
+    sample_queue_lengths,
+)
+from config.schema import generate_schema, load_schema
+from habits.models import Habit
+from users.models import User
+
+
+class HealthCheckMiddlewareTest(TestCase):
+    def test_healthz(self):
+        """
+        Тест: /healthz отвечает без запросов к БД.
+        """
+        with self.assertNumQueries(0):
+            response = self.client.get("/healthz")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"status": "ok"})
+
+    def test_readyz(self):
+        """
+        Тест: /readyz проверяет БД одним запросом.
+        """
+        with self.assertNumQueries(1):
+            response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"status": "ready"})
+
+    def test_readyz_unavailable(self):
+        """
+        Тест: /readyz отвечает 503, если БД или кэш недоступны.
+        """
+        with patch.object(
+            connection, "cursor", side_effect=OperationalError("connection refused")
+        ), patch.object(cache, "get", side_effect=ConnectionError):
+            response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(
+            response.json(),
+            {"status": "unavailable", "unavailable": ["database", "cache"]},
+        )
+        # /healthz не зависит от БД и кэша
+        with patch.object(connection, "cursor", side_effect=OperationalError):
+            response = self.client.get("/healthz")
+        self.assertEqual(response.status_code, 200)
+
+    def test_health_ignores_allowed_hosts(self):
+        """
+        Тест: healthcheck контейнера обращается по localhost,
+        которого может не быть в ALLOWED_HOSTS.
+        """
+        with self.settings(ALLOWED_HOSTS=["example.com"]):
+            response = self.client.get("/healthz", HTTP_HOST="localhost:8000")
+        self.assertEqual(response.status_code, 200)
+
+
+class MiddlewareProfileTest(TestCase):
+    def test_cors_preflight(self):
+        """
+        Тест: preflight-запрос отвечается CorsMiddleware без остальной цепочки.
+        """
+        response = self.client.options(
+            "/habits/public/",
+            HTTP_ORIGIN="http://localhost:3000",
+            HTTP_ACCESS_CONTROL_REQUEST_METHOD="GET",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response["Access-Control-Allow-Origin"], "http://localhost:3000"
+        )
+        self.assertNotIn("X-Frame-Options", response)
+
+    def test_api_skips_full_stack(self):
+        """
+        Тест: запросы к API не проходят через сессии, CSRF и clickjacking.
+        """
+        response = self.client.get("/habits/public/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(hasattr(response.wsgi_request, "session"))
+        self.assertNotIn("X-Frame-Options", response)
+
+    def test_admin_keeps_full_stack(self):
+        """
+        Тест: админка работает с полным стеком (сессии, CSRF, X-Frame-Options).
+        """
+        response = self.client.get("/admin/login/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(hasattr(response.wsgi_request, "session"))
+        self.assertEqual(response["X-Frame-Options"], "DENY")
+        self.assertIn("csrftoken", response.cookies)
+
+    def test_admin_csrf_enforced(self):
+        """
+        Тест: POST в админку без CSRF-токена отклоняется.
+        """
+        client = Client(enforce_csrf_checks=True)
+        response = client.post(
+            "/admin/login/", {"username": "a@a.ru", "password": "password"}
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+# Тесты метрик пропускаются, если они отключены (METRICS_ENABLED=False)
+requires_metrics = skipUnless(
+    settings.METRICS_ENABLED, "нужен пакет prometheus_client (METRICS_ENABLED)"
+)
+
+
+@requires_metrics
+class RequestMetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="metrics@example.com", password="password123", is_active=True
+        )
+        Habit.objects.create(
+            owner=self.user,
+            location="Дом",
+            time="08:00",
+            action="Зарядка",
+            duration=60,
+        )
+        token = AccessToken.for_user(self.user)
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+    def test_server_timing_disabled_by_default(self):
+        """
+        Тест: заголовок Server-Timing выдаётся только при включённой настройке.
+        """
+        response = self.client.get("/habits/public/")
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(SERVER_TIMING_ENABLED=True)
+    def test_server_timing(self):
+        """
+        Тест: Server-Timing содержит время и количество запросов к БД,
+        обращения к кэшу, время представления и рендеринга.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/habits/", **self.headers)
+        self.assertEqual(response.status_code, 200)
+
+        header = response["Server-Timing"]
+        for name in (
+            "total;dur=",
+            "db;dur=",
+            "cache;desc=",
+            "view;dur=",
+            "render;dur=",
+        ):
+            self.assertIn(name, header)
+        self.assertIn(f'desc="{len(queries)} queries"', header)
+        # Пользователь при первом запросе загружается из БД (промах кэша)
+        self.assertIn('"0 hits, 1 misses"', header)
+
+    def test_metrics_endpoint(self):
+        """
+        Тест: /metrics отдаёт гистограммы по представлениям в формате Prometheus.
+        """
+        self.client.get("/habits/", **self.headers)
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+
+        body = response.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_bucket{le="0.005",method="GET",'
+            'view="habits:habit-list"}',
+            body,
+        )
+        self.assertIn('http_request_db_queries_count{view="habits:habit-list"}', body)
+        self.assertIn(
+            'http_request_cache_lookups_total{result="miss",view="habits:habit-list"}',
+            body,
+        )
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token(self):
+        """
+        Тест: при заданном METRICS_TOKEN метрики доступны только с токеном.
+        """
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+
+
+class CeleryDbConnectionsTest(SimpleTestCase):
+    @patch("config.celery.close_old_connections")
+    def test_old_connections_closed_around_tasks(self, close_old_connections):
+        """
+        Тест: в воркере устаревшие соединения закрываются до и после задачи.
+        """
+        close_old_db_connections(task=Mock(request=Mock(is_eager=False)))
+        close_old_connections.assert_called_once()
+
+    @patch("config.celery.close_old_connections")
+    def test_eager_tasks_keep_connection(self, close_old_connections):
+        """
+        Тест: задача, выполненная синхронно внутри запроса, не трогает соединение.
+        """
+        close_old_db_connections(task=Mock(request=Mock(is_eager=True)))
+        close_old_connections.assert_not_called()
+
+
+class CeleryTaskMetricsTest(SimpleTestCase):
+    def sample(self, name, **labels):
+        from prometheus_client import REGISTRY
+
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_enqueued_at_header(self):
+        """
+        Тест: при публикации задачи в заголовки добавляется время постановки в очередь.
+        """
+        headers = {"enqueued_at": 1.0}
+        add_enqueued_at(headers=headers)
+        self.assertAlmostEqual(headers["enqueued_at"], time.time(), delta=1)
+
+    def test_queue_wait(self):
+        """
+        Тест: ожидание в очереди считается от публикации,
+        а для отложенной задачи - от запланированного времени.
+        """
+        now = time.time()
+        request = Context(enqueued_at=now - 5, eta=None)
+        self.assertAlmostEqual(queue_wait(request, now), 5)
+
+        eta = datetime.fromtimestamp(now - 2, tz=timezone.utc).isoformat()
+        request = Context(enqueued_at=now - 12, eta=eta)
+        self.assertAlmostEqual(queue_wait(request, now), 2, places=3)
+
+        self.assertIsNone(queue_wait(Context(), now))
+
+    @requires_metrics
+    def test_task_runtime_and_state(self):
+        """
+        Тест: выполнение задачи учитывается по имени задачи и состоянию.
+        """
+        before = self.sample(
+            "celery_tasks_total", task="config.celery.debug_task", state="SUCCESS"
+        )
+        with patch("builtins.print"):
+            debug_task.apply()
+        self.assertEqual(
+            self.sample(
+                "celery_tasks_total", task="config.celery.debug_task", state="SUCCESS"
+            ),
+            before + 1,
+        )
+        self.assertGreater(
+            self.sample(
+                "celery_task_runtime_seconds_count", task="config.celery.debug_task"
+            ),
+            0,
+        )
+
+    @requires_metrics
+    def test_queue_lengths(self):
+        """
+        Тест: длина очередей берётся из брокера, несозданная очередь - 0.
+        """
+        channel = Mock()
+        channel.queue_declare.side_effect = [
+            ("habit_tracker_queue", 7, 0),
+            ChannelError("NOT_FOUND"),
+        ]
+        connection = MagicMock()
+        connection.__enter__.return_value.default_channel = channel
+        with patch.object(celery_app, "connection_for_read", return_value=connection):
+            sample_queue_lengths()
+
+        self.assertEqual(
+            self.sample("celery_queue_length", queue="habit_tracker_queue"), 7
+        )
+        self.assertEqual(
+            self.sample("celery_queue_length", queue="habit_tracker_email_queue"), 0
+        )
+
+
+@override_settings(DEBUG=False)
+class OpenApiSchemaTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.schema_dir = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.schema_dir)
+        with GENERATOR_STATS.silence():
+            call_command("build_schema", output=cls.schema_dir, stdout=StringIO())
+
+    def setUp(self):
+        load_schema.cache_clear()
+        self.addCleanup(load_schema.cache_clear)
+        settings_override = self.settings(OPENAPI_SCHEMA_DIR=Path(self.schema_dir))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_build_schema_files(self):
+        """
+        Тест: команда build_schema пишет YAML и JSON вместе со сжатыми копиями.
+        """
+        names = sorted(os.listdir(self.schema_dir))
+        self.assertEqual(
+            names, ["schema.json", "schema.json.gz", "schema.yaml", "schema.yaml.gz"]
+        )
+        with open(os.path.join(self.schema_dir, "schema.json"), "rb") as file:
+            self.assertIn("/habits/public/", json.load(file)["paths"])
+
+    def test_schema_served_from_artifact(self):
+        """
+        Тест: схема отдаётся из собранных файлов без повторной генерации.
+        """
+        with (
+            patch("config.schema.generate_schema") as generate_schema,
+            patch("config.schema.gzip.compress") as compress,
+        ):
+            response = self.client.get("/api/schema/")
+            self.client.get("/api/schema/", HTTP_ACCEPT="application/json")
+            gzipped = self.client.get("/api/schema/", HTTP_ACCEPT_ENCODING="gzip")
+        generate_schema.assert_not_called()
+        # Сжатые копии читаются из файлов .gz, а не сжимаются заново
+        compress.assert_not_called()
+        with open(os.path.join(self.schema_dir, "schema.yaml.gz"), "rb") as file:
+            self.assertEqual(gzipped.content, file.read())
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            response["Content-Type"].startswith("application/vnd.oai.openapi")
+        )
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+
+    def test_gzip_and_etag(self):
+        """
+        Тест: сжатая схема со своим строгим ETag, повторный запрос - 304.
+        """
+        response = self.client.get(
+            "/api/schema/?format=json", HTTP_ACCEPT_ENCODING="gzip, br"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        schema = json.loads(gzip.decompress(response.content))
+        self.assertIn("openapi", schema)
+        etag = response["ETag"]
+        self.assertTrue(etag.endswith('-json-gzip"'))
+
+        response = self.client.get(
+            "/api/schema/?format=json",
+            HTTP_ACCEPT_ENCODING="gzip",
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_versioned_url(self):
+        """
+        Тест: Swagger ссылается на схему с хэшем в адресе, она кэшируется на год;
+        устаревший хэш перенаправляется на текущий.
+        """
+        schema = load_schema()
+        url = f"/api/schema/{schema.digest}/"
+        self.assertIn(url, self.client.get("/swagger/").content.decode())
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+
+        response = self.client.get("/api/schema/0000000000000000/")
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+
+    @override_settings(DEBUG=True)
+    def test_regenerated_in_debug(self):
+        """
+        Тест: в DEBUG схема генерируется заново на каждый запрос.
+        """
+        with GENERATOR_STATS.silence():
+            with patch(
+                "config.schema.generate_schema", wraps=generate_schema
+            ) as generate:
+                response = self.client.get("/api/schema/")
+        generate.assert_called_once()
+        self.assertEqual(response["Cache-Control"], "no-cache")
+
+
+class CompressedManifestStorageTest(SimpleTestCase):
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        """
+        Тест: collectstatic пишет файлы с хэшем в имени и сжатые копии для nginx.
+        """
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        storages = {
+            **settings.STORAGES,
+            "staticfiles": {
+                "BACKEND": "config.storage.CompressedManifestStaticFilesStorage"
+            },
+        }
+        with self.settings(STATIC_ROOT=static_root, STORAGES=storages):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            hashed_name = staticfiles_storage.stored_name("admin/css/base.css")
+
+        self.assertRegex(hashed_name, r"^admin/css/base\.[0-9a-f]{12}\.css$")
+        path = os.path.join(static_root, hashed_name)
+        with open(path, "rb") as file, open(f"{path}.gz", "rb") as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), file.read())
+        # Изображения и маленькие файлы не сжимаются
+        self.assertFalse(
+            any(
+                name.endswith((".png.gz", ".gif.gz"))
+                for _, _, names in os.walk(static_root)
+                for name in names
+            )
+        )
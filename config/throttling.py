@@ -0,0 +1,148 @@
+"""
+Ограничение частоты запросов (rate limiting) для DRF-представлений.
+
+Используется алгоритм скользящего окна (sliding window counter):
+счётчики текущего и предыдущего окна хранятся в кэше Django
+и увеличиваются атомарной операцией incr. В продакшене это Redis
+(CACHE_ENABLED=True), в тестах и разработке - локальная память процесса.
+
+Лимиты задаются в settings.THROTTLE_RATES по scope представления:
+- "<scope>" - лимит на IP-адрес клиента;
+- "<scope>_account" - лимит на учётную запись (email из тела запроса).
+Если лимит для scope не задан, запросы не ограничиваются.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+REJECTED_KEY_PREFIX = "throttle:rejected"
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """
+    Разбирает лимит вида "10/min" в пару (количество запросов, период в секундах).
+    """
+    num, period = rate.split("/")
+    return int(num), PERIODS[period[0]]
+
+
+def get_cache():
+    return caches[settings.THROTTLE_CACHE_ALIAS]
+
+
+def record_rejection(scope):
+    """
+    Увеличивает счётчик отклонённых запросов для scope.
+    """
+    cache = get_cache()
+    key = f"{REJECTED_KEY_PREFIX}:{scope}"
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Ключ был вытеснен из кэша между add и incr
+        cache.set(key, 1, timeout=None)
+
+
+def get_rejection_counts(scopes):
+    """
+    Возвращает количество отклонённых запросов по каждому scope.
+    """
+    keys = {f"{REJECTED_KEY_PREFIX}:{scope}": scope for scope in scopes}
+    values = get_cache().get_many(keys)
+    return {scope: values.get(key, 0) for key, scope in keys.items()}
+
+
+class SlidingWindowRateThrottle(BaseThrottle):
+    """
+    Базовый класс: лимит по скользящему окну для view.throttle_scope.
+    Подклассы определяют суффикс лимита и идентификатор клиента.
+    """
+
+    rate_suffix = ""
+
+    def get_ident_key(self, request):
+        """
+        Возвращает идентификатор клиента для ключа кэша или None,
+        если запрос не нужно ограничивать.
+        """
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        rate = settings.THROTTLE_RATES.get(f"{scope}{self.rate_suffix}")
+        if scope is None or not rate:
+            return True
+
+        ident = self.get_ident_key(request)
+        if ident is None:
+            return True
+
+        self.num_requests, self.period = parse_rate(rate)
+        window, elapsed = divmod(time.time(), self.period)
+        self.elapsed = elapsed / self.period
+
+        cache = get_cache()
+        key = f"throttle:{scope}{self.rate_suffix}:{ident}"
+        current_key = f"{key}:{int(window)}"
+        # Окно хранится два периода: следующее окно учитывает его с весом
+        cache.add(current_key, 0, timeout=self.period * 2)
+        try:
+            self.current = cache.incr(current_key)
+        except ValueError:
+            cache.set(current_key, 1, timeout=self.period * 2)
+            self.current = 1
+        self.previous = cache.get(f"{key}:{int(window) - 1}", 0)
+
+        if self.previous * (1 - self.elapsed) + self.current <= self.num_requests:
+            return True
+
+        # Отклонённые запросы не расходуют лимит
+        cache.decr(current_key)
+        self.current -= 1
+        record_rejection(scope)
+        return False
+
+    def wait(self):
+        """
+        Сколько секунд ждать, пока вес предыдущего окна не снизится достаточно.
+        """
+        free = self.num_requests - self.current - 1
+        if self.previous and free >= 0:
+            elapsed_needed = 1 - free / self.previous
+            return max((elapsed_needed - self.elapsed) * self.period, 0)
+        return (1 - self.elapsed) * self.period
+
+
+class IPRateThrottle(SlidingWindowRateThrottle):
+    """
+    Лимит на IP-адрес клиента (с учётом NUM_PROXIES за nginx).
+    """
+
+    def get_ident_key(self, request):
+        return self.get_ident(request)
+
+
+class AccountRateThrottle(SlidingWindowRateThrottle):
+    """
+    Лимит на учётную запись: email из тела запроса (вход, регистрация,
+    сброс пароля). В ключ кэша попадает хэш, а не сам email.
+    """
+
+    rate_suffix = "_account"
+
+    def get_ident_key(self, request):
+        email = request.data.get("email") if hasattr(request.data, "get") else None
+        if not isinstance(email, str) or not email.strip():
+            return None
+        return hashlib.sha256(email.strip().lower().encode()).hexdigest()[:32]
+
+
+# Набор лимитов для анонимных эндпоинтов аутентификации
+AUTH_THROTTLE_CLASSES = (IPRateThrottle, AccountRateThrottle)
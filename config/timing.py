@@ -0,0 +1,91 @@
+"""
+Замеры обработки текущего запроса: запросы к БД, обращения к кэшу,
+время кода представления и рендеринга ответа.
+
+RequestMetricsMiddleware (config.middleware) создаёт RequestTimings
+и сохраняет его в контекстной переменной на время запроса. Запросы к БД
+учитываются через connection.execute_wrapper, обращения к кэшу - в бэкендах
+из config.cache. Вне запроса (Celery, команды) замеры не ведутся.
+"""
+
+import time
+from contextvars import ContextVar
+
+current_timings = ContextVar("current_timings", default=None)
+
+
+class RequestTimings:
+    """
+    Замеры одного запроса. Время в секундах.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.render_started = None
+        self.finished = None
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def total(self):
+        return self.finished - self.started
+
+    @property
+    def view(self):
+        """
+        Код представления и сериализаторов без учёта запросов к БД.
+        """
+        started = self.view_started or self.started
+        finished = self.render_started or self.finished
+        return max(finished - started - self.db_time, 0.0)
+
+    @property
+    def render(self):
+        """
+        Рендеринг ответа (TemplateResponse и Response DRF).
+        """
+        if self.render_started is None:
+            return 0.0
+        return self.finished - self.render_started
+
+    def server_timing(self):
+        """
+        Значение заголовка Server-Timing (длительности в миллисекундах).
+        """
+        return ", ".join(
+            [
+                f"total;dur={self.total * 1000:.1f}",
+                f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"',
+                f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+                f"view;dur={self.view * 1000:.1f}",
+                f"render;dur={self.render * 1000:.1f}",
+            ]
+        )
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Обёртка connection.execute_wrapper: время и количество запросов к БД.
+    """
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db_time += time.perf_counter() - started
+        timings.db_queries += 1
+
+
+def record_cache_lookup(hits, misses):
+    timings = current_timings.get()
+    if timings is not None:
+        timings.cache_hits += hits
+        timings.cache_misses += misses
@@ -2,46 +2,59 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularRedocView,
-    SpectacularSwaggerView,
-)
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
-from rest_framework import permissions
 
-schema_view = get_schema_view(
-    openapi.Info(
-        title="API Documentation",
-        default_version="v1",
-        description="API for Habit-tracker",
-        terms_of_service="https://www.example.com/policies/terms/",
-        contact=openapi.Contact(email="contact@example.com"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+from config.schema import RedocView, SwaggerView, schema_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("users/", include("users.urls", namespace="users")),
     path("habits/", include("habits.urls", namespace="habits")),
-    # path(
-    #     "swagger/",
-    #     schema_view.with_ui("swagger", cache_timeout=0),
-    #     name="schema-swagger-ui",
-    # ),
-    # path("redoc/", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"),
-    # path('api/schema/', SpectacularAPIView.as_view(permission_classes=[CanViewAPI]), name='schema'),
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
-    path(
-        "swagger/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"
-    ),
-    path("redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
+    # Асинхронные варианты эндпоинтов чтения (эффективны под ASGI)
+    path("async/habits/", include("habits.async_urls", namespace="habits-async")),
+    # Схема собирается один раз (config/schema.py, команда build_schema)
+    path("api/schema/", schema_view, name="schema"),
+    path("api/schema/<str:digest>/", schema_view, name="schema-versioned"),
+    path("swagger/", SwaggerView.as_view(), name="swagger-ui"),
+    path("redoc/", RedocView.as_view(), name="redoc"),
 ]
 
+# Альтернативная документация drf_yasg (необязательная зависимость)
+if settings.ENABLE_DRF_YASG:
+    from drf_yasg import openapi
+    from drf_yasg.views import get_schema_view
+    from rest_framework import permissions
+
+    yasg_schema_view = get_schema_view(
+        openapi.Info(
+            title="API Documentation",
+            default_version="v1",
+            description="API for Habit-tracker",
+            terms_of_service="https://www.example.com/policies/terms/",
+            contact=openapi.Contact(email="contact@example.com"),
+            license=openapi.License(name="BSD License"),
+        ),
+        public=True,
+        permission_classes=(permissions.AllowAny,),
+    )
+    urlpatterns += [
+        path(
+            "yasg/swagger/",
+            yasg_schema_view.with_ui("swagger", cache_timeout=0),
+            name="schema-swagger-ui",
+        ),
+        path(
+            "yasg/redoc/",
+            yasg_schema_view.with_ui("redoc", cache_timeout=0),
+            name="schema-redoc",
+        ),
+    ]
+
+# Метрики Prometheus (необязательная зависимость prometheus_client)
+if settings.METRICS_ENABLED:
+    from config.metrics import metrics_view
+
+    urlpatterns.append(path("metrics", metrics_view, name="metrics"))
+
 # Добавляем маршруты для работы с медиафайлами только в режиме разработки
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -5,3 +5,6 @@ class HabitsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "habits"
     verbose_name = "Habits"
+
+    def ready(self):
+        import habits.signals  # noqa: F401
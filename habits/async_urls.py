@@ -0,0 +1,11 @@
+from django.urls import path
+
+from habits import async_views
+
+app_name = "habits-async"
+
+urlpatterns = [
+    path("", async_views.habit_list, name="habit-list"),
+    path("public/", async_views.public_habit_list, name="public-habits-list"),
+    path("<int:pk>/", async_views.habit_detail, name="habit-detail"),
+]
@@ -0,0 +1,178 @@
+"""
+Асинхронные варианты эндпоинтов чтения привычек (лента публичных привычек,
+список и детальная информация о привычках пользователя).
+
+Под ASGI-сервером (gunicorn с uvicorn worker) запросы обслуживаются в цикле
+событий: ожидание БД и медленных клиентов не занимает поток воркера.
+Данные сериализуются тем же HabitSerializer и фильтруются тем же HabitFilter,
+поэтому ответы совпадают с синхронными эндпоинтами DRF.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from django.http import HttpResponseNotAllowed, JsonResponse
+from djangorestframework_camel_case.util import camelize
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from config.throttling import IPRateThrottle
+from habits.filters import HabitFilter
+from habits.models import Habit
+from habits.paginations import HabitPaginator
+from habits.serializers import HabitSerializer
+from habits.views import PublicHabitListApiView
+from users.authentication import CachedJWTAuthentication
+
+
+def json_response(data, status=200, **kwargs):
+    """
+    Ответ в том же формате, что и CamelCaseJSONRenderer.
+    """
+    return JsonResponse(
+        camelize(data),
+        status=status,
+        safe=False,
+        json_dumps_params={"ensure_ascii": False},
+        **kwargs,
+    )
+
+
+async def authenticate(request):
+    """
+    JWT-аутентификация (с кэшем пользователя) вне DRF.
+    Возвращает пользователя или ответ с ошибкой 401.
+    """
+    try:
+        result = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+    except AuthenticationFailed as exc:
+        return None, json_response(exc.get_full_details(), status=401)
+    if result is None:
+        return None, json_response(
+            {"detail": "Учетные данные не были предоставлены."}, status=401
+        )
+    return result[0], None
+
+
+def parse_int(value, default, maximum=None):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    if value < 1:
+        return default
+    return min(value, maximum) if maximum else value
+
+
+async def paginate(request, queryset):
+    """
+    Постраничная выдача с параметрами и форматом HabitPaginator.
+    """
+    page_size = parse_int(
+        request.GET.get(HabitPaginator.page_size_query_param),
+        HabitPaginator.page_size,
+        HabitPaginator.max_page_size,
+    )
+    page = parse_int(request.GET.get("page"), None)
+    if page is None and "page" in request.GET:
+        raise InvalidPage
+    page = page or 1
+
+    count = await queryset.acount()
+    offset = (page - 1) * page_size
+    end = offset + page_size
+    if page > 1 and offset >= count:
+        raise InvalidPage
+
+    habits = [habit async for habit in queryset[offset:end]]
+
+    url = request.build_absolute_uri()
+    next_url = previous_url = None
+    if end < count:
+        next_url = replace_query_param(url, "page", page + 1)
+    if page == 2:
+        previous_url = remove_query_param(url, "page")
+    elif page > 2:
+        previous_url = replace_query_param(url, "page", page - 1)
+
+    return {
+        "count": count,
+        "next": next_url,
+        "previous": previous_url,
+        "results": HabitSerializer(habits, many=True).data,
+    }
+
+
+async def list_response(request, queryset):
+    filterset = HabitFilter(request.GET, queryset=queryset)
+    if not filterset.is_valid():
+        return json_response(filterset.errors, status=400)
+    try:
+        data = await paginate(request, filterset.qs)
+    except InvalidPage:
+        return json_response({"detail": "Неправильная страница"}, status=404)
+    except ValidationError as exc:
+        # Ошибки фильтров, возникающие при выполнении запроса (короткий поиск)
+        return json_response(exc.detail, status=400)
+    return json_response(data)
+
+
+def owner_habits(user):
+    return (
+        Habit.objects.filter(owner=user).select_related("linked_action").order_by("id")
+    )
+
+
+async def public_habit_list(request):
+    """
+    Лента публичных привычек (асинхронный вариант /habits/public/).
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+
+    throttle = IPRateThrottle()
+    allowed = await sync_to_async(throttle.allow_request)(
+        request, PublicHabitListApiView
+    )
+    if not allowed:
+        wait = throttle.wait()
+        return json_response(
+            {"detail": "Запрос был проигнорирован."},
+            status=429,
+            headers={"Retry-After": str(int(wait) + 1)},
+        )
+
+    queryset = PublicHabitListApiView.queryset.select_related("linked_action")
+    return await list_response(request, queryset)
+
+
+async def habit_list(request):
+    """
+    Привычки текущего пользователя (асинхронный вариант GET /habits/).
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+
+    user, error = await authenticate(request)
+    if error:
+        return error
+    return await list_response(request, owner_habits(user))
+
+
+async def habit_detail(request, pk):
+    """
+    Привычка текущего пользователя (асинхронный вариант GET /habits/<pk>/).
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+
+    user, error = await authenticate(request)
+    if error:
+        return error
+    try:
+        habit = await owner_habits(user).aget(pk=pk)
+    except Habit.DoesNotExist:
+        return json_response({"detail": "Страница не найдена."}, status=404)
+
+    response = json_response(HabitSerializer(habit).data)
+    response["ETag"] = f'"{habit.version}"'
+    return response
@@ -0,0 +1,64 @@
+"""
+Telegram-бот трекера привычек.
+
+Бот создаётся лениво при первом обращении (get_bot), а не при импорте:
+модуль habits.tasks импортируется в каждом процессе Celery (worker и beat)
+и в web-процессах, где бот не нужен.
+"""
+
+from functools import lru_cache
+
+from django.conf import settings
+
+
+def start(message):
+    """
+    Обработчик команды /start.
+    Отправляет приветственное сообщение с кнопкой.
+    """
+    from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+    markup = InlineKeyboardMarkup()
+    markup.add(InlineKeyboardButton("Мои привычки", callback_data="my_habits"))
+    get_bot().send_message(
+        message.chat.id,
+        "Привет! Я ваш трекер привычек. Вы можете управлять своими привычками здесь.",
+        reply_markup=markup,
+    )
+
+
+def show_habits(call):
+    """
+    Callback-кнопка "Мои привычки": показывает список привычек пользователя.
+    """
+    # Импортируем модель внутри функции, чтобы избежать циклических зависимостей
+    from habits.models import Habit
+
+    bot = get_bot()
+    user_tg_id = call.message.chat.id
+    habits = Habit.objects.filter(owner__tg_id=user_tg_id)
+
+    if not habits.exists():
+        bot.send_message(call.message.chat.id, "У вас пока нет привычек.")
+        return
+
+    message = "Ваши привычки:\n\n"
+    for habit in habits:
+        message += f"- {habit.action} (в {habit.time.strftime('%H:%M')})\n"
+
+    bot.send_message(call.message.chat.id, message)
+
+
+@lru_cache(maxsize=None)
+def get_bot():
+    """
+    Возвращает экземпляр бота (один на процесс) с зарегистрированными обработчиками.
+    """
+    import telebot
+
+    bot = telebot.TeleBot(settings.TELEGRAM_BOT_TOKEN)
+    bot.register_message_handler(start, commands=["start"])
+    bot.register_callback_query_handler(
+        show_habits, func=lambda call: call.data == "my_habits"
+    )
+    return bot
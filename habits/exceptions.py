@@ -0,0 +1,12 @@
+from rest_framework.exceptions import APIException
+
+
+class PreconditionFailed(APIException):
+    """
+    Исключение для конфликта версий при оптимистичной блокировке.
+    Возвращается, если привычка была изменена после получения клиентом.
+    """
+
+    status_code = 412
+    default_detail = "Привычка была изменена другим запросом. Обновите данные."
+    default_code = "precondition_failed"
@@ -0,0 +1,45 @@
+from django.db.models import Q
+from django_filters import rest_framework as filters
+from rest_framework.exceptions import ValidationError
+
+from habits.models import Habit
+
+# Минимальная длина поисковой строки: триграммный индекс (pg_trgm)
+# не используется для строк короче трёх символов
+SEARCH_MIN_LENGTH = 3
+
+
+class HabitFilter(filters.FilterSet):
+    """
+    Фильтры для списков привычек.
+
+    - time_after / time_before: диапазон времени выполнения;
+    - duration_min / duration_max: границы времени на выполнение (в секундах);
+    - frequency, is_pleasant: точное совпадение;
+    - search: поиск подстроки в действии и месте
+      (на PostgreSQL обслуживается GIN-индексами pg_trgm).
+    """
+
+    time_after = filters.TimeFilter(field_name="time", lookup_expr="gte")
+    time_before = filters.TimeFilter(field_name="time", lookup_expr="lte")
+    duration_min = filters.NumberFilter(field_name="duration", lookup_expr="gte")
+    duration_max = filters.NumberFilter(field_name="duration", lookup_expr="lte")
+    search = filters.CharFilter(method="filter_search", label="Поиск")
+
+    class Meta:
+        model = Habit
+        fields = ("frequency", "is_pleasant")
+
+    def filter_search(self, queryset, name, value):
+        """
+        Поиск подстроки в полях action и location без учёта регистра
+        (на SQLite регистр не учитывается только для латиницы).
+        """
+        value = value.strip()
+        if len(value) < SEARCH_MIN_LENGTH:
+            raise ValidationError(
+                {name: [f"Минимальная длина запроса - {SEARCH_MIN_LENGTH} символа."]}
+            )
+        return queryset.filter(
+            Q(action__icontains=value) | Q(location__icontains=value)
+        )
@@ -0,0 +1,225 @@
+"""
+Сценарии нагрузочного теста API (команда loadtest).
+
+Виртуальный пользователь держит своё keep-alive соединение с сервером,
+получает JWT через users/login/ и выполняет действия по весам сценария:
+список и создание привычек, изменение своих привычек, просмотр ленты
+публичных привычек, обновление access-токена. Длительность каждого
+запроса записывается под именем действия.
+"""
+
+import http.client
+import json
+import time
+from datetime import time as dt_time
+from urllib.parse import urlsplit
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Count
+
+from habits import rollups
+from habits.models import Habit
+from users.cache import invalidate_cached_user
+from users.models import User
+
+# Веса действий в сценариях
+SCENARIOS = {
+    "mixed": {"list": 35, "public": 30, "create": 10, "update": 20, "refresh": 5},
+    "read": {"list": 50, "public": 50},
+    "write": {"create": 50, "update": 50},
+    "public": {"public": 100},
+}
+
+EMAIL_TEMPLATE = "loadtest-{}@example.com"
+DEFAULT_PASSWORD = "loadtest-password"
+
+
+def seed_data(users, habits_per_user, password=DEFAULT_PASSWORD):
+    """
+    Создаёт активных пользователей loadtest-N@example.com и их привычки
+    (каждая пятая - публичная). Повторный запуск дополняет недостающее.
+    Возвращает список email.
+    """
+    emails = [EMAIL_TEMPLATE.format(index) for index in range(users)]
+    # Один хэш на всех: хэширование пароля - самая долгая часть подготовки
+    password_hash = make_password(password)
+
+    existing = set(
+        User.objects.filter(email__in=emails).values_list("email", flat=True)
+    )
+    User.objects.bulk_create(
+        User(email=email, password=password_hash, is_active=True)
+        for email in emails
+        if email not in existing
+    )
+    owners = list(User.objects.filter(email__in=emails).only("id"))
+    User.objects.filter(email__in=existing).update(
+        password=password_hash, is_active=True
+    )
+    for owner in owners:
+        invalidate_cached_user(owner.pk)
+
+    counts = dict(
+        Habit.objects.filter(owner__in=owners)
+        .values("owner")
+        .annotate(total=Count("id"))
+        .values_list("owner", "total")
+    )
+    habits = []
+    for owner in owners:
+        for index in range(counts.get(owner.pk, 0), habits_per_user):
+            habits.append(
+                Habit(
+                    owner=owner,
+                    location="Дом",
+                    time=dt_time(hour=index % 24),
+                    action=f"Нагрузочная привычка {index}",
+                    duration=60,
+                    frequency=1,
+                    reward="Отдых",
+                    is_public=index % 5 == 0,
+                )
+            )
+    with transaction.atomic():
+        Habit.objects.bulk_create(habits, batch_size=1000)
+        rollups.record(added=map(rollups.rollup_key, habits))
+    return emails
+
+
+class VirtualUser:
+    """
+    Пользователь API со своим HTTP-соединением и JWT.
+    """
+
+    def __init__(self, base_url, email, password, timeout):
+        url = urlsplit(base_url)
+        connection_class = (
+            http.client.HTTPSConnection
+            if url.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self.connection = connection_class(url.hostname, url.port, timeout=timeout)
+        self.prefix = url.path.rstrip("/")
+        self.email = email
+        self.password = password
+        self.access = self.refresh = None
+        self.habit_ids = []
+        self.public_pages = 1
+        # (действие, статус, длительность в секундах); статус 0 - ошибка соединения
+        self.samples = []
+
+    def request(self, name, method, path, body=None, auth=True):
+        headers = {"Accept": "application/json"}
+        if body is not None:
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        if auth and self.access:
+            headers["Authorization"] = f"Bearer {self.access}"
+
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, self.prefix + path, body, headers)
+            response = self.connection.getresponse()
+            content = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            # Соединение будет открыто заново при следующем запросе
+            self.connection.close()
+            content, status = b"", 0
+        self.samples.append((name, status, time.perf_counter() - started))
+
+        data = None
+        if content and status and response.headers.get_content_type().endswith("json"):
+            data = json.loads(content)
+        if status == 401 and name != "refresh":
+            self.refresh_token()
+        return status, data, response.headers if status else {}
+
+    def login(self, retries=5):
+        """
+        Получает пару JWT. Ответ 429 (лимит входа) повторяется после Retry-After.
+        """
+        for _ in range(retries):
+            status, data, headers = self.request(
+                "login",
+                "POST",
+                "/users/login/",
+                {"email": self.email, "password": self.password},
+                auth=False,
+            )
+            if status == 200:
+                self.access, self.refresh = data["access"], data["refresh"]
+                return True
+            if status != 429:
+                break
+            time.sleep(min(float(headers.get("Retry-After", 1)), 60))
+        return False
+
+    def refresh_token(self):
+        status, data, _ = self.request(
+            "refresh", "POST", "/users/token/refresh/", {"refresh": self.refresh}
+        )
+        if status == 200:
+            self.access = data["access"]
+
+    def close(self):
+        self.connection.close()
+
+
+def list_habits(user, rng):
+    status, data, _ = user.request("list", "GET", "/habits/")
+    if status == 200 and not user.habit_ids:
+        user.habit_ids = [
+            habit["id"] for habit in data["results"] if not habit["isPublic"]
+        ]
+
+
+def browse_public(user, rng):
+    page = rng.randint(1, user.public_pages)
+    status, data, _ = user.request("public", "GET", f"/habits/public/?page={page}")
+    if status == 200 and data["results"]:
+        user.public_pages = max(1, -(-data["count"] // len(data["results"])))
+
+
+def create_habit(user, rng):
+    status, data, _ = user.request(
+        "create",
+        "POST",
+        "/habits/",
+        {
+            "location": rng.choice(["Дом", "Парк", "Офис"]),
+            "time": f"{rng.randint(0, 23):02d}:{rng.choice([0, 30]):02d}",
+            "action": "Нагрузочная привычка",
+            "duration": rng.randint(10, 120),
+            "frequency": rng.randint(1, 7),
+            "reward": "Отдых",
+        },
+    )
+    if status == 201:
+        user.habit_ids.append(data["id"])
+
+
+def update_habit(user, rng):
+    if not user.habit_ids:
+        return list_habits(user, rng)
+    habit_id = rng.choice(user.habit_ids)
+    user.request(
+        "update",
+        "PATCH",
+        f"/habits/{habit_id}/",
+        {"duration": rng.randint(10, 120), "location": rng.choice(["Дом", "Парк"])},
+    )
+
+
+def refresh_token(user, rng):
+    user.refresh_token()
+
+
+ACTIONS = {
+    "list": list_habits,
+    "public": browse_public,
+    "create": create_habit,
+    "update": update_habit,
+    "refresh": refresh_token,
+}
@@ -0,0 +1,51 @@
+import statistics
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает время простого запроса к БД с новым соединением "
+        "и с переиспользованным (постоянным) соединением."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--database", default="default")
+
+    def query(self, connection):
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        return (time.perf_counter() - started) * 1000
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations должен быть не меньше 1.")
+        connection = connections[options["database"]]
+        iterations = options["iterations"]
+
+        new = []
+        for _ in range(iterations):
+            connection.close()
+            new.append(self.query(connection))
+
+        self.query(connection)  # открываем соединение заранее
+        reused = [self.query(connection) for _ in range(iterations)]
+
+        self.stdout.write(f"{'mode':<12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for mode, durations in (("new", new), ("reused", reused)):
+            if len(durations) > 1:
+                cuts = statistics.quantiles(durations, n=100, method="inclusive")
+                p50, p95 = cuts[49], cuts[94]
+            else:
+                p50 = p95 = durations[0]
+            self.stdout.write(
+                f"{mode:<12}{statistics.mean(durations):>10.2f}"
+                f"{p50:>10.2f}{p95:>10.2f}"
+            )
+        setup = statistics.mean(new) - statistics.mean(reused)
+        self.stdout.write(f"Установка соединения: ~{setup:.2f} мс на запрос")
@@ -0,0 +1,79 @@
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management import BaseCommand, CommandError
+
+
+def fetch(url, headers, timeout):
+    """
+    Выполняет GET-запрос и возвращает (длительность в секундах, успех).
+    """
+    request = urllib.request.Request(url, headers=headers)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            ok = response.status == 200
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнительный нагрузочный тест синхронных и асинхронных эндпоинтов чтения. "
+        "Запускается против работающего сервера (WSGI или ASGI)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument(
+            "--paths",
+            nargs="+",
+            default=["/habits/public/", "/async/habits/public/"],
+        )
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--token", help="JWT access-токен для закрытых эндпоинтов")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1:
+            raise CommandError("--requests должен быть не меньше 1.")
+        headers = {"Accept": "application/json"}
+        if options["token"]:
+            headers["Authorization"] = f"Bearer {options['token']}"
+
+        self.stdout.write(
+            f"{'path':<32}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+        )
+        for path in options["paths"]:
+            url = options["base_url"].rstrip("/") + path
+            # Прогрев: соединения с БД, кэши, импорт кода в воркерах
+            fetch(url, headers, options["timeout"])
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(options["concurrency"]) as executor:
+                results = list(
+                    executor.map(
+                        lambda _: fetch(url, headers, options["timeout"]),
+                        range(options["requests"]),
+                    )
+                )
+            elapsed = time.perf_counter() - started
+
+            durations = [duration * 1000 for duration, _ in results]
+            errors = sum(1 for _, ok in results if not ok)
+            if len(durations) > 1:
+                cuts = statistics.quantiles(durations, n=100, method="inclusive")
+                p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+            else:
+                p50 = p95 = p99 = durations[0]
+            self.stdout.write(
+                f"{path:<32}{len(results) / elapsed:>9.1f}"
+                f"{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}"
+                f"{errors:>8}"
+            )
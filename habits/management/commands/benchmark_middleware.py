@@ -0,0 +1,147 @@
+import statistics
+import sys
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import BaseCommand, CommandError
+from django.test import override_settings
+
+# Исходный порядок middleware (CorsMiddleware в конце списка)
+LEGACY_MIDDLEWARE = [
+    "config.middleware.HealthCheckMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "corsheaders.middleware.CorsMiddleware",
+]
+
+PROFILES = {
+    "legacy": LEGACY_MIDDLEWARE,
+    "full": [
+        "config.middleware.HealthCheckMiddleware",
+        "corsheaders.middleware.CorsMiddleware",
+        "django.middleware.security.SecurityMiddleware",
+        "django.middleware.common.CommonMiddleware",
+        *settings.FULL_STACK_MIDDLEWARE,
+    ],
+    "api": [
+        "config.middleware.HealthCheckMiddleware",
+        "corsheaders.middleware.CorsMiddleware",
+        "django.middleware.security.SecurityMiddleware",
+        "django.middleware.common.CommonMiddleware",
+        "config.middleware.FullStackMiddleware",
+    ],
+}
+
+# Запросы без обращения к БД: preflight CORS и GET без токена (ответ 401),
+# так что время ответа определяется middleware, маршрутизацией и DRF
+SCENARIOS = {
+    "preflight": {
+        "REQUEST_METHOD": "OPTIONS",
+        "PATH_INFO": "/habits/public/",
+        "HTTP_ORIGIN": "http://localhost:3000",
+        "HTTP_ACCESS_CONTROL_REQUEST_METHOD": "GET",
+    },
+    "get-401": {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": "/habits/",
+        "HTTP_ORIGIN": "http://localhost:3000",
+        "HTTP_ACCEPT": "application/json",
+    },
+}
+
+
+def make_environ(scenario):
+    return {
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "HTTP_HOST": "localhost",
+        "REMOTE_ADDR": "127.0.0.1",
+        "SCRIPT_NAME": "",
+        "QUERY_STRING": "",
+        "wsgi.url_scheme": "http",
+        "wsgi.input": BytesIO(),
+        "wsgi.errors": sys.stderr,
+        **SCENARIOS[scenario],
+    }
+
+
+def start_response(status, headers, exc_info=None):
+    return None
+
+
+def measure(handler, scenario, requests):
+    """
+    Выполняет запросы через WSGI-обработчик (без сети и сервера).
+    Возвращает длительности запросов в микросекундах.
+    """
+    durations = []
+    for _ in range(requests):
+        environ = make_environ(scenario)
+        started = time.perf_counter()
+        response = handler(environ, start_response)
+        b"".join(response)
+        response.close()
+        durations.append((time.perf_counter() - started) * 1e6)
+    return durations
+
+
+class Command(BaseCommand):
+    help = (
+        "Микро-бенчмарк накладных расходов цепочки middleware на запрос: "
+        "исходный порядок (legacy), полный стек и профиль api."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "profiles",
+            nargs="*",
+            help=f"профили: {', '.join(PROFILES)} (по умолчанию все)",
+        )
+        parser.add_argument("--requests", type=int, default=5000)
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="количество серий (выводится лучшая медиана)",
+        )
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["repeat"] < 1:
+            raise CommandError("--requests и --repeat должны быть не меньше 1.")
+        unknown = set(options["profiles"]) - set(PROFILES)
+        if unknown:
+            raise CommandError(f"Неизвестные профили: {', '.join(sorted(unknown))}")
+
+        self.stdout.write(
+            f"{'profile':<10}{'scenario':<12}{'p50 us':>10}{'p95 us':>10}"
+        )
+        for profile in options["profiles"] or PROFILES:
+            # Лимиты запросов отключены, чтобы измерять только middleware
+            with override_settings(
+                MIDDLEWARE=PROFILES[profile],
+                ALLOWED_HOSTS=["localhost"],
+                THROTTLE_RATES={},
+            ):
+                handler = WSGIHandler()
+                for scenario in SCENARIOS:
+                    measure(handler, scenario, 100)  # прогрев
+                    runs = [
+                        measure(handler, scenario, options["requests"])
+                        for _ in range(options["repeat"])
+                    ]
+                    best = min(runs, key=statistics.median)
+                    if len(best) > 1:
+                        cuts = statistics.quantiles(best, n=100, method="inclusive")
+                        p50, p95 = cuts[49], cuts[94]
+                    else:
+                        p50 = p95 = best[0]
+                    self.stdout.write(
+                        f"{profile:<10}{scenario:<12}{p50:>10.1f}{p95:>10.1f}"
+                    )
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from config.schema import generate_schema
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует схему OpenAPI (YAML и JSON, сжатые gzip) в OPENAPI_SCHEMA_DIR. "
+        "Запускается при сборке/старте контейнера, /api/schema/ отдаёт готовые файлы."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=settings.OPENAPI_SCHEMA_DIR,
+            help="каталог для файлов схемы (по умолчанию OPENAPI_SCHEMA_DIR)",
+        )
+
+    def handle(self, *args, **options):
+        schema = generate_schema()
+        schema.write(options["output"])
+        sizes = ", ".join(
+            f"{fmt} {len(data) // 1024} КБ (gzip {len(schema.compressed[fmt]) // 1024} КБ)"
+            for fmt, data in schema.documents.items()
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Схема {schema.digest} записана в {options['output']}: {sizes}"
+            )
+        )
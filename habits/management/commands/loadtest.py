@@ -0,0 +1,158 @@
+import itertools
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management import BaseCommand, CommandError
+
+from habits.loadtest import (
+    ACTIONS,
+    DEFAULT_PASSWORD,
+    EMAIL_TEMPLATE,
+    SCENARIOS,
+    VirtualUser,
+    seed_data,
+)
+
+
+def summarize(samples, elapsed):
+    """
+    Пропускная способность и перцентили задержки (мс) по списку (статус, секунды).
+    """
+    durations = sorted(duration * 1000 for _, duration in samples)
+    statuses = defaultdict(int)
+    for status, _ in samples:
+        statuses[str(status)] += 1
+    if len(durations) > 1:
+        cuts = statistics.quantiles(durations, n=100, method="inclusive")
+        p50, p90, p95, p99 = cuts[49], cuts[89], cuts[94], cuts[98]
+    else:
+        p50 = p90 = p95 = p99 = durations[0]
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for status, _ in samples if not 200 <= status < 400),
+        "statuses": dict(statuses),
+        "rps": round(len(samples) / elapsed, 1),
+        "latency_ms": {
+            "mean": round(statistics.fmean(durations), 2),
+            "p50": round(p50, 2),
+            "p90": round(p90, 2),
+            "p95": round(p95, 2),
+            "p99": round(p99, 2),
+            "max": round(durations[-1], 2),
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест API против запущенного сервера: подготовка пользователей "
+        "и привычек в БД, вход через users/login/, сценарий запросов (habits.loadtest) "
+        "с заданной конкурентностью. Результат - JSON с RPS и перцентилями по эндпоинтам. "
+        "Лимиты запросов сервера (THROTTLE_*_RATE) стоит поднять на время теста."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--scenario", choices=SCENARIOS, default="mixed")
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=10,
+            help="виртуальные пользователи (одновременные соединения)",
+        )
+        parser.add_argument("--duration", type=float, default=30, help="секунды")
+        parser.add_argument(
+            "--requests", type=int, help="остановиться после N запросов сценария"
+        )
+        parser.add_argument("--habits-per-user", type=int, default=20)
+        parser.add_argument(
+            "--no-seed",
+            action="store_true",
+            help="не создавать данные (пользователи loadtest-N@example.com уже есть)",
+        )
+        parser.add_argument("--password", default=DEFAULT_PASSWORD)
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--random-seed", type=int, default=0)
+        parser.add_argument(
+            "--output", help="файл для JSON-отчёта (по умолчанию stdout)"
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 1:
+            raise CommandError("Нужен хотя бы один виртуальный пользователь.")
+
+        if options["no_seed"]:
+            emails = [EMAIL_TEMPLATE.format(index) for index in range(options["users"])]
+        else:
+            emails = seed_data(
+                options["users"], options["habits_per_user"], options["password"]
+            )
+
+        users = [
+            VirtualUser(
+                options["base_url"], email, options["password"], options["timeout"]
+            )
+            for email in emails
+        ]
+        logged_in = [user.login() for user in users]
+        if not all(logged_in):
+            raise CommandError(
+                f"Не удалось войти {logged_in.count(False)} пользователям "
+                f"(проверьте --base-url, ALLOWED_HOSTS и THROTTLE_LOGIN_RATE сервера)."
+            )
+
+        weights = SCENARIOS[options["scenario"]]
+        deadline = time.monotonic() + options["duration"]
+        budget = itertools.count()
+        limit = options["requests"]
+
+        def run(index):
+            user = users[index]
+            rng = random.Random(options["random_seed"] + index)
+            while time.monotonic() < deadline and (
+                limit is None or next(budget) < limit
+            ):
+                action = rng.choices(list(weights), weights=list(weights.values()))[0]
+                ACTIONS[action](user, rng)
+
+        # Вход не входит в замер сценария
+        for user in users:
+            user.samples.clear()
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(len(users)) as executor:
+            list(executor.map(run, range(len(users))))
+        elapsed = time.monotonic() - started
+        for user in users:
+            user.close()
+
+        by_action = defaultdict(list)
+        for user in users:
+            for name, status, duration in user.samples:
+                by_action[name].append((status, duration))
+        all_samples = [sample for samples in by_action.values() for sample in samples]
+
+        report = {
+            "scenario": options["scenario"],
+            "base_url": options["base_url"],
+            "users": len(users),
+            "elapsed_s": round(elapsed, 2),
+            "total": summarize(all_samples, elapsed) if all_samples else None,
+            "endpoints": {
+                name: summarize(samples, elapsed)
+                for name, samples in sorted(by_action.items())
+            },
+        }
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(text + "\n")
+            self.stdout.write(
+                self.style.SUCCESS(f"Отчёт записан в {options['output']}")
+            )
+        else:
+            self.stdout.write(text)
@@ -0,0 +1,107 @@
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.core.management import BaseCommand, CommandError
+
+# Код, который выполняет процесс при старте (в чистом интерпретаторе)
+TARGETS = {
+    "web": (
+        "from django.core.wsgi import get_wsgi_application\n"
+        "get_wsgi_application()\n"
+        "from django.urls import get_resolver\n"
+        "get_resolver().url_patterns\n"
+    ),
+    "worker": (
+        "from config.celery import app\n"
+        "import django\n"
+        "django.setup()\n"
+        "from celery.apps.worker import Worker\n"
+        "app.loader.import_default_modules()\n"
+    ),
+    "beat": (
+        "from config.celery import app\n"
+        "import django\n"
+        "django.setup()\n"
+        "from celery.apps.beat import Beat\n"
+        "app.loader.import_default_modules()\n"
+    ),
+}
+
+# import time:       self [us] |  cumulative | imported package
+IMPORT_TIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile(code):
+    """
+    Запускает код в отдельном интерпретаторе с -X importtime.
+    Возвращает время запуска (секунды) и строки отчёта importtime.
+    """
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": "config.settings"}
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed = time.perf_counter() - started
+
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent)))
+    return elapsed, modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Профилирует холодный старт web, Celery worker и beat: "
+        "общее время и время импорта модулей (аналог python -X importtime)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "targets",
+            nargs="*",
+            help=f"процессы: {', '.join(TARGETS)} (по умолчанию все)",
+        )
+        parser.add_argument("--top", type=int, default=15)
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="количество запусков (выводится лучший результат)",
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options["targets"]) - set(TARGETS)
+        if unknown:
+            raise CommandError(f"Неизвестные процессы: {', '.join(sorted(unknown))}")
+
+        for target in options["targets"] or TARGETS:
+            runs = [profile(TARGETS[target]) for _ in range(options["repeat"])]
+            elapsed, modules = min(runs, key=lambda run: run[0])
+
+            # Пакеты верхнего уровня: суммарное собственное время их модулей
+            packages = defaultdict(int)
+            for name, self_us, _, _ in modules:
+                packages[name.split(".")[0]] += self_us
+            total_us = sum(packages.values())
+
+            self.stdout.write(
+                self.style.MIGRATE_HEADING(
+                    f"{target}: запуск {elapsed:.2f} с, импорт модулей "
+                    f"{total_us / 1e6:.2f} с ({len(modules)} модулей)"
+                )
+            )
+            self.stdout.write(f"  {'package':<40}{'self ms':>10}")
+            top = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+            for name, self_us in top[: options["top"]]:
+                self.stdout.write(f"  {name:<40}{self_us / 1000:>10.1f}")
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.2 on 2026-10-19 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="habit",
+            name="version",
+            field=models.PositiveIntegerField(
+                default=1,
+                help_text="Увеличивается при каждом изменении привычки",
+                verbose_name="Версия",
+            ),
+        ),
+    ]
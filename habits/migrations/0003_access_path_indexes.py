@@ -0,0 +1,33 @@
+# Generated by Django 4.2.2 on 2026-10-19 13:14
+
+from django.db import migrations, models
+
+from config.db_operations import AddIndexConcurrentlyIfPostgres
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ("habits", "0002_habit_version"),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfPostgres(
+            model_name="habit",
+            index=models.Index(fields=["owner", "id"], name="habit_owner_id_idx"),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name="habit",
+            index=models.Index(
+                condition=models.Q(("is_public", True)),
+                fields=["id"],
+                name="habit_public_id_idx",
+            ),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name="habit",
+            index=models.Index(fields=["time"], name="habit_time_idx"),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.2 on 2026-10-19 13:16
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+from config.db_operations import AddIndexConcurrentlyIfPostgres
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ("habits", "0003_access_path_indexes"),
+    ]
+
+    operations = [
+        # на других СУБД операция ничего не делает
+        TrigramExtension(),
+        AddIndexConcurrentlyIfPostgres(
+            model_name="habit",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("action"), name="gin_trgm_ops"
+                ),
+                name="habit_action_trgm_idx",
+            ),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name="habit",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("location"),
+                    name="gin_trgm_ops",
+                ),
+                name="habit_location_trgm_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.2 on 2026-10-19 14:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from config.db_operations import CreateRangePartitionedModelIfPostgres
+
+
+def create_partitions(apps, schema_editor):
+    from habits.partitions import create_partitions
+
+    create_partitions(connection=schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("habits", "0004_habit_search_trgm_indexes"),
+    ]
+
+    operations = [
+        # на PostgreSQL - PARTITION BY RANGE (completed_at),
+        # поля в порядке колонок модели (от 8-байтовых к 2-байтовым)
+        CreateRangePartitionedModelIfPostgres(
+            name="HabitCompletion",
+            partition_key="completed_at",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("completed_at", models.DateTimeField(verbose_name="выполнено")),
+                (
+                    "habit",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="completions",
+                        to="habits.habit",
+                        verbose_name="привычка",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="habit_completions",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="пользователь",
+                    ),
+                ),
+                (
+                    "source",
+                    models.PositiveSmallIntegerField(
+                        choices=[(1, "API"), (2, "Telegram"), (3, "Импорт")],
+                        default=1,
+                        verbose_name="источник",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Выполнение привычки",
+                "verbose_name_plural": "Выполнения привычек",
+                "indexes": [
+                    models.Index(
+                        fields=["user", "completed_at"],
+                        name="habit_completion_user_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("habit", "completed_at"),
+                        name="habit_completion_unique",
+                    )
+                ],
+            },
+        ),
+        # секции для текущих и ближайших месяцев (на других СУБД ничего не делает)
+        migrations.RunPython(create_partitions, migrations.RunPython.noop),
+    ]
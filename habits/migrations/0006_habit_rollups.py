@@ -0,0 +1,105 @@
+# Generated by Django 4.2.2 on 2026-10-19 14:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractHour, ExtractMinute
+
+
+def fill_rollups(apps, schema_editor):
+    """
+    Заполняет счётчики по существующим привычкам. Использует исторические
+    модели: habits.rollups работает с текущими моделями и подключением
+    по умолчанию.
+    """
+    db_alias = schema_editor.connection.alias
+    Habit = apps.get_model("habits", "Habit")
+    HabitOwnerRollup = apps.get_model("habits", "HabitOwnerRollup")
+    HabitMinuteRollup = apps.get_model("habits", "HabitMinuteRollup")
+
+    habits = Habit.objects.using(db_alias).order_by()
+    counters = {
+        "total": Count("id"),
+        "public": Count("id", filter=Q(is_public=True)),
+        "pleasant": Count("id", filter=Q(is_pleasant=True)),
+    }
+    owners = habits.values("owner").annotate(**counters)
+    HabitOwnerRollup.objects.using(db_alias).bulk_create(
+        [
+            HabitOwnerRollup(
+                owner_id=row["owner"], **{name: row[name] for name in counters}
+            )
+            for row in owners
+        ],
+        batch_size=500,
+    )
+    minutes = (
+        habits.annotate(minute=ExtractHour("time") * 60 + ExtractMinute("time"))
+        .values("minute")
+        .annotate(**counters)
+    )
+    HabitMinuteRollup.objects.using(db_alias).bulk_create(
+        [
+            HabitMinuteRollup(
+                minute=row["minute"], **{name: row[name] for name in counters}
+            )
+            for row in minutes
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0006_user_avatar_thumbnails"),
+        ("habits", "0005_habitcompletion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HabitMinuteRollup",
+            fields=[
+                (
+                    "minute",
+                    models.SmallIntegerField(
+                        primary_key=True, serialize=False, verbose_name="минута суток"
+                    ),
+                ),
+                ("total", models.IntegerField(default=0, verbose_name="привычек")),
+                ("public", models.IntegerField(default=0, verbose_name="публичных")),
+                ("pleasant", models.IntegerField(default=0, verbose_name="приятных")),
+            ],
+            options={
+                "verbose_name": "Счётчики привычек по минуте",
+                "verbose_name_plural": "Счётчики привычек по минутам",
+            },
+        ),
+        migrations.CreateModel(
+            name="HabitOwnerRollup",
+            fields=[
+                (
+                    "owner",
+                    models.OneToOneField(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="habit_rollup",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="владелец",
+                    ),
+                ),
+                ("total", models.IntegerField(default=0, verbose_name="привычек")),
+                ("public", models.IntegerField(default=0, verbose_name="публичных")),
+                ("pleasant", models.IntegerField(default=0, verbose_name="приятных")),
+            ],
+            options={
+                "verbose_name": "Счётчики привычек владельца",
+                "verbose_name_plural": "Счётчики привычек владельцев",
+            },
+        ),
+        # счётчики существующих привычек
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
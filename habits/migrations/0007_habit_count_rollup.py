@@ -0,0 +1,54 @@
+# Generated by Django 4.2.2 on 2026-10-19 15:12
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_count_rollup(apps, schema_editor):
+    """
+    Заполняет распределение владельцев по счётчикам владельцев
+    (исторические модели, как в 0006_habit_rollups).
+    """
+    db_alias = schema_editor.connection.alias
+    HabitOwnerRollup = apps.get_model("habits", "HabitOwnerRollup")
+    HabitCountRollup = apps.get_model("habits", "HabitCountRollup")
+
+    rows = (
+        HabitOwnerRollup.objects.using(db_alias)
+        .filter(total__gt=0)
+        .order_by()
+        .values("total")
+        .annotate(owners=Count("owner"))
+    )
+    HabitCountRollup.objects.using(db_alias).bulk_create(
+        [HabitCountRollup(habits=row["total"], owners=row["owners"]) for row in rows],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0006_habit_rollups"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HabitCountRollup",
+            fields=[
+                (
+                    "habits",
+                    models.IntegerField(
+                        primary_key=True, serialize=False, verbose_name="привычек"
+                    ),
+                ),
+                ("owners", models.IntegerField(default=0, verbose_name="владельцев")),
+            ],
+            options={
+                "verbose_name": "Распределение владельцев по числу привычек",
+                "verbose_name_plural": "Распределение владельцев по числу привычек",
+            },
+        ),
+        # распределение владельцев с существующими привычками
+        migrations.RunPython(fill_count_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,106 @@
+from django.core.exceptions import FieldDoesNotExist
+from djangorestframework_camel_case.util import camel_to_underscore
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import BaseSerializer
+
+# Описание параметров ?fields= / ?exclude= для документации API
+SPARSE_FIELDS_PARAMETERS = [
+    OpenApiParameter(
+        name="fields",
+        type=str,
+        description="Список возвращаемых полей через запятую",
+    ),
+    OpenApiParameter(
+        name="exclude",
+        type=str,
+        description="Список исключаемых полей через запятую",
+    ),
+]
+
+
+class SparseFieldsetMixin:
+    """
+    Миксин представления для выборочной выдачи полей.
+
+    Поддерживает параметры запроса ?fields= и ?exclude= (имена полей через
+    запятую, в camelCase или snake_case). Набор полей сокращается в сериализаторе,
+    а из БД через .only() выбираются только нужные колонки. Связанные объекты
+    подгружаются через select_related только если их поля запрошены.
+    Применяется только к запросам на чтение.
+    """
+
+    def parse_fields_param(self, name):
+        """
+        Разбирает параметр запроса со списком полей.
+        Возвращает None, если параметр не передан или не содержит полей.
+        """
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+
+        fields = [camel_to_underscore(field.strip()) for field in value.split(",")]
+        fields = [field for field in fields if field]
+        if not fields:
+            return None
+
+        unknown = set(fields) - set(self.get_serializer_class().Meta.fields)
+        if unknown:
+            raise ValidationError({name: [f"Неизвестные поля: {sorted(unknown)}."]})
+        return fields
+
+    def get_sparse_fields(self):
+        """
+        Возвращает аргументы fields/exclude для сериализатора.
+        """
+        request = getattr(self, "request", None)
+        if request is None or request.method not in SAFE_METHODS:
+            return {}
+
+        if not hasattr(self, "_sparse_fields"):
+            self._sparse_fields = {
+                key: value
+                for key, value in (
+                    ("fields", self.parse_fields_param("fields")),
+                    ("exclude", self.parse_fields_param("exclude")),
+                )
+                if value is not None
+            }
+        return self._sparse_fields
+
+    def get_serializer(self, *args, **kwargs):
+        for key, value in self.get_sparse_fields().items():
+            kwargs.setdefault(key, value)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        """
+        Проецирует запрос на колонки, нужные выбранным полям сериализатора.
+        """
+        queryset = super().get_queryset()
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+
+        serializer = self.get_serializer_class()(**self.get_sparse_fields())
+        opts = queryset.model._meta
+
+        columns, related = [], []
+        for field in serializer.fields.values():
+            try:
+                model_field = opts.get_field(field.source)
+            except FieldDoesNotExist:
+                # Поле вычисляется не из колонки модели - проекцию не применяем
+                return queryset
+
+            columns.append(model_field.name)
+            if isinstance(field, BaseSerializer) and model_field.is_relation:
+                related.append(model_field.name)
+                columns.extend(
+                    f"{model_field.name}__{child.source}"
+                    for child in field.fields.values()
+                )
+
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
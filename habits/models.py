@@ -1,5 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.functions import Upper
 
 from users.models import User
 
@@ -21,6 +23,7 @@ class Habit(models.Model):
         reward (str): Вознаграждение за выполнение привычки.
         duration (int): Время на выполнение привычки в секундах.
         is_public (bool): Признак публичности привычки.
+        version (int): Версия записи для оптимистичной блокировки.
     """
 
     owner = models.ForeignKey(
@@ -77,6 +80,11 @@ class Habit(models.Model):
         verbose_name="Публичная",
         help_text="Отметьте, если хотите сделать эту привычку публичной",
     )
+    version = models.PositiveIntegerField(
+        default=1,
+        verbose_name="Версия",
+        help_text="Увеличивается при каждом изменении привычки",
+    )
 
     def clean(self):
         """
@@ -144,3 +152,174 @@ is_public={self.is_public})"""
     class Meta:
         verbose_name = "Привычка"
         verbose_name_plural = "Привычки"
+        indexes = [
+            # список привычек пользователя с сортировкой (HabitViewSet)
+            models.Index(fields=["owner", "id"], name="habit_owner_id_idx"),
+            # лента публичных привычек (PublicHabitListApiView)
+            models.Index(
+                fields=["id"],
+                condition=models.Q(is_public=True),
+                name="habit_public_id_idx",
+            ),
+            # выборка привычек по времени напоминания (send_daily_reminders)
+            models.Index(fields=["time"], name="habit_time_idx"),
+            # поиск подстроки (icontains -> UPPER(...) LIKE) только на PostgreSQL
+            GinIndex(
+                OpClass(Upper("action"), name="gin_trgm_ops"),
+                name="habit_action_trgm_idx",
+            ),
+            GinIndex(
+                OpClass(Upper("location"), name="gin_trgm_ops"),
+                name="habit_location_trgm_idx",
+            ),
+        ]
+
+
+class HabitCompletion(models.Model):
+    """
+    Отметка о выполнении привычки (журнал только на добавление).
+
+    На PostgreSQL таблица секционирована по месяцам (PARTITION BY RANGE
+    по completed_at, см. habits.partitions): старые месяцы архивируются
+    и удаляются целой секцией, запросы за период читают только свои секции.
+    Первичный ключ в БД - (id, completed_at).
+
+    Связи объявлены без ограничений FOREIGN KEY: вставка не проверяет
+    привычку и пользователя в других таблицах. Отметки удаляются вместе
+    с привычкой и пользователем средствами Django (on_delete=CASCADE).
+
+    Атрибуты:
+        completed_at (DateTimeField): Время выполнения.
+        habit (ForeignKey): Выполненная привычка.
+        user (ForeignKey): Владелец привычки на момент отметки.
+        source (int): Источник отметки.
+    """
+
+    SOURCE_API = 1
+    SOURCE_TELEGRAM = 2
+    SOURCE_IMPORT = 3
+    SOURCE_CHOICES = (
+        (SOURCE_API, "API"),
+        (SOURCE_TELEGRAM, "Telegram"),
+        (SOURCE_IMPORT, "Импорт"),
+    )
+
+    # Колонки фиксированной длины от 8 байт к 2: без выравнивающих
+    # промежутков в строке PostgreSQL
+    id = models.BigAutoField(primary_key=True)
+    completed_at = models.DateTimeField(verbose_name="выполнено")
+    habit = models.ForeignKey(
+        Habit,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        db_index=False,
+        related_name="completions",
+        verbose_name="привычка",
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        db_index=False,
+        related_name="habit_completions",
+        verbose_name="пользователь",
+    )
+    source = models.PositiveSmallIntegerField(
+        choices=SOURCE_CHOICES, default=SOURCE_API, verbose_name="источник"
+    )
+
+    class Meta:
+        verbose_name = "Выполнение привычки"
+        verbose_name_plural = "Выполнения привычек"
+        constraints = [
+            # повторная отправка той же отметки не создаёт дубликат;
+            # индекс обслуживает и историю выполнения привычки
+            models.UniqueConstraint(
+                fields=["habit", "completed_at"], name="habit_completion_unique"
+            ),
+        ]
+        indexes = [
+            # история выполнения привычек пользователя за период
+            models.Index(
+                fields=["user", "completed_at"], name="habit_completion_user_idx"
+            ),
+        ]
+
+
+class HabitOwnerRollup(models.Model):
+    """
+    Счётчики привычек владельца (см. habits.rollups).
+
+    Обновляются приращениями в транзакции, изменяющей привычки.
+    Счётчики - IntegerField без проверки >= 0: расхождение не должно
+    блокировать запись привычек, его исправляет ночная сверка.
+    Строка удалённого пользователя обнуляется вместе с его привычками
+    и удаляется сверкой, поэтому FOREIGN KEY не нужен.
+
+    Атрибуты:
+        owner (OneToOneField): Владелец привычек.
+        total (int): Число привычек.
+        public (int): Из них публичных.
+        pleasant (int): Из них приятных.
+    """
+
+    owner = models.OneToOneField(
+        User,
+        primary_key=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="habit_rollup",
+        verbose_name="владелец",
+    )
+    total = models.IntegerField(default=0, verbose_name="привычек")
+    public = models.IntegerField(default=0, verbose_name="публичных")
+    pleasant = models.IntegerField(default=0, verbose_name="приятных")
+
+    class Meta:
+        verbose_name = "Счётчики привычек владельца"
+        verbose_name_plural = "Счётчики привычек владельцев"
+
+
+class HabitMinuteRollup(models.Model):
+    """
+    Счётчики привычек по минуте суток времени напоминания (см. habits.rollups).
+
+    Не больше 1440 строк: общие итоги - их сумма. Изменения привычек
+    разных минут обновляют разные строки и не ждут друг друга.
+
+    Атрибуты:
+        minute (int): Минута суток (0-1439).
+        total (int): Число привычек.
+        public (int): Из них публичных.
+        pleasant (int): Из них приятных.
+    """
+
+    minute = models.SmallIntegerField(primary_key=True, verbose_name="минута суток")
+    total = models.IntegerField(default=0, verbose_name="привычек")
+    public = models.IntegerField(default=0, verbose_name="публичных")
+    pleasant = models.IntegerField(default=0, verbose_name="приятных")
+
+    class Meta:
+        verbose_name = "Счётчики привычек по минуте"
+        verbose_name_plural = "Счётчики привычек по минутам"
+
+
+class HabitCountRollup(models.Model):
+    """
+    Распределение владельцев по числу привычек (см. habits.rollups).
+
+    Строка на каждое встречающееся число привычек: статистика не читает
+    строку каждого владельца. Обновляется вместе со счётчиками владельцев
+    по их новым значениям.
+
+    Атрибуты:
+        habits (int): Число привычек владельца.
+        owners (int): Владельцев с таким числом привычек.
+    """
+
+    habits = models.IntegerField(primary_key=True, verbose_name="привычек")
+    owners = models.IntegerField(default=0, verbose_name="владельцев")
+
+    class Meta:
+        verbose_name = "Распределение владельцев по числу привычек"
+        verbose_name_plural = "Распределение владельцев по числу привычек"
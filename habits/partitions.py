@@ -0,0 +1,173 @@
+"""
+Месячные секции журнала выполнения привычек (HabitCompletion).
+
+На PostgreSQL таблица секционирована по completed_at (PARTITION BY RANGE).
+Секция месяца называется <таблица>_pYYYYMM и содержит отметки
+с 1-го числа месяца (UTC) до 1-го числа следующего. Секции создаются
+заранее (create_partitions), месяцы старше срока хранения выгружаются
+в архив и удаляются целой секцией (archive_month, drop_month) - без
+DELETE по строкам и без раздувания таблицы.
+
+На других СУБД таблица обычная: секций нет, удаление идёт запросом DELETE.
+"""
+
+import csv
+import gzip
+import io
+import tempfile
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection as default_connection
+from django.utils import timezone
+
+from habits.models import HabitCompletion
+
+ARCHIVE_COLUMNS = ("id", "completed_at", "habit_id", "user_id", "source")
+
+
+def month_start(value):
+    """
+    Начало месяца (UTC), которому принадлежит момент value.
+    """
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month):
+    return f"{HabitCompletion._meta.db_table}_p{month:%Y%m}"
+
+
+def is_partitioned(connection=default_connection):
+    return connection.vendor == "postgresql"
+
+
+def existing_partitions(connection=default_connection):
+    """
+    Месяцы, для которых созданы секции (по возрастанию).
+    """
+    if not is_partitioned(connection):
+        return []
+    table = HabitCompletion._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT inhrelid::regclass::text FROM pg_inherits "
+            "WHERE inhparent = %s::regclass",
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    prefix = f"{table}_p"
+    return sorted(
+        datetime.strptime(name.removeprefix(prefix), "%Y%m").replace(
+            tzinfo=dt_timezone.utc
+        )
+        for name in names
+        if name.startswith(prefix)
+    )
+
+
+def create_partitions(now=None, connection=default_connection):
+    """
+    Создаёт недостающие секции: от месяца, в который ещё принимаются отметки
+    (HABIT_COMPLETION_BACKFILL_DAYS), на HABIT_COMPLETION_PARTITIONS_AHEAD
+    месяцев вперёд. Возвращает имена созданных секций.
+    """
+    if not is_partitioned(connection):
+        return []
+    now = now or timezone.now()
+    month = month_start(now - timedelta(days=settings.HABIT_COMPLETION_BACKFILL_DAYS))
+    last = add_months(month_start(now), settings.HABIT_COMPLETION_PARTITIONS_AHEAD)
+    existing = set(existing_partitions(connection))
+
+    quote = connection.ops.quote_name
+    created = []
+    with connection.cursor() as cursor:
+        while month <= last:
+            if month not in existing:
+                cursor.execute(
+                    f"CREATE TABLE {quote(partition_name(month))} "
+                    f"PARTITION OF {quote(HabitCompletion._meta.db_table)} "
+                    "FOR VALUES FROM (%s) TO (%s)",
+                    [month, add_months(month, 1)],
+                )
+                created.append(partition_name(month))
+            month = add_months(month, 1)
+    return created
+
+
+def month_queryset(month):
+    return HabitCompletion.objects.filter(
+        completed_at__gte=month, completed_at__lt=add_months(month, 1)
+    )
+
+
+def expired_months(now=None):
+    """
+    Месяцы старше срока хранения (HABIT_COMPLETION_RETENTION_MONTHS),
+    в которых есть данные (на PostgreSQL - есть секция).
+    """
+    now = now or timezone.now()
+    cutoff = add_months(month_start(now), -settings.HABIT_COMPLETION_RETENTION_MONTHS)
+    if is_partitioned():
+        return [month for month in existing_partitions() if month < cutoff]
+
+    return list(
+        HabitCompletion.objects.filter(completed_at__lt=cutoff).datetimes(
+            "completed_at", "month", tzinfo=dt_timezone.utc
+        )
+    )
+
+
+def archive_month(month):
+    """
+    Выгружает отметки месяца в CSV (gzip) в хранилище по умолчанию
+    (HABIT_COMPLETION_ARCHIVE_DIR/YYYY-MM.csv.gz). Возвращает имя файла.
+    """
+    name = f"{settings.HABIT_COMPLETION_ARCHIVE_DIR}/{month:%Y-%m}.csv.gz"
+    with tempfile.TemporaryFile() as file:
+        with gzip.GzipFile(fileobj=file, mode="wb", mtime=0) as archive:
+            if is_partitioned():
+                # Секция выгружается потоком COPY, без загрузки строк в Python
+                table = default_connection.ops.quote_name(partition_name(month))
+                columns = ", ".join(ARCHIVE_COLUMNS)
+                with default_connection.cursor() as cursor:
+                    cursor.cursor.copy_expert(
+                        f"COPY {table} ({columns}) "
+                        "TO STDOUT WITH (FORMAT csv, HEADER)",
+                        archive,
+                    )
+            else:
+                text = io.TextIOWrapper(archive, encoding="utf-8", newline="")
+                writer = csv.writer(text)
+                writer.writerow(ARCHIVE_COLUMNS)
+                rows = (
+                    month_queryset(month).order_by("id").values_list(*ARCHIVE_COLUMNS)
+                )
+                writer.writerows(rows.iterator(chunk_size=10000))
+                text.flush()
+                text.detach()
+        file.seek(0)
+        # Повторный запуск после сбоя перезаписывает неполный архив
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        return default_storage.save(name, File(file))
+
+
+def drop_month(month):
+    """
+    Удаляет отметки месяца: секцию целиком на PostgreSQL, DELETE на других СУБД.
+    """
+    if not is_partitioned():
+        month_queryset(month).delete()
+        return
+    table = default_connection.ops.quote_name(partition_name(month))
+    with default_connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
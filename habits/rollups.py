@@ -0,0 +1,300 @@
+"""
+Счётчики привычек (rollup-таблицы) для статистики без сканирования Habit.
+
+HabitOwnerRollup хранит число привычек каждого владельца, HabitMinuteRollup -
+число привычек на каждую минуту суток времени напоминания, HabitCountRollup -
+число владельцев с каждым числом привычек. Общие итоги (всего, публичных,
+приятных) - сумма не более 1440 строк минутной таблицы.
+
+Счётчики изменяются приращениями в той же транзакции, что и привычки:
+сигналы save/delete модели (habits.signals) и вызовы record() в путях,
+которые сигналы обходят (bulk_create, bulk_update, QuerySet.update).
+Изменения одной операции сводятся в один INSERT ... ON CONFLICT DO UPDATE
+на таблицу. Ночная задача reconcile_habit_rollups пересчитывает счётчики
+по таблице привычек и исправляет расхождения (запись в обход приложения,
+ручная правка данных).
+"""
+
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractHour, ExtractMinute
+
+from habits.models import (
+    Habit,
+    HabitCountRollup,
+    HabitMinuteRollup,
+    HabitOwnerRollup,
+)
+
+COUNTERS = ("total", "public", "pleasant")
+ZERO = (0, 0, 0)
+
+# Поля привычки, от которых зависит rollup_key
+ROLLUP_FIELDS = {"owner", "owner_id", "time", "is_public", "is_pleasant"}
+
+# Изменения, накопленные внутри batch()
+_pending = ContextVar("habit_rollup_pending", default=None)
+
+
+def minute_of_day(value):
+    # До сохранения в поле может быть строка ("08:00")
+    value = Habit._meta.get_field("time").to_python(value)
+    return value.hour * 60 + value.minute
+
+
+def rollup_key(habit):
+    """
+    Значения привычки, которые учитываются в счётчиках.
+    """
+    return (
+        habit.owner_id,
+        minute_of_day(habit.time),
+        habit.is_public,
+        habit.is_pleasant,
+    )
+
+
+def record(added=(), removed=()):
+    """
+    Учитывает добавленные и удалённые ключи (rollup_key) привычек.
+    Вызывается в транзакции, изменяющей привычки. Внутри batch()
+    изменения копятся до выхода из блока.
+    """
+    delta = Counter(added)
+    delta.subtract(removed)
+    pending = _pending.get()
+    if pending is None:
+        apply(delta)
+    else:
+        pending.update(delta)
+
+
+@contextmanager
+def batch():
+    """
+    Копит изменения счётчиков внутри блока (например, сигналы удаления
+    каждой привычки при каскадном удалении) и записывает их при выходе.
+    Блок должен выполняться внутри transaction.atomic().
+    """
+    if _pending.get() is not None:
+        yield
+        return
+
+    pending = Counter()
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    apply(pending)
+
+
+def apply(delta):
+    """
+    Записывает изменения {rollup_key: приращение} в таблицы счётчиков.
+    """
+    owners = defaultdict(lambda: [0, 0, 0])
+    minutes = defaultdict(lambda: [0, 0, 0])
+    for (owner_id, minute, is_public, is_pleasant), count in delta.items():
+        for row in (owners[owner_id], minutes[minute]):
+            row[0] += count
+            row[1] += count * is_public
+            row[2] += count * is_pleasant
+    totals = increment(HabitOwnerRollup, owners)
+    increment(HabitMinuteRollup, minutes)
+    increment(HabitCountRollup, count_delta(owners, totals), fields=("owners",))
+
+
+def count_delta(owners, totals):
+    """
+    Изменения распределения владельцев {число привычек: [приращение]}
+    по приращениям счётчиков владельцев и их новым значениям.
+    """
+    rows = defaultdict(lambda: [0])
+    for owner_id, (total, *_) in totals.items():
+        previous = total - owners[owner_id][0]
+        if previous == total:
+            continue
+        if previous > 0:
+            rows[previous][0] -= 1
+        if total > 0:
+            rows[total][0] += 1
+    return rows
+
+
+def increment(model, rows, fields=COUNTERS):
+    """
+    Прибавляет значения к счётчикам строк {ключ: [значения полей fields]},
+    создавая недостающие строки. Строки обновляются в порядке ключей,
+    чтобы параллельные транзакции не блокировали друг друга крест-накрест.
+    Возвращает новые значения изменённых строк {ключ: (значения)}.
+    """
+    rows = sorted((key, *values) for key, values in rows.items() if any(values))
+    if not rows:
+        return {}
+
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = [quote(model._meta.pk.column)] + [quote(name) for name in fields]
+    updates = ", ".join(
+        f"{column} = {table}.{column} + EXCLUDED.{column}" for column in columns[1:]
+    )
+    max_params = connection.features.max_query_params or len(rows) * len(columns)
+    size = max_params // len(columns)
+    result = {}
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), size):
+            end = start + size
+            chunk = rows[start:end]
+            values = ", ".join([f"({', '.join(['%s'] * len(columns))})"] * len(chunk))
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES {values} "
+                f"ON CONFLICT ({columns[0]}) DO UPDATE SET {updates} "
+                f"RETURNING {', '.join(columns)}",
+                [value for row in chunk for value in row],
+            )
+            result.update((row[0], row[1:]) for row in cursor.fetchall())
+    return result
+
+
+def counted(queryset):
+    return queryset.order_by().annotate(
+        total=Count("id"),
+        public=Count("id", filter=Q(is_public=True)),
+        pleasant=Count("id", filter=Q(is_pleasant=True)),
+    )
+
+
+def lock_rollups():
+    """
+    На PostgreSQL блокирует запись в таблицы счётчиков до конца транзакции.
+    Транзакции, изменившие привычки после начала пересчёта, ждут блокировку
+    и применяют свои приращения к уже исправленным значениям.
+    """
+    if connection.vendor != "postgresql":
+        return
+    tables = ", ".join(
+        connection.ops.quote_name(model._meta.db_table)
+        for model in (HabitOwnerRollup, HabitMinuteRollup, HabitCountRollup)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {tables} IN SHARE ROW EXCLUSIVE MODE")
+
+
+def sync(model, actual, fields=COUNTERS):
+    """
+    Приводит таблицу счётчиков к значениям actual {ключ: (значения полей
+    fields)}. Возвращает число строк, значения которых расходились.
+    Строки с нулевыми счётчиками удаляются.
+    """
+    stored = {row[0]: row[1:] for row in model.objects.values_list("pk", *fields)}
+    changed = [
+        model(pk=key, **dict(zip(fields, values)))
+        for key, values in actual.items()
+        if stored.get(key) != values
+    ]
+    drifted = len(changed) + sum(
+        1 for key, values in stored.items() if key not in actual and any(values)
+    )
+
+    stale = [key for key in stored if key not in actual]
+    for start in range(0, len(stale), 500):
+        end = start + 500
+        model.objects.filter(pk__in=stale[start:end]).delete()
+    model.objects.bulk_create(
+        changed,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=[model._meta.pk.name],
+        update_fields=fields,
+    )
+    return drifted
+
+
+def reconcile():
+    """
+    Пересчитывает счётчики по таблице привычек и исправляет расхождения.
+    Возвращает число исправленных строк каждой таблицы.
+    """
+    with transaction.atomic():
+        lock_rollups()
+        owners = {
+            row[0]: row[1:]
+            for row in counted(Habit.objects.values("owner")).values_list(
+                "owner", *COUNTERS
+            )
+        }
+        minutes = {
+            row[0]: row[1:]
+            for row in counted(
+                Habit.objects.annotate(
+                    minute=ExtractHour("time") * 60 + ExtractMinute("time")
+                ).values("minute")
+            ).values_list("minute", *COUNTERS)
+        }
+        counts = Counter(total for total, *_ in owners.values() if total > 0)
+        return {
+            "owners": sync(HabitOwnerRollup, owners),
+            "minutes": sync(HabitMinuteRollup, minutes),
+            "counts": sync(
+                HabitCountRollup,
+                {habits: (count,) for habits, count in counts.items()},
+                fields=("owners",),
+            ),
+        }
+
+
+def summary(values):
+    total, public, pleasant = values
+    return {
+        "habits": total,
+        "public": public,
+        "private": total - public,
+        "pleasant": pleasant,
+        "useful": total - pleasant,
+    }
+
+
+def owner_summary(owner_id):
+    """
+    Сводка по привычкам владельца: одна строка по первичному ключу.
+    """
+    values = (
+        HabitOwnerRollup.objects.filter(owner_id=owner_id)
+        .values_list(*COUNTERS)
+        .first()
+    )
+    return summary(values or ZERO)
+
+
+def global_stats():
+    """
+    Статистика по всем привычкам: итоги и распределение по минутам
+    (до 1440 строк), распределение владельцев по числу привычек
+    (строка на каждое число привычек). Таблицы привычек и счётчиков
+    владельцев не читаются.
+    """
+    by_minute = {}
+    totals = [0, 0, 0]
+    rows = HabitMinuteRollup.objects.filter(total__gt=0).order_by("minute")
+    for minute, *values in rows.values_list("minute", *COUNTERS):
+        by_minute[f"{minute // 60:02d}:{minute % 60:02d}"] = values[0]
+        totals = [total + value for total, value in zip(totals, values)]
+
+    habits_per_owner = dict(
+        HabitCountRollup.objects.filter(owners__gt=0)
+        .order_by("habits")
+        .values_list("habits", "owners")
+    )
+    return {
+        **summary(totals),
+        "owners": sum(habits_per_owner.values()),
+        "habits_per_owner": {
+            str(key): value for key, value in habits_per_owner.items()
+        },
+        "by_minute": by_minute,
+    }
@@ -1,9 +1,31 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 
 from habits.models import Habit
 from habits.validators import HabitValidator
 
 
+class SparseFieldsSerializerMixin:
+    """
+    Миксин сериализатора для выборочной выдачи полей.
+    Принимает необязательные аргументы fields и exclude (списки имён полей).
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        exclude = kwargs.pop("exclude", None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in exclude or ():
+            self.fields.pop(name, None)
+
+
 class LinkedHabitSerializer(serializers.ModelSerializer):
     """
     Сериализатор для связанной привычки.
@@ -15,12 +37,13 @@ class LinkedHabitSerializer(serializers.ModelSerializer):
         fields = ("id", "action", "is_pleasant")
 
 
-class HabitSerializer(serializers.ModelSerializer):
+class HabitSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """
     Сериализатор для модели Habit.
     """
 
     owner = serializers.PrimaryKeyRelatedField(read_only=True)
+    version = serializers.IntegerField(read_only=True)
     is_pleasant = serializers.BooleanField(allow_null=True, required=False)
     is_public = serializers.BooleanField(allow_null=True, required=False)
     reward = serializers.CharField(allow_null=True, required=False)
@@ -44,12 +67,113 @@ class HabitSerializer(serializers.ModelSerializer):
             "frequency",
             "reward",
             "is_public",
+            "version",
         )
 
     def validate(self, data):
         """
         Применяем кастомный валидатор для проверки бизнес - логики.
+        При частичном обновлении проверяется итоговое состояние привычки:
+        недостающие поля берутся из текущего объекта.
         """
         validator = HabitValidator()
-        validator(data)
+        if self.instance is not None and self.partial:
+            merged = {
+                field: getattr(self.instance, field)
+                for field in (
+                    "reward",
+                    "linked_action",
+                    "is_pleasant",
+                    "frequency",
+                    "duration",
+                )
+            }
+            merged.update(data)
+            validator(merged)
+        else:
+            validator(data)
         return data
+
+
+class LinkedHabitField(serializers.PrimaryKeyRelatedField):
+    """
+    Связанная привычка при записи: id привычки текущего пользователя.
+    В ответе выводится так же, как в HabitSerializer.
+    """
+
+    def get_queryset(self):
+        return Habit.objects.filter(owner=self.context["request"].user)
+
+    def use_pk_only_optimization(self):
+        return False
+
+    def to_representation(self, value):
+        return LinkedHabitSerializer(value, context=self.context).data
+
+
+class HabitWriteSerializer(HabitSerializer):
+    """
+    Сериализатор для создания и изменения привычек (в том числе массовых).
+    Связанная привычка передаётся идентификатором.
+    """
+
+    linked_action = LinkedHabitField(allow_null=True, required=False)
+
+
+class HabitBulkDestroySerializer(serializers.Serializer):
+    """
+    Сериализатор для массового удаления привычек.
+    Принимает список идентификаторов привычек текущего пользователя.
+    """
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False
+    )
+
+
+class HabitCompletionSerializer(serializers.Serializer):
+    """
+    Отметка о выполнении привычки. Время по умолчанию - текущее.
+    Принадлежность привычки пользователю проверяется в представлении
+    одним запросом для всего списка.
+    """
+
+    # Допустимое расхождение часов клиента и сервера
+    clock_skew = timedelta(minutes=5)
+
+    habit = serializers.IntegerField(source="habit_id", min_value=1)
+    completed_at = serializers.DateTimeField(default=timezone.now)
+
+    def validate_completed_at(self, value):
+        now = timezone.now()
+        if value > now + self.clock_skew:
+            raise serializers.ValidationError("Нельзя отметить выполнение в будущем.")
+        if value < now - timedelta(days=settings.HABIT_COMPLETION_BACKFILL_DAYS):
+            raise serializers.ValidationError(
+                f"Отметить выполнение можно только за последние "
+                f"{settings.HABIT_COMPLETION_BACKFILL_DAYS} дн."
+            )
+        return value
+
+
+class HabitSummarySerializer(serializers.Serializer):
+    """
+    Сводка по привычкам (счётчики habits.rollups).
+    """
+
+    habits = serializers.IntegerField()
+    public = serializers.IntegerField()
+    private = serializers.IntegerField()
+    pleasant = serializers.IntegerField()
+    useful = serializers.IntegerField()
+
+
+class HabitStatsSerializer(HabitSummarySerializer):
+    """
+    Статистика по всем привычкам: итоги, распределение владельцев
+    по числу привычек и привычек по времени напоминания (ЧЧ:ММ).
+    """
+
+    owners = serializers.IntegerField()
+    habits_per_owner = serializers.DictField(child=serializers.IntegerField())
+    by_minute = serializers.DictField(child=serializers.IntegerField())
@@ -0,0 +1,51 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from habits.models import Habit
+from habits.rollups import ROLLUP_FIELDS, minute_of_day, record, rollup_key
+
+# Изменение привычки не затрагивает полей, учтённых в счётчиках
+UNCHANGED = object()
+
+
+@receiver(pre_save, sender=Habit)
+def remember_rollup_key(sender, instance, update_fields=None, **kwargs):
+    """
+    Запоминает значения изменяемой привычки, учтённые в счётчиках (из БД).
+    """
+    if update_fields is not None and not ROLLUP_FIELDS & set(update_fields):
+        instance._rollup_previous = UNCHANGED
+    elif instance.pk is None:
+        instance._rollup_previous = None
+    else:
+        previous = (
+            Habit.objects.filter(pk=instance.pk)
+            .values_list("owner_id", "time", "is_public", "is_pleasant")
+            .first()
+        )
+        if previous is not None:
+            owner_id, time, is_public, is_pleasant = previous
+            previous = (owner_id, minute_of_day(time), is_public, is_pleasant)
+        instance._rollup_previous = previous
+
+
+@receiver(post_save, sender=Habit)
+def update_rollups_on_save(sender, instance, **kwargs):
+    """
+    Обновляет счётчики привычек в транзакции сохранения привычки.
+    """
+    previous = instance.__dict__.pop("_rollup_previous", None)
+    if previous is UNCHANGED:
+        return
+    current = rollup_key(instance)
+    if current != previous:
+        record(added=[current], removed=[previous] if previous else [])
+
+
+@receiver(post_delete, sender=Habit)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    """
+    Обновляет счётчики привычек в транзакции удаления привычки.
+    При удалении многих привычек вызов оборачивается в rollups.batch().
+    """
+    record(removed=[rollup_key(instance)])
@@ -1,54 +1,17 @@
-import telebot
 from celery import shared_task
 from django.conf import settings
-from django.core.mail import send_mail
 from django.utils.timezone import now
-from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
 
-from config.settings import TELEGRAM_BOT_TOKEN
+from habits import rollups
+from habits.bot import get_bot
 from habits.models import Habit
-
-# Создаём экземпляр бота
-bot = telebot.TeleBot(TELEGRAM_BOT_TOKEN)
-
-
-# Команда /start
-@bot.message_handler(commands=["start"])
-def start(message):
-    """
-    Обработчик команды /start.
-    Отправляет приветственное сообщение с кнопкой.
-    """
-    markup = InlineKeyboardMarkup()
-    markup.add(InlineKeyboardButton("Мои привычки", callback_data="my_habits"))
-    bot.send_message(
-        message.chat.id,
-        "Привет! Я ваш трекер привычек. Вы можете управлять своими привычками здесь.",
-        reply_markup=markup,
-    )
-
-
-# Callback-кнопка "Мои привычки"
-@bot.callback_query_handler(func=lambda call: call.data == "my_habits")
-def show_habits(call):
-    """
-    Показывает список привычек пользователя.
-    """
-    # Импортируем модель внутри функции, чтобы избежать циклических зависимостей
-    from habits.models import Habit
-
-    user_tg_id = call.message.chat.id
-    habits = Habit.objects.filter(owner__tg_id=user_tg_id)
-
-    if not habits.exists():
-        bot.send_message(call.message.chat.id, "У вас пока нет привычек.")
-        return
-
-    message = "Ваши привычки:\n\n"
-    for habit in habits:
-        message += f"- {habit.action} (в {habit.time.strftime('%H:%M')})\n"
-
-    bot.send_message(call.message.chat.id, message)
+from habits.partitions import (
+    archive_month,
+    create_partitions,
+    drop_month,
+    expired_months,
+)
+from users.tasks import send_email_batch
 
 
 # Задача Celery для запуска Telegram-бота
@@ -59,7 +22,8 @@ def run_telegram_bot(self):
     """
     try:
         print("Запуск Telegram-бота...")
-        bot.polling(none_stop=True)  # Запускаем бота в режиме постоянного опроса
+        # Запускаем бота в режиме постоянного опроса
+        get_bot().polling(none_stop=True)
     except Exception as exc:
         print(f"Ошибка при запуске Telegram-бота: {exc}")
         raise self.retry(
@@ -74,14 +38,11 @@ def send_telegram_reminder(self, tg_id, message):
     Если задача завершилась с ошибкой, она будет повторена до 3 раз.
     """
     try:
-        # Создаём экземпляр бота
-        bot = telebot.TeleBot(TELEGRAM_BOT_TOKEN)
-
         # Обновляем состояние задачи (начало выполнения)
         self.update_state(state="PROGRESS", meta={"status": "Отправка сообщения"})
 
-        # Отправляем сообщение
-        bot.send_message(chat_id=tg_id, text=message)
+        # Отправляем сообщение (бот создаётся один раз на процесс воркера)
+        get_bot().send_message(chat_id=tg_id, text=message)
 
         # Возвращаем успешный результат
         return {"status": "Успешно", "tg_id": tg_id}
@@ -100,9 +61,12 @@ def send_daily_reminders(self):
     current_time = now().time()
 
     # Фильтруем привычки, которые должны быть выполнены сегодня
-    habits = Habit.objects.filter(time__lte=current_time).select_related("owner")
+    habits = Habit.objects.filter(time__lte=current_time).select_related(
+        "owner", "linked_action"
+    )
 
     total_habits = habits.count()
+    emails = []
     for index, habit in enumerate(habits):
         if habit.owner.tg_id:
             # Определяем тип вознаграждения
@@ -128,23 +92,18 @@ def send_daily_reminders(self):
             send_telegram_reminder.delay(habit.owner.tg_id, message)
         else:
             # Если tg_id отсутствует, отправляем email с инструкцией по привязке Telegram
-            try:
-                subject = "Привяжите ваш Telegram для получения уведомлений"
-                email_message = (
-                    f"Здравствуйте, {habit.owner.email}!\n\n"
-                    "Мы заметили, что у вас нет привязанного Telegram ID. "
-                    "Для получения уведомлений о ваших привычках, пожалуйста, укажите ваш Telegram ID "
-                    "в настройках профиля на нашем сайте."
-                )
-                send_mail(
-                    subject,
-                    email_message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [habit.owner.email],
-                    fail_silently=False,
-                )
-            except Exception as e:
-                print(f"Ошибка при отправке email: {e}")
+            emails.append(
+                {
+                    "subject": "Привяжите ваш Telegram для получения уведомлений",
+                    "message": (
+                        f"Здравствуйте, {habit.owner.email}!\n\n"
+                        "Мы заметили, что у вас нет привязанного Telegram ID. "
+                        "Для получения уведомлений о ваших привычках, пожалуйста, укажите ваш Telegram ID "
+                        "в настройках профиля на нашем сайте."
+                    ),
+                    "recipient_list": [habit.owner.email],
+                }
+            )
         # Обновляем состояние задачи (прогресс)
         self.update_state(
             state="PROGRESS",
@@ -155,4 +114,45 @@ def send_daily_reminders(self):
             },
         )
 
+    # Письма отправляются пачками: одна задача - одно SMTP-соединение
+    batch_size = settings.EMAIL_BATCH_SIZE
+    for start in range(0, len(emails), batch_size):
+        end = start + batch_size
+        send_email_batch.delay(emails[start:end])
+
     return {"status": "Завершено", "total_habits": total_habits}
+
+
+@shared_task
+def create_completion_partitions():
+    """
+    Ежедневная задача: создаёт секции журнала выполнения привычек
+    на HABIT_COMPLETION_PARTITIONS_AHEAD месяцев вперёд (только PostgreSQL).
+    """
+    return {"status": "Завершено", "created": create_partitions()}
+
+
+@shared_task
+def archive_habit_completions():
+    """
+    Ежедневная задача: месяцы журнала выполнения привычек старше
+    HABIT_COMPLETION_RETENTION_MONTHS выгружаются в архив
+    (если HABIT_COMPLETION_ARCHIVE) и удаляются.
+    """
+    archived = []
+    for month in expired_months():
+        if settings.HABIT_COMPLETION_ARCHIVE:
+            archive_month(month)
+        drop_month(month)
+        archived.append(f"{month:%Y-%m}")
+    return {"status": "Завершено", "archived": archived}
+
+
+@shared_task
+def reconcile_habit_rollups():
+    """
+    Ночная задача: пересчитывает счётчики привычек (habits.rollups)
+    по таблице привычек и исправляет расхождения.
+    Возвращает число исправленных строк счётчиков.
+    """
+    return {"status": "Завершено", "fixed": rollups.reconcile()}
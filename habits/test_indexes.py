@@ -0,0 +1,109 @@
+import re
+from datetime import time
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from habits.filters import HabitFilter
+from habits.models import Habit
+from habits.views import HabitViewSet, PublicHabitListApiView
+from users.models import User
+
+# Размер тестовой выборки: на маленьких таблицах планировщик PostgreSQL
+# предпочитает последовательное сканирование даже при наличии индексов
+USERS_COUNT = 5000
+HABITS_PER_USER = 10
+PUBLIC_EVERY = 20
+
+SEQ_SCAN_RE = re.compile(r"Seq Scan on (habits_habit|users_user)")
+
+
+@skipUnless(
+    connection.vendor == "postgresql",
+    "EXPLAIN-тесты выполняются только на PostgreSQL (TEST_DATABASE=postgres)",
+)
+class HabitIndexCoverageTest(TestCase):
+    """
+    Проверяет, что горячие запросы к привычкам обслуживаются индексами.
+    Для каждого запроса выполняется EXPLAIN на заполненной таблице,
+    тест падает, если в плане есть последовательное сканирование.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Заполняем таблицы пользователей и привычек и обновляем статистику.
+        """
+        users = User.objects.bulk_create(
+            User(email=f"user{index}@example.com", password="!", tg_id=index + 1)
+            for index in range(USERS_COUNT)
+        )
+        Habit.objects.bulk_create(
+            (
+                Habit(
+                    owner=user,
+                    location="Дом",
+                    time=time(hour=index % 24, minute=(user.pk + index) % 60),
+                    action=f"Привычка {index}",
+                    duration=60,
+                    is_public=(user.pk + index) % PUBLIC_EVERY == 0,
+                )
+                for user in users
+                for index in range(HABITS_PER_USER)
+            ),
+            batch_size=5000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE users_user")
+            cursor.execute("ANALYZE habits_habit")
+
+        cls.user = users[USERS_COUNT // 2]
+
+    def assertNoSeqScan(self, queryset):
+        """
+        Проверяет, что план запроса не содержит последовательного сканирования.
+        """
+        plan = queryset.explain()
+        self.assertIsNone(SEQ_SCAN_RE.search(plan), f"\n{queryset.query}\n{plan}")
+
+    def test_owner_habit_list(self):
+        """
+        Список привычек пользователя с сортировкой (HabitViewSet).
+        """
+        queryset = HabitViewSet.queryset.filter(owner=self.user)
+        self.assertNoSeqScan(queryset[:5])
+
+    def test_public_habit_feed(self):
+        """
+        Лента публичных привычек с сортировкой (PublicHabitListApiView).
+        """
+        queryset = PublicHabitListApiView.queryset
+        self.assertNoSeqScan(queryset[1000:1005])
+
+    def test_reminders_time_range(self):
+        """
+        Выборка привычек по диапазону времени напоминания.
+        """
+        queryset = Habit.objects.filter(time__range=(time(7, 0), time(7, 1)))
+        self.assertNoSeqScan(queryset)
+
+    def test_habits_by_telegram_id(self):
+        """
+        Привычки пользователя по telegram ID (Telegram-бот).
+        """
+        queryset = Habit.objects.filter(owner__tg_id=self.user.tg_id)
+        self.assertNoSeqScan(queryset)
+
+    def test_habit_search(self):
+        """
+        Поиск подстроки в действии и месте (HabitFilter, параметр search)
+        обслуживается триграммными GIN-индексами.
+        """
+        queryset = HabitFilter(
+            {"search": "Медитация"}, queryset=Habit.objects.all()
+        ).qs
+        self.assertNoSeqScan(queryset)
+        plan = queryset.explain()
+        self.assertIn("habit_action_trgm_idx", plan)
+        self.assertIn("habit_location_trgm_idx", plan)
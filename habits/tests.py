@@ -1,15 +1,48 @@
+import gzip
 import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from importlib import import_module
+from io import StringIO
 
 #  импорты для habits/tasks
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F
+from django.core.servers.basehttp import WSGIServer
+from django.test import LiveServerTestCase, TestCase, override_settings
+from django.test.testcases import LiveServerThread, QuietWSGIRequestHandler
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 
-from habits.models import Habit
-from habits.tasks import run_telegram_bot
+from habits.models import (
+    Habit,
+    HabitCompletion,
+    HabitCountRollup,
+    HabitMinuteRollup,
+    HabitOwnerRollup,
+)
+from habits.partitions import add_months, month_start
+from habits.rollups import global_stats, owner_summary, reconcile
+from habits.tasks import (
+    archive_habit_completions,
+    reconcile_habit_rollups,
+    run_telegram_bot,
+)
 from users.models import User
 
 
@@ -217,14 +250,31 @@ class HabitModelTest(TestCase):
 
 #  Тест для run_telegram_bot
 class RunTelegramBotTaskTest(TestCase):
-    @patch("habits.tasks.bot.polling")
-    def test_run_telegram_bot(self, mock_polling):
+    @patch("habits.tasks.get_bot")
+    def test_run_telegram_bot(self, mock_get_bot):
         """
         Тестируем задачу run_telegram_bot.
         Проверяем, что polling вызывается.
         """
         run_telegram_bot()
-        mock_polling.assert_called_once_with(none_stop=True)
+        mock_get_bot.return_value.polling.assert_called_once_with(none_stop=True)
+
+    def test_bot_not_created_on_import(self):
+        """
+        Тест: импорт задач (как при autodiscover в Celery) не импортирует telebot.
+        """
+        code = (
+            "import django, sys; django.setup(); import habits.tasks; "
+            "print('telebot' in sys.modules)"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "config.settings"},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual(result.stdout.strip(), "False")
 
 
 #  тесты на CRUD habit (ViewSet)
@@ -345,6 +395,520 @@ class HabitViewSetTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
 
+#  тесты на условную запись и оптимистичную блокировку (ETag / If-Match)
+
+
+class HabitOptimisticConcurrencyTest(APITestCase):
+    def setUp(self):
+        """
+        Создаём пользователя и его привычку.
+        """
+        self.user = User.objects.create_user(
+            email="test@example.com", password="password123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(
+            owner=self.user,
+            location="Парк",
+            time="07:00:00",
+            action="Прогулка",
+            duration=60,
+            frequency=1,
+        )
+
+    def test_retrieve_returns_etag(self):
+        """
+        Тест: детальная информация содержит версию и заголовок ETag.
+        """
+        response = self.client.get(f"/habits/{self.habit.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["ETag"], '"1"')
+
+    def test_update_in_two_queries(self):
+        """
+        Тест: обновление - одна выборка и один условный UPDATE, версия растёт.
+        """
+        with self.assertNumQueries(2):
+            response = self.client.patch(
+                f"/habits/{self.habit.id}/",
+                data=json.dumps({"action": "Пробежка"}),
+                content_type="application/json",
+                HTTP_IF_MATCH='"1"',
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["version"], 2)
+        self.assertEqual(response["ETag"], '"2"')
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.action, "Пробежка")
+        self.assertEqual(self.habit.version, 2)
+
+    def test_update_returns_stored_version(self):
+        """
+        Тест: без If-Match в ответе версия из БД, даже если привычку
+        изменили между чтением и записью.
+        """
+        stale = Habit.objects.get(id=self.habit.id)
+        Habit.objects.filter(id=self.habit.id).update(version=F("version") + 1)
+        with patch("habits.views.HabitViewSet.get_object", return_value=stale):
+            response = self.client.patch(
+                f"/habits/{self.habit.id}/",
+                data=json.dumps({"action": "Пробежка"}),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["version"], 3)
+        self.assertEqual(response["ETag"], '"3"')
+
+    def test_update_with_stale_version(self):
+        """
+        Тест: устаревшая версия в If-Match приводит к ошибке 412.
+        """
+        Habit.objects.filter(id=self.habit.id).update(version=5)
+        response = self.client.patch(
+            f"/habits/{self.habit.id}/",
+            data=json.dumps({"action": "Пробежка"}),
+            content_type="application/json",
+            HTTP_IF_MATCH='"1"',
+        )
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.action, "Прогулка")
+
+    def test_update_made_public_concurrently(self):
+        """
+        Тест: привычка, ставшая публичной после чтения, не обновляется.
+        """
+        stale = Habit.objects.get(id=self.habit.id)
+        Habit.objects.filter(id=self.habit.id).update(is_public=True)
+        with patch("habits.views.HabitViewSet.get_object", return_value=stale):
+            response = self.client.patch(
+                f"/habits/{self.habit.id}/",
+                data=json.dumps({"action": "Пробежка"}),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.action, "Прогулка")
+
+    def test_delete_with_stale_version(self):
+        """
+        Тест: удаление с устаревшей версией приводит к ошибке 412.
+        """
+        response = self.client.delete(f"/habits/{self.habit.id}/", HTTP_IF_MATCH='"7"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertTrue(Habit.objects.filter(id=self.habit.id).exists())
+
+    def test_delete_foreign_habit(self):
+        """
+        Тест: чужая привычка не найдена.
+        """
+        other = User.objects.create_user(
+            email="other@example.com", password="password123"
+        )
+        self.client.force_authenticate(user=other)
+        response = self.client.delete(f"/habits/{self.habit.id}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+#  тесты на фильтрацию и поиск привычек (HabitFilter)
+
+
+class HabitFilterTest(APITestCase):
+    def setUp(self):
+        """
+        Создаём пользователя и несколько публичных привычек.
+        """
+        user = User.objects.create_user(
+            email="test@example.com", password="password123"
+        )
+        for action, location, time, duration, is_pleasant in (
+            ("Утренняя пробежка", "Парк", "07:00:00", 60, False),
+            ("Медитация", "Дом", "08:30:00", 30, False),
+            ("Чашка кофе", "Кафе у парка", "09:00:00", 100, True),
+        ):
+            Habit.objects.create(
+                owner=user,
+                action=action,
+                location=location,
+                time=time,
+                duration=duration,
+                is_pleasant=is_pleasant,
+                is_public=True,
+            )
+
+    def get_actions(self, query):
+        response = self.client.get(f"/habits/public/?{query}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {habit["action"] for habit in response.data["results"]}
+
+    def test_time_range(self):
+        """
+        Тест фильтрации по диапазону времени.
+        """
+        self.assertEqual(
+            self.get_actions("time_after=08:00&time_before=09:00"),
+            {"Медитация", "Чашка кофе"},
+        )
+
+    def test_duration_bounds_and_is_pleasant(self):
+        """
+        Тест фильтрации по длительности и признаку приятной привычки.
+        """
+        self.assertEqual(
+            self.get_actions("duration_min=50&is_pleasant=false"),
+            {"Утренняя пробежка"},
+        )
+
+    def test_search(self):
+        """
+        Тест поиска подстроки в действии и месте.
+        """
+        self.assertEqual(self.get_actions("search=Медит"), {"Медитация"})
+        self.assertEqual(self.get_actions("search=у парка"), {"Чашка кофе"})
+
+    def test_search_too_short(self):
+        """
+        Тест: слишком короткий поисковый запрос отклоняется.
+        """
+        response = self.client.get("/habits/public/?search=па")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+#  тесты на выборочную выдачу полей (?fields= / ?exclude=)
+
+
+class SparseFieldsetTest(APITestCase):
+    def setUp(self):
+        """
+        Создаём пользователя, приятную привычку и связанную с ней привычку.
+        """
+        self.user = User.objects.create_user(
+            email="test@example.com", password="password123"
+        )
+        self.client.force_authenticate(user=self.user)
+
+        pleasant = Habit.objects.create(
+            owner=self.user,
+            location="Дом",
+            time="08:00:00",
+            action="Кофе",
+            is_pleasant=True,
+            duration=30,
+            frequency=1,
+            is_public=True,
+        )
+        Habit.objects.create(
+            owner=self.user,
+            location="Парк",
+            time="07:00:00",
+            action="Прогулка",
+            linked_action=pleasant,
+            duration=60,
+            frequency=1,
+            is_public=True,
+        )
+
+    def get_select_sql(self, url):
+        """
+        Выполняет запрос и возвращает SQL выборки привычек (без COUNT).
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        selects = [
+            query["sql"]
+            for query in context.captured_queries
+            if '"habits_habit"' in query["sql"] and "COUNT" not in query["sql"]
+        ]
+        return response, selects
+
+    def test_fields(self):
+        """
+        Тест: возвращаются только запрошенные поля, лишние колонки не выбираются.
+        """
+        response, selects = self.get_select_sql("/habits/?fields=id,action,time")
+        self.assertEqual(set(response.data["results"][0]), {"id", "action", "time"})
+        self.assertEqual(len(selects), 1)
+        self.assertNotIn("JOIN", selects[0])
+        self.assertNotIn('"location"', selects[0])
+
+    def test_exclude(self):
+        """
+        Тест исключения полей из ответа.
+        """
+        response = self.client.get("/habits/public/?exclude=reward,linkedAction")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        habit = response.data["results"][0]
+        self.assertNotIn("reward", habit)
+        self.assertNotIn("linked_action", habit)
+        self.assertIn("location", habit)
+
+    def test_linked_action_loaded_with_join(self):
+        """
+        Тест: связанная привычка подгружается одним запросом через JOIN.
+        """
+        response, selects = self.get_select_sql(
+            "/habits/public/?fields=id,linkedAction"
+        )
+        self.assertEqual(len(selects), 1)
+        self.assertIn("JOIN", selects[0])
+        linked = [h["linked_action"] for h in response.data["results"]]
+        self.assertIn("Кофе", [item["action"] for item in linked if item])
+
+    def test_unknown_field(self):
+        """
+        Тест: неизвестное поле приводит к ошибке 400.
+        """
+        response = self.client.get("/habits/?fields=id,password")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_empty_fields(self):
+        """
+        Тест: пустой список полей равносилен отсутствию параметра.
+        """
+        full = self.client.get("/habits/").json()
+        for query in ("fields=", "fields=,,", "exclude="):
+            response = self.client.get(f"/habits/?{query}")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json(), full)
+
+
+#  тесты на массовые операции с привычками (/habits/bulk/)
+
+
+class HabitBulkApiTest(APITestCase):
+    def setUp(self):
+        """
+        Создаём пользователя, его приватную и публичную привычки.
+        """
+        self.user = User.objects.create_user(
+            email="test@example.com", password="password123"
+        )
+        self.client.force_authenticate(user=self.user)
+
+        self.private_habit = Habit.objects.create(
+            owner=self.user,
+            location="Парк",
+            time="07:00:00",
+            action="Прогулка",
+            duration=60,
+            frequency=1,
+            is_public=False,
+        )
+        self.public_habit = Habit.objects.create(
+            owner=self.user,
+            location="Дом",
+            time="08:00:00",
+            action="Йога",
+            duration=30,
+            frequency=2,
+            is_public=True,
+        )
+
+    def test_bulk_create(self):
+        """
+        Тест массового создания привычек.
+        """
+        data = [
+            {
+                "location": "Офис",
+                "time": "09:00:00",
+                "action": f"Действие {index}",
+                "duration": 30,
+                "frequency": 1,
+            }
+            for index in range(3)
+        ]
+        response = self.client.post(
+            "/habits/bulk/", data=json.dumps(data), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(Habit.objects.filter(owner=self.user).count(), 5)
+
+    def test_bulk_create_returns_errors_per_item(self):
+        """
+        Тест: при ошибке в одном элементе ничего не создаётся,
+        ошибки возвращаются по индексам.
+        """
+        data = [
+            {
+                "location": "Офис",
+                "time": "09:00",
+                "action": "Ок",
+                "duration": 30,
+                "frequency": 1,
+            },
+            {
+                "location": "Офис",
+                "time": "09:00",
+                "action": "Нет",
+                "duration": 500,
+                "frequency": 1,
+            },
+        ]
+        response = self.client.post(
+            "/habits/bulk/", data=json.dumps(data), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["errors"][0], {})
+        self.assertIn("non_field_errors", response.data["errors"][1])
+        self.assertEqual(Habit.objects.filter(owner=self.user).count(), 2)
+
+    @override_settings(HABITS_BULK_MAX_ITEMS=1)
+    def test_bulk_create_size_limit(self):
+        """
+        Тест ограничения количества элементов в одном запросе.
+        """
+        data = [
+            {
+                "location": "Офис",
+                "time": "09:00",
+                "action": "Ок",
+                "duration": 30,
+                "frequency": 1,
+            }
+        ] * 2
+        response = self.client.post(
+            "/habits/bulk/", data=json.dumps(data), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update(self):
+        """
+        Тест массового частичного обновления привычек.
+        """
+        data = [{"id": self.private_habit.id, "action": "Пробежка", "duration": 90}]
+        response = self.client.patch(
+            "/habits/bulk/", data=json.dumps(data), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.private_habit.refresh_from_db()
+        self.assertEqual(self.private_habit.action, "Пробежка")
+        self.assertEqual(self.private_habit.duration, 90)
+
+    def test_bulk_update_public_habit(self):
+        """
+        Тест запрета массового редактирования публичной привычки.
+        """
+        data = [
+            {"id": self.private_habit.id, "action": "Пробежка"},
+            {"id": self.public_habit.id, "action": "Пробежка"},
+        ]
+        response = self.client.patch(
+            "/habits/bulk/", data=json.dumps(data), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.private_habit.refresh_from_db()
+        self.assertEqual(self.private_habit.action, "Прогулка")
+
+    def test_bulk_update_unknown_habit(self):
+        """
+        Тест: чужие и несуществующие привычки возвращают ошибку элемента.
+        """
+        data = [{"id": self.private_habit.id + 100, "action": "Пробежка"}]
+        response = self.client.patch(
+            "/habits/bulk/", data=json.dumps(data), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("id", response.data["errors"][0])
+
+    def test_bulk_update_bool_id(self):
+        """
+        Тест: true/false в поле id не считаются идентификаторами привычек.
+        """
+        Habit.objects.filter(pk=self.private_habit.pk).update(id=1)
+        data = [{"id": True, "action": "Пробежка"}]
+        response = self.client.patch(
+            "/habits/bulk/", data=json.dumps(data), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("id", response.data["errors"][0])
+
+    def test_bulk_linked_action_by_id(self):
+        """
+        Тест: связанная привычка передаётся идентификатором,
+        в ответе выводится объектом.
+        """
+        pleasant = Habit.objects.create(
+            owner=self.user,
+            location="Дом",
+            time="20:00",
+            action="Ванна",
+            duration=60,
+            frequency=1,
+            is_pleasant=True,
+        )
+        data = [{"id": self.private_habit.id, "linked_action": pleasant.id}]
+        response = self.client.patch(
+            "/habits/bulk/", data=json.dumps(data), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["linked_action"]["id"], pleasant.id)
+        self.private_habit.refresh_from_db()
+        self.assertEqual(self.private_habit.linked_action, pleasant)
+
+    def test_bulk_linked_action_invalid(self):
+        """
+        Тест: вложенный объект, чужая или неприятная связанная привычка -
+        ошибки элементов, а не ошибка сервера.
+        """
+        other = User.objects.create_user(email="other@example.com", password="x")
+        foreign = Habit.objects.create(
+            owner=other,
+            location="Дом",
+            time="20:00",
+            action="Ванна",
+            duration=60,
+            frequency=1,
+            is_pleasant=True,
+        )
+        item = {
+            "location": "Офис",
+            "time": "09:00",
+            "action": "Ок",
+            "duration": 30,
+            "frequency": 1,
+        }
+        data = [
+            {**item, "linked_action": {"id": foreign.id, "action": "Ванна"}},
+            {**item, "linked_action": foreign.id},
+            {**item, "linked_action": self.private_habit.id},
+        ]
+        response = self.client.post(
+            "/habits/bulk/", data=json.dumps(data), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("linked_action", response.data["errors"][0])
+        self.assertIn("linked_action", response.data["errors"][1])
+        self.assertIn("non_field_errors", response.data["errors"][2])
+        self.assertEqual(Habit.objects.filter(owner=self.user).count(), 2)
+
+    def test_bulk_destroy(self):
+        """
+        Тест массового удаления привычек.
+        """
+        response = self.client.delete(
+            "/habits/bulk/",
+            data=json.dumps({"ids": [self.private_habit.id]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Habit.objects.filter(id=self.private_habit.id).exists())
+
+    def test_bulk_destroy_public_habit(self):
+        """
+        Тест запрета массового удаления публичной привычки.
+        """
+        response = self.client.delete(
+            "/habits/bulk/",
+            data=json.dumps({"ids": [self.private_habit.id, self.public_habit.id]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Habit.objects.filter(owner=self.user).count(), 2)
+
+
 #  тестируем дженерик LictApiView получения списка публичных привычек
 
 
@@ -409,3 +973,568 @@ class PublicHabitListApiViewTest(APITestCase):
         public_habit = response.data["results"][0]
         self.assertEqual(public_habit["action"], "Прогулка")
         self.assertTrue(public_habit["is_public"])
+
+    @override_settings(THROTTLE_RATES={"public": "2/min"})
+    def test_public_habits_throttled_per_ip(self):
+        """
+        Тест: лента публичных привычек ограничена по IP-адресу клиента.
+        """
+        cache.clear()
+        for _ in range(2):
+            response = self.client.get("/habits/public/")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get("/habits/public/")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
+
+        # Другой клиент (за nginx - другой X-Forwarded-For) не ограничен
+        response = self.client.get("/habits/public/", HTTP_X_FORWARDED_FOR="10.0.0.2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class AsyncHabitViewsTest(TestCase):
+    """
+    Асинхронные эндпоинты возвращают те же данные, что и синхронные.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="user1@example.com", password="password123", is_active=True
+        )
+        other = User.objects.create_user(
+            email="user2@example.com", password="password123", is_active=True
+        )
+        pleasant = Habit.objects.create(
+            owner=self.user,
+            location="Дом",
+            time="07:00:00",
+            action="Кофе",
+            duration=30,
+            is_pleasant=True,
+            is_public=True,
+        )
+        self.habit = Habit.objects.create(
+            owner=self.user,
+            location="Парк",
+            time="08:00:00",
+            action="Бег",
+            duration=60,
+            linked_action=pleasant,
+        )
+        for index in range(6):
+            Habit.objects.create(
+                owner=other,
+                location="Офис",
+                time="09:00:00",
+                action=f"Разминка {index}",
+                duration=60,
+                is_public=index % 2 == 0,
+            )
+        self.other_habit = Habit.objects.filter(owner=other).first()
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    def assertSameResponse(self, sync_url, async_url, **headers):
+        sync_response = self.client.get(sync_url, **headers)
+        async_response = self.client.get(async_url, **headers)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        # Ссылки на страницы отличаются только префиксом /async
+        async_data = json.loads(
+            async_response.content.decode().replace("/async/habits/", "/habits/")
+        )
+        self.assertEqual(async_data, sync_response.json())
+        return async_response
+
+    def test_public_feed(self):
+        """
+        Тест: лента публичных привычек совпадает с /habits/public/.
+        """
+        self.assertSameResponse("/habits/public/", "/async/habits/public/")
+        response = self.assertSameResponse(
+            "/habits/public/?page=2&page_size=2",
+            "/async/habits/public/?page=2&page_size=2",
+        )
+        self.assertEqual(len(response.json()["results"]), 2)
+        self.assertSameResponse(
+            "/habits/public/?page=10", "/async/habits/public/?page=10"
+        )
+
+    def test_habit_list_and_detail(self):
+        """
+        Тест: список и детальная информация совпадают с /habits/.
+        """
+        self.assertSameResponse("/habits/", "/async/habits/", **self.auth)
+        self.assertSameResponse(
+            "/habits/?frequency=1&page_size=1",
+            "/async/habits/?frequency=1&page_size=1",
+            **self.auth,
+        )
+        response = self.assertSameResponse(
+            f"/habits/{self.habit.pk}/", f"/async/habits/{self.habit.pk}/", **self.auth
+        )
+        self.assertEqual(response["ETag"], '"1"')
+        self.assertEqual(response.json()["linkedAction"]["action"], "Кофе")
+
+    def test_search_too_short(self):
+        """
+        Тест: слишком короткий поисковый запрос отклоняется, как в /habits/.
+        """
+        self.assertSameResponse(
+            "/habits/public/?search=ab", "/async/habits/public/?search=ab"
+        )
+        response = self.assertSameResponse(
+            "/habits/?search=ab", "/async/habits/?search=ab", **self.auth
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get("/async/habits/public/?search=ab")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_foreign_habit_not_found(self):
+        """
+        Тест: чужая привычка недоступна.
+        """
+        response = self.client.get(f"/async/habits/{self.other_habit.pk}/", **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_authentication_required(self):
+        """
+        Тест: без токена список привычек недоступен.
+        """
+        response = self.client.get("/async/habits/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post("/async/habits/public/")
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class HabitCompletionApiTest(APITestCase):
+    def setUp(self):
+        """
+        Создаём пользователя, его привычку и чужую привычку.
+        """
+        self.user = User.objects.create_user(
+            email="test@example.com", password="password123"
+        )
+        self.other = User.objects.create_user(
+            email="other@example.com", password="password123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(
+            owner=self.user,
+            location="Дом",
+            time="07:00:00",
+            action="Зарядка",
+            duration=60,
+        )
+        self.other_habit = Habit.objects.create(
+            owner=self.other, location="Дом", time="07:00:00", action="Бег", duration=60
+        )
+
+    def test_bulk_check_in(self):
+        """
+        Тест: отметки записываются, повторная отметка не создаёт дубликат.
+        """
+        completed_at = (timezone.now() - timedelta(hours=1)).isoformat()
+        response = self.client.post(
+            "/habits/completions/",
+            [
+                {"habit": self.habit.pk},
+                {"habit": self.habit.pk, "completedAt": completed_at},
+                {"habit": self.habit.pk, "completedAt": completed_at},
+            ],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.json()), 3)
+        completions = HabitCompletion.objects.filter(habit=self.habit)
+        self.assertEqual(completions.count(), 2)
+        self.assertEqual(
+            set(completions.values_list("user", "source")),
+            {(self.user.pk, HabitCompletion.SOURCE_API)},
+        )
+
+    def test_foreign_habit_not_found(self):
+        """
+        Тест: чужую привычку отметить нельзя, ничего не записывается.
+        """
+        response = self.client.post(
+            "/habits/completions/",
+            [{"habit": self.habit.pk}, {"habit": self.other_habit.pk}],
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(HabitCompletion.objects.exists())
+
+    def test_completed_at_window(self):
+        """
+        Тест: время отметки не в будущем и не старше HABIT_COMPLETION_BACKFILL_DAYS.
+        """
+        now = timezone.now()
+        response = self.client.post(
+            "/habits/completions/",
+            [
+                {"habit": self.habit.pk, "completedAt": now.isoformat()},
+                {
+                    "habit": self.habit.pk,
+                    "completedAt": (now + timedelta(hours=1)).isoformat(),
+                },
+                {
+                    "habit": self.habit.pk,
+                    "completedAt": (now - timedelta(days=8)).isoformat(),
+                },
+            ],
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()["errors"]
+        self.assertEqual(errors[0], {})
+        self.assertIn("completedAt", errors[1])
+        self.assertIn("completedAt", errors[2])
+        self.assertFalse(HabitCompletion.objects.exists())
+
+    def test_deleted_with_habit(self):
+        """
+        Тест: отметки удаляются вместе с привычкой.
+        """
+        HabitCompletion.objects.create(
+            habit=self.habit, user=self.user, completed_at=timezone.now()
+        )
+        response = self.client.delete(f"/habits/{self.habit.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(HabitCompletion.objects.exists())
+
+
+class HabitCompletionRetentionTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(email="test@example.com")
+        self.habit = Habit.objects.create(
+            owner=self.user,
+            location="Дом",
+            time="07:00:00",
+            action="Зарядка",
+            duration=60,
+        )
+
+    def complete(self, completed_at):
+        return HabitCompletion.objects.create(
+            habit=self.habit, user=self.user, completed_at=completed_at
+        )
+
+    def test_month_helpers(self):
+        """
+        Тест: начало месяца в UTC и сдвиг на месяцы через границу года.
+        """
+        moscow_new_year = datetime(
+            2026, 1, 1, 1, tzinfo=timezone.get_default_timezone()
+        )
+        self.assertEqual(
+            month_start(moscow_new_year), datetime(2025, 12, 1, tzinfo=dt_timezone.utc)
+        )
+        month = datetime(2025, 11, 1, tzinfo=dt_timezone.utc)
+        self.assertEqual(
+            add_months(month, 2), datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        )
+        self.assertEqual(
+            add_months(month, -11), datetime(2024, 12, 1, tzinfo=dt_timezone.utc)
+        )
+
+    @override_settings(HABIT_COMPLETION_RETENTION_MONTHS=12)
+    def test_archive_expired_months(self):
+        """
+        Тест: месяцы старше срока хранения выгружаются в архив и удаляются.
+        """
+        cutoff = add_months(month_start(timezone.now()), -12)
+        old = self.complete(add_months(cutoff, -2) + timedelta(days=3))
+        self.complete(cutoff - timedelta(seconds=1))
+        kept = self.complete(cutoff)
+
+        result = archive_habit_completions()
+
+        self.assertEqual(
+            result["archived"],
+            [f"{add_months(cutoff, offset):%Y-%m}" for offset in (-2, -1)],
+        )
+        self.assertEqual(list(HabitCompletion.objects.all()), [kept])
+        name = f"archive/habit_completions/{add_months(cutoff, -2):%Y-%m}.csv.gz"
+        with default_storage.open(name) as file:
+            lines = gzip.decompress(file.read()).decode().splitlines()
+        self.assertEqual(lines[0], "id,completed_at,habit_id,user_id,source")
+        self.assertEqual(lines[1].split(",")[0], str(old.pk))
+        self.assertEqual(len(lines), 2)
+
+    @override_settings(HABIT_COMPLETION_ARCHIVE=False)
+    def test_retention_without_archive(self):
+        """
+        Тест: без архивации старые отметки только удаляются.
+        """
+        self.complete(timezone.now() - timedelta(days=3 * 365))
+        result = archive_habit_completions()
+        self.assertEqual(len(result["archived"]), 1)
+        self.assertFalse(HabitCompletion.objects.exists())
+        self.assertFalse(default_storage.exists("archive"))
+
+
+class HabitRollupTest(APITestCase):
+    def setUp(self):
+        """
+        Создаём пользователя с двумя привычками и сотрудника.
+        """
+        self.user = User.objects.create_user(
+            email="test@example.com", password="password123"
+        )
+        self.staff = User.objects.create_user(
+            email="staff@example.com", password="password123", is_staff=True
+        )
+        self.client.force_authenticate(user=self.user)
+        self.habit = Habit.objects.create(
+            owner=self.user,
+            location="Дом",
+            time="07:00:00",
+            action="Кофе",
+            is_pleasant=True,
+            duration=60,
+        )
+        self.public_habit = Habit.objects.create(
+            owner=self.user,
+            location="Парк",
+            time="08:30:00",
+            action="Бег",
+            is_public=True,
+            duration=60,
+        )
+        self.payload = {
+            "location": "Дом",
+            "time": "09:15:00",
+            "action": "Зарядка",
+            "duration": 60,
+            "frequency": 1,
+            "reward": "Кофе",
+        }
+
+    def assertNoDrift(self):
+        # Сверка возвращает число строк счётчиков, которые пришлось исправить
+        self.assertEqual(reconcile(), {"owners": 0, "minutes": 0, "counts": 0})
+
+    def test_rollups_follow_writes(self):
+        """
+        Тест: счётчики обновляются при каждом способе записи привычек.
+        """
+        self.assertNoDrift()
+
+        response = self.client.post("/habits/", self.payload, format="json")
+        created = response.json()["id"]
+        self.assertNoDrift()
+
+        response = self.client.post("/habits/bulk/", [self.payload] * 3, format="json")
+        bulk_ids = [habit["id"] for habit in response.json()]
+        self.assertNoDrift()
+
+        self.client.patch(f"/habits/{created}/", {"time": "10:00:00"}, format="json")
+        self.assertNoDrift()
+
+        self.client.patch(
+            "/habits/bulk/",
+            [{"id": pk, "time": "11:45:00"} for pk in bulk_ids],
+            format="json",
+        )
+        self.assertNoDrift()
+
+        self.client.delete(f"/habits/{created}/")
+        self.assertNoDrift()
+
+        self.client.delete("/habits/bulk/", {"ids": bulk_ids}, format="json")
+        self.assertNoDrift()
+
+        self.habit.time = "12:00:00"
+        self.habit.save()
+        self.public_habit.delete()
+        self.assertNoDrift()
+        self.assertEqual(owner_summary(self.user.pk)["habits"], 1)
+
+    def test_update_uses_locked_row(self):
+        """
+        Тест: прежние значения для счётчиков берутся из БД, а не из объекта,
+        прочитанного до параллельного изменения привычки.
+        """
+        stale = Habit.objects.get(pk=self.habit.pk)
+        self.habit.time = "10:00:00"
+        self.habit.save()
+
+        with patch("habits.views.HabitViewSet.get_object", return_value=stale):
+            response = self.client.patch(
+                f"/habits/{self.habit.pk}/", {"is_pleasant": False}, format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNoDrift()
+
+    def test_user_delete_updates_rollups(self):
+        """
+        Тест: каскадное удаление привычек пользователя обнуляет его счётчики
+        одной записью на таблицу.
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.delete(f"/users/delete/{self.user.pk}/")
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        rollup_writes = [
+            query for query in context.captured_queries if "rollup" in query["sql"]
+        ]
+        self.assertEqual(len(rollup_writes), 3)
+        self.assertEqual(owner_summary(self.user.pk)["habits"], 0)
+        self.assertEqual(global_stats()["habits"], 0)
+        # Обнулённая строка удалённого пользователя - не расхождение
+        self.assertNoDrift()
+        self.assertFalse(HabitOwnerRollup.objects.filter(owner_id=self.user.pk))
+
+    def test_reconcile_fixes_drift(self):
+        """
+        Тест: ночная сверка исправляет запись в обход счётчиков.
+        """
+        Habit.objects.filter(pk=self.habit.pk).update(is_public=True)
+
+        self.assertEqual(
+            reconcile_habit_rollups.delay().get()["fixed"],
+            {"owners": 1, "minutes": 1, "counts": 0},
+        )
+        self.assertEqual(owner_summary(self.user.pk)["public"], 2)
+        self.assertNoDrift()
+
+    def test_migration_fills_rollups(self):
+        """
+        Тест: миграция заполняет счётчики по историческим моделям.
+        """
+        migration = import_module("habits.migrations.0006_habit_rollups")
+        state = MigrationExecutor(connection).loader.project_state(
+            ("habits", "0006_habit_rollups")
+        )
+        HabitOwnerRollup.objects.all().delete()
+        HabitMinuteRollup.objects.all().delete()
+
+        migration.fill_rollups(state.apps, Mock(connection=connection))
+
+        self.assertEqual(owner_summary(self.user.pk)["habits"], 2)
+        self.assertNoDrift()
+
+    def test_migration_fills_count_rollup(self):
+        """
+        Тест: миграция заполняет распределение владельцев по счётчикам.
+        """
+        migration = import_module("habits.migrations.0007_habit_count_rollup")
+        state = MigrationExecutor(connection).loader.project_state(
+            ("habits", "0007_habit_count_rollup")
+        )
+        HabitCountRollup.objects.all().delete()
+
+        migration.fill_count_rollup(state.apps, Mock(connection=connection))
+
+        self.assertEqual(global_stats()["habits_per_owner"], {"2": 1})
+        self.assertNoDrift()
+
+    def test_summary(self):
+        """
+        Тест: сводка пользователя по его привычкам.
+        """
+        response = self.client.get("/habits/summary/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            {"habits": 2, "public": 1, "private": 1, "pleasant": 1, "useful": 1},
+        )
+
+        self.client.force_authenticate(user=self.staff)
+        self.assertEqual(self.client.get("/habits/summary/").json()["habits"], 0)
+
+    def test_stats_for_staff_only(self):
+        """
+        Тест: статистика по всем привычкам доступна только сотрудникам.
+        """
+        response = self.client.get("/habits/stats/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        Habit.objects.create(
+            owner=self.staff,
+            location="Дом",
+            time="07:00:00",
+            action="Зарядка",
+            reward="Кофе",
+            duration=60,
+        )
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get("/habits/stats/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            {
+                "habits": 3,
+                "public": 1,
+                "private": 2,
+                "pleasant": 1,
+                "useful": 2,
+                "owners": 2,
+                "habitsPerOwner": {"1": 1, "2": 1},
+                "byMinute": {"07:00": 2, "08:30": 1},
+            },
+        )
+
+
+class SingleThreadLiveServerThread(LiveServerThread):
+    """
+    Тестовый сервер, обрабатывающий запросы по одному: с SQLite в памяти
+    потоки сервера работают через одно соединение с БД, и транзакции
+    одновременных запросов пересекаются.
+    """
+
+    def _create_server(self, connections_override=None):
+        return WSGIServer(
+            (self.host, self.port), QuietWSGIRequestHandler, allow_reuse_address=False
+        )
+
+
+class LoadTestCommandTest(LiveServerTestCase):
+    server_thread_class = SingleThreadLiveServerThread
+
+    def test_mixed_scenario_report(self):
+        """
+        Тест: команда создаёт данные, входит и возвращает отчёт по эндпоинтам.
+        """
+        out = StringIO()
+        call_command(
+            "loadtest",
+            base_url=self.live_server_url,
+            users=2,
+            habits_per_user=6,
+            requests=40,
+            stdout=out,
+        )
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(User.objects.filter(email__startswith="loadtest-").count(), 2)
+        self.assertGreaterEqual(Habit.objects.count(), 12)
+        self.assertEqual(report["total"]["requests"], 40)
+        self.assertEqual(report["total"]["errors"], 0)
+        self.assertNotIn("login", report["endpoints"])
+        for endpoint in report["endpoints"].values():
+            self.assertLessEqual(
+                endpoint["latency_ms"]["p50"], endpoint["latency_ms"]["p99"]
+            )
+
+        # Повторный запуск не дублирует пользователей и привычки
+        call_command(
+            "loadtest",
+            base_url=self.live_server_url,
+            users=2,
+            habits_per_user=6,
+            requests=1,
+            scenario="public",
+            stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.filter(email__startswith="loadtest-").count(), 2)
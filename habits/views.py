@@ -1,25 +1,61 @@
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
 from drf_spectacular.utils import extend_schema
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.generics import ListAPIView
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import (
+    SAFE_METHODS,
+    AllowAny,
+    IsAdminUser,
+    IsAuthenticated,
+)
+from rest_framework.response import Response
+from rest_framework.status import (
+    HTTP_200_OK,
+    HTTP_201_CREATED,
+    HTTP_204_NO_CONTENT,
+    HTTP_400_BAD_REQUEST,
+)
 from rest_framework.viewsets import ModelViewSet
 
-from habits.models import Habit
+from config.throttling import IPRateThrottle
+from habits import rollups
+from habits.exceptions import PreconditionFailed
+from habits.filters import HabitFilter
+from habits.mixins import SPARSE_FIELDS_PARAMETERS, SparseFieldsetMixin
+from habits.models import Habit, HabitCompletion
 from habits.paginations import HabitPaginator
-from habits.serializers import HabitSerializer
+from habits.serializers import (
+    HabitBulkDestroySerializer,
+    HabitCompletionSerializer,
+    HabitSerializer,
+    HabitStatsSerializer,
+    HabitSummarySerializer,
+    HabitWriteSerializer,
+)
 
 
-class HabitViewSet(ModelViewSet):
+class HabitViewSet(SparseFieldsetMixin, ModelViewSet):
     """
     Представление для работы с привычками текущего пользователя.
+    Поддерживает фильтрацию и поиск (HabitFilter),
+    выборочную выдачу полей (?fields= / ?exclude=)
+    и оптимистичную блокировку по версии (заголовки ETag / If-Match).
     """
 
+    queryset = Habit.objects.order_by("id")
     serializer_class = HabitSerializer
     pagination_class = HabitPaginator
+    filterset_class = HabitFilter
     permission_classes = [IsAuthenticated]
 
     @extend_schema(
         description="Получить список привычек текущего пользователя",
+        parameters=SPARSE_FIELDS_PARAMETERS,
         responses={200: HabitSerializer(many=True)},
     )
     def list(self, request, *args, **kwargs):
@@ -27,7 +63,7 @@ class HabitViewSet(ModelViewSet):
 
     @extend_schema(
         description="Создать новую привычку",
-        request=HabitSerializer,
+        request=HabitWriteSerializer,
         responses={201: HabitSerializer()},
     )
     def create(self, request, *args, **kwargs):
@@ -35,59 +71,424 @@ class HabitViewSet(ModelViewSet):
 
     @extend_schema(
         description="Получить детальную информацию о привычке",
+        parameters=SPARSE_FIELDS_PARAMETERS,
         responses={200: HabitSerializer()},
     )
     def retrieve(self, request, *args, **kwargs):
-        return super().retrieve(request, *args, **kwargs)
+        return self.set_etag(super().retrieve(request, *args, **kwargs))
 
     @extend_schema(
-        description="Обновить существующую привычку",
-        request=HabitSerializer,
-        responses={200: HabitSerializer()},
+        description="Обновить существующую привычку. "
+        "Заголовок If-Match (или поле version) включает проверку версии.",
+        request=HabitWriteSerializer,
+        responses={200: HabitSerializer(), 412: None},
     )
     def update(self, request, *args, **kwargs):
-        return super().update(request, *args, **kwargs)
+        return self.set_etag(super().update(request, *args, **kwargs))
 
-    @extend_schema(description="Удалить привычку", responses={204: None})
+    @extend_schema(
+        description="Удалить привычку. "
+        "Заголовок If-Match (или поле version) включает проверку версии.",
+        responses={204: None, 412: None},
+    )
     def destroy(self, request, *args, **kwargs):
-        return super().destroy(request, *args, **kwargs)
+        """
+        Удаляет привычку одним условным запросом
+        (DELETE ... WHERE id=... AND owner=... AND NOT is_public [AND version=...]).
+        """
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if not str(pk).isdigit():
+            raise NotFound()
+
+        deleted, _ = self.get_guarded_queryset(pk).delete()
+        if not deleted:
+            self.raise_write_conflict(pk, "Вы не можете удалять публичную привычку.")
+        return Response(status=HTTP_204_NO_CONTENT)
 
     def get_queryset(self):
         """
         Возвращает привычки, принадлежащие текущему пользователю.
         """
-        return Habit.objects.filter(owner=self.request.user)
+        return super().get_queryset().filter(owner=self.request.user)
+
+    def get_serializer_class(self):
+        """
+        Для записи связанная привычка принимается идентификатором.
+        """
+        request = getattr(self, "request", None)
+        if request is not None and request.method not in SAFE_METHODS:
+            return HabitWriteSerializer
+        return super().get_serializer_class()
 
     def perform_create(self, serializer):
         """
         Устанавливает текущего пользователя как владельца привычки.
         """
-        serializer.save(owner=self.request.user)
+        # Счётчики привычек обновляются сигналом в той же транзакции
+        with transaction.atomic():
+            serializer.save(owner=self.request.user)
 
     def perform_update(self, serializer):
         """
+        Сохраняет изменения одним условным запросом
+        (UPDATE ... WHERE id=... AND owner=... AND NOT is_public [AND version=...]).
+        Если меняются поля, учтённые в счётчиках, условие проверяется
+        блокировкой строки (SELECT ... FOR UPDATE) перед UPDATE.
         Запрещает редактирование публичных привычек.
         """
-        if self.get_object().is_public:
+        instance = serializer.instance
+        if instance.is_public:
             raise PermissionDenied("Вы не можете редактировать публичную привычку.")
-        serializer.save()
 
-    def perform_destroy(self, instance):
+        values = dict(serializer.validated_data)
+        expected = self.get_expected_version()
+        tracked = not rollups.ROLLUP_FIELDS.isdisjoint(values)
+
+        # QuerySet.update не отправляет сигналы: счётчики обновляются здесь.
+        # Транзакция нужна, если меняются учтённые в них поля или новую версию
+        # нужно прочитать после UPDATE (строка заблокирована до её завершения)
+        with transaction.atomic() if tracked or expected is None else nullcontext():
+            if tracked:
+                # Прежние значения для счётчиков - из заблокированной строки:
+                # прочитанный ранее объект мог устареть
+                locked = (
+                    self.get_guarded_queryset(instance.pk)
+                    .select_for_update()
+                    .only("owner", "time", "is_public", "is_pleasant", "version")
+                    .first()
+                )
+                if locked is None:
+                    self.raise_write_conflict(
+                        instance.pk, "Вы не можете редактировать публичную привычку."
+                    )
+                previous = rollups.rollup_key(locked)
+                for attr, value in values.items():
+                    setattr(locked, attr, value)
+                self.get_queryset().filter(pk=instance.pk).update(
+                    version=locked.version + 1, **values
+                )
+                rollups.record(added=[rollups.rollup_key(locked)], removed=[previous])
+                instance.version = locked.version + 1
+            else:
+                updated = self.get_guarded_queryset(instance.pk).update(
+                    version=F("version") + 1, **values
+                )
+                if not updated:
+                    self.raise_write_conflict(
+                        instance.pk, "Вы не можете редактировать публичную привычку."
+                    )
+                if expected is None:
+                    instance.refresh_from_db(fields=["version"])
+                else:
+                    instance.version = expected + 1
+
+        for attr, value in values.items():
+            setattr(instance, attr, value)
+
+    def get_expected_version(self):
         """
-        Запрещает удаление публичных привычек.
+        Возвращает версию привычки, ожидаемую клиентом: из заголовка If-Match
+        (значение ETag) или из поля version тела запроса.
+        None означает, что проверка версии не требуется.
         """
-        if instance.is_public:
-            raise PermissionDenied("Вы не можете удалять публичную привычку.")
-        instance.delete()
+        value = self.request.headers.get("If-Match")
+        if value is None and isinstance(self.request.data, dict):
+            value = self.request.data.get("version")
+        if value is None or value == "*":
+            return None
+
+        value = str(value).strip().removeprefix("W/").strip('"')
+        if not value.isdigit():
+            raise ValidationError({"version": ["Некорректная версия привычки."]})
+        return int(value)
+
+    def get_guarded_queryset(self, pk):
+        """
+        Возвращает запрос на изменяемую привычку: своя, непубличная
+        и (если передана) с ожидаемой версией.
+        """
+        queryset = self.get_queryset().filter(pk=pk, is_public=False)
+        version = self.get_expected_version()
+        if version is not None:
+            queryset = queryset.filter(version=version)
+        return queryset
+
+    def raise_write_conflict(self, pk, public_message):
+        """
+        Определяет причину, по которой условная запись не затронула строк,
+        и выбрасывает соответствующее исключение.
+        """
+        current = self.get_queryset().filter(pk=pk).values("is_public").first()
+        if current is None:
+            raise NotFound()
+        if current["is_public"]:
+            raise PermissionDenied(public_message)
+        raise PreconditionFailed()
+
+    @staticmethod
+    def set_etag(response):
+        """
+        Добавляет к ответу заголовок ETag с версией привычки.
+        """
+        version = response.data.get("version") if response.data else None
+        if version is not None:
+            response["ETag"] = f'"{version}"'
+        return response
+
+    @staticmethod
+    def check_bulk_size(items):
+        """
+        Проверяет, что в массовом запросе передан непустой список
+        допустимого размера (HABITS_BULK_MAX_ITEMS).
+        """
+        if not isinstance(items, list) or not items:
+            raise ValidationError("Ожидается непустой список.")
+        if len(items) > settings.HABITS_BULK_MAX_ITEMS:
+            raise ValidationError(
+                f"За один запрос можно обработать не более "
+                f"{settings.HABITS_BULK_MAX_ITEMS} привычек."
+            )
+
+    @extend_schema(
+        description="Массовое создание привычек. "
+        "Ошибки валидации возвращаются для каждого элемента списка.",
+        request=HabitWriteSerializer(many=True),
+        responses={201: HabitSerializer(many=True)},
+    )
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_create(self, request, *args, **kwargs):
+        """
+        Создаёт список привычек одним запросом к БД.
+        Если хотя бы один элемент невалиден, ничего не создаётся.
+        """
+        self.check_bulk_size(request.data)
+
+        serializers = [self.get_serializer(data=item) for item in request.data]
+        errors = [
+            {} if serializer.is_valid() else serializer.errors
+            for serializer in serializers
+        ]
+        if any(errors):
+            return Response({"errors": errors}, status=HTTP_400_BAD_REQUEST)
+
+        habits = [
+            Habit(owner=request.user, **serializer.validated_data)
+            for serializer in serializers
+        ]
+        with transaction.atomic():
+            habits = Habit.objects.bulk_create(
+                habits, batch_size=settings.HABITS_BULK_BATCH_SIZE
+            )
+            rollups.record(added=map(rollups.rollup_key, habits))
+
+        return Response(
+            self.get_serializer(habits, many=True).data, status=HTTP_201_CREATED
+        )
+
+    @extend_schema(
+        description="Массовое частичное обновление привычек. "
+        "Каждый элемент должен содержать id привычки.",
+        request=HabitWriteSerializer(many=True),
+        responses={200: HabitSerializer(many=True)},
+    )
+    @bulk_create.mapping.patch
+    def bulk_update(self, request, *args, **kwargs):
+        """
+        Обновляет список привычек одним запросом к БД.
+        Публичные привычки редактировать запрещено.
+        """
+        self.check_bulk_size(request.data)
+
+        # JSON true/false - тоже int в Python, но не идентификаторы
+        ids = [
+            item.get("id") if isinstance(item, dict) else None for item in request.data
+        ]
+        ids = [
+            pk if isinstance(pk, int) and not isinstance(pk, bool) else None
+            for pk in ids
+        ]
+
+        with transaction.atomic():
+            # Связанные привычки нужны проверке и ответу: один JOIN вместо
+            # запроса на каждую привычку, блокируются только строки из запроса
+            habits = (
+                self.get_queryset()
+                .select_related("linked_action")
+                .select_for_update(of=("self",))
+                .in_bulk([pk for pk in ids if pk is not None])
+            )
+
+            public_ids = sorted(pk for pk, habit in habits.items() if habit.is_public)
+            if public_ids:
+                raise PermissionDenied(
+                    f"Вы не можете редактировать публичные привычки: {public_ids}."
+                )
+
+            serializers, errors, seen = [], [], set()
+            for pk, item in zip(ids, request.data):
+                habit = habits.get(pk)
+                if habit is not None and pk in seen:
+                    errors.append({"id": ["Привычка указана в запросе повторно."]})
+                    continue
+                seen.add(pk)
+                if habit is None:
+                    errors.append({"id": ["Привычка не найдена."]})
+                    continue
+                serializer = self.get_serializer(habit, data=item, partial=True)
+                errors.append({} if serializer.is_valid() else serializer.errors)
+                serializers.append(serializer)
+
+            if any(errors):
+                return Response({"errors": errors}, status=HTTP_400_BAD_REQUEST)
+
+            instances = [serializer.instance for serializer in serializers]
+            previous = [rollups.rollup_key(habit) for habit in instances]
+            fields = set()
+            for serializer in serializers:
+                for attr, value in serializer.validated_data.items():
+                    setattr(serializer.instance, attr, value)
+                    fields.add(attr)
+                # Строки заблокированы select_for_update, поэтому версию
+                # можно увеличить на стороне приложения
+                serializer.instance.version += 1
+
+            if fields:
+                fields.add("version")
+                Habit.objects.bulk_update(
+                    instances, fields, batch_size=settings.HABITS_BULK_BATCH_SIZE
+                )
+                rollups.record(
+                    added=map(rollups.rollup_key, instances), removed=previous
+                )
+
+        return Response(
+            self.get_serializer(instances, many=True).data, status=HTTP_200_OK
+        )
+
+    @extend_schema(
+        description="Массовое удаление привычек по списку id.",
+        request=HabitBulkDestroySerializer,
+        responses={204: None},
+    )
+    @bulk_create.mapping.delete
+    def bulk_destroy(self, request, *args, **kwargs):
+        """
+        Удаляет список привычек одним запросом к БД.
+        Публичные привычки удалять запрещено.
+        """
+        serializer = HabitBulkDestroySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data["ids"]
+        self.check_bulk_size(ids)
+
+        with transaction.atomic():
+            found = dict(
+                self.get_queryset()
+                .select_for_update()
+                .filter(id__in=ids)
+                .values_list("id", "is_public")
+            )
+
+            missing_ids = sorted(set(ids) - set(found))
+            if missing_ids:
+                raise NotFound(f"Привычки не найдены: {missing_ids}.")
+
+            public_ids = sorted(pk for pk, is_public in found.items() if is_public)
+            if public_ids:
+                raise PermissionDenied(
+                    f"Вы не можете удалять публичные привычки: {public_ids}."
+                )
+
+            # Сигналы удаления каждой привычки - одна запись счётчиков
+            with rollups.batch():
+                self.get_queryset().filter(id__in=ids).delete()
+
+        return Response(status=HTTP_204_NO_CONTENT)
+
+    @extend_schema(
+        description="Массовая отметка о выполнении привычек. "
+        "Повторная отметка привычки с тем же временем не создаёт дубликат.",
+        request=HabitCompletionSerializer(many=True),
+        responses={201: HabitCompletionSerializer(many=True)},
+    )
+    @action(detail=False, methods=["post"], url_path="completions")
+    def completions(self, request, *args, **kwargs):
+        """
+        Записывает список отметок одним запросом INSERT ... ON CONFLICT DO NOTHING.
+        Если хотя бы одна отметка невалидна, ничего не записывается.
+        """
+        self.check_bulk_size(request.data)
+
+        serializers = [HabitCompletionSerializer(data=item) for item in request.data]
+        errors = [
+            {} if serializer.is_valid() else serializer.errors
+            for serializer in serializers
+        ]
+        if any(errors):
+            return Response({"errors": errors}, status=HTTP_400_BAD_REQUEST)
+
+        items = [serializer.validated_data for serializer in serializers]
+        ids = {item["habit_id"] for item in items}
+        found = set(self.get_queryset().filter(id__in=ids).values_list("id", flat=True))
+        missing_ids = sorted(ids - found)
+        if missing_ids:
+            raise NotFound(f"Привычки не найдены: {missing_ids}.")
+
+        completions = [
+            HabitCompletion(
+                user=request.user, source=HabitCompletion.SOURCE_API, **item
+            )
+            for item in items
+        ]
+        with transaction.atomic():
+            HabitCompletion.objects.bulk_create(
+                completions,
+                batch_size=settings.HABITS_BULK_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+
+        return Response(
+            HabitCompletionSerializer(completions, many=True).data,
+            status=HTTP_201_CREATED,
+        )
+
+    @extend_schema(
+        description="Сводка по привычкам текущего пользователя "
+        "(из счётчиков, без подсчёта привычек).",
+        responses={200: HabitSummarySerializer()},
+    )
+    @action(detail=False, methods=["get"], url_path="summary")
+    def summary(self, request, *args, **kwargs):
+        return Response(
+            HabitSummarySerializer(rollups.owner_summary(request.user.pk)).data
+        )
+
+    @extend_schema(
+        description="Статистика по всем привычкам для сотрудников "
+        "(из счётчиков, без подсчёта привычек).",
+        responses={200: HabitStatsSerializer()},
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="stats",
+        permission_classes=[IsAdminUser],
+    )
+    def stats(self, request, *args, **kwargs):
+        return Response(HabitStatsSerializer(rollups.global_stats()).data)
 
 
 @extend_schema(
     description="API endpoint для просмотра публичных привычек.",
+    parameters=SPARSE_FIELDS_PARAMETERS,
     responses={200: HabitSerializer(many=True)},
 )
 #  Кастомный эндпоинт для публичных привычек
-class PublicHabitListApiView(ListAPIView):
-    queryset = Habit.objects.filter(is_public=True)
+class PublicHabitListApiView(SparseFieldsetMixin, ListAPIView):
+    queryset = Habit.objects.filter(is_public=True).order_by("id")
     serializer_class = HabitSerializer
     pagination_class = HabitPaginator
+    filterset_class = HabitFilter
     permission_classes = [AllowAny]
+    throttle_classes = (IPRateThrottle,)
+    throttle_scope = "public"
@@ -0,0 +1,64 @@
+import copy
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Локальный (в памяти процесса) кеш пользователей: {user_id: (expires_at, user)}.
+# Другие процессы не могут его сбросить, поэтому время жизни записей короткое.
+_local_users = {}
+LOCAL_CACHE_MAX_SIZE = 1024
+
+
+def user_cache_key(user_id):
+    """
+    Возвращает ключ общего кеша (Redis) для пользователя.
+    """
+    return f"auth:user:{user_id}"
+
+
+def get_cached_user(user_id):
+    """
+    Возвращает пользователя из локального кеша или общего кеша.
+    Возвращает None, если пользователя нет в кеше.
+    """
+    entry = _local_users.get(user_id)
+    if entry is not None:
+        expires_at, user = entry
+        if expires_at > time.monotonic():
+            return copy.copy(user)
+        _local_users.pop(user_id, None)
+
+    user = cache.get(user_cache_key(user_id))
+    if user is not None:
+        _set_local(user_id, user)
+    return user
+
+
+def cache_user(user):
+    """
+    Сохраняет пользователя в общий и локальный кеши.
+    """
+    cache.set(user_cache_key(user.pk), user, settings.AUTH_USER_CACHE_TTL)
+    _set_local(user.pk, user)
+
+
+def invalidate_cached_user(user_id):
+    """
+    Удаляет пользователя из кешей.
+    Вызывается при изменении и удалении пользователя (см. users.signals);
+    после QuerySet.update() по пользователям вызывать вручную.
+    """
+    _local_users.pop(user_id, None)
+    cache.delete(user_cache_key(user_id))
+
+
+def _set_local(user_id, user):
+    if settings.AUTH_USER_LOCAL_CACHE_TTL <= 0:
+        return
+    if len(_local_users) >= LOCAL_CACHE_MAX_SIZE:
+        _local_users.clear()
+    _local_users[user_id] = (
+        time.monotonic() + settings.AUTH_USER_LOCAL_CACHE_TTL,
+        copy.copy(user),
+    )
@@ -0,0 +1,326 @@
+import csv
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError
+from django.db import DatabaseError, connection, models, transaction
+from rest_framework import serializers
+
+from habits import rollups
+from habits.models import Habit
+from habits.serializers import HabitSerializer
+from users.models import User
+from users.serializers import UserSerializer
+
+
+class UserImportSerializer(UserSerializer):
+    """
+    Правила UserSerializer для импорта. Уникальность email и телефона
+    проверяется одним запросом на пачку, а не запросом на каждую строку.
+    """
+
+    email = serializers.EmailField(max_length=254)
+    password = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    id = is_active = avatar = avatar_thumbnails = None
+
+    class Meta(UserSerializer.Meta):
+        fields = ("email", "password", "tg_id", "tg_nick", "phone", "country")
+
+
+class HabitImportSerializer(HabitSerializer):
+    """
+    Правила HabitSerializer/HabitValidator для импорта.
+    Владелец указывается email, связанные привычки не импортируются.
+    """
+
+    owner_email = serializers.EmailField()
+    owner = linked_action = version = None
+
+    class Meta(HabitSerializer.Meta):
+        fields = (
+            "owner_email",
+            "location",
+            "time",
+            "action",
+            "is_pleasant",
+            "duration",
+            "frequency",
+            "reward",
+            "is_public",
+        )
+        extra_kwargs = {"frequency": {"default": 1}}
+
+
+def read_rows(path, file_format):
+    """
+    Построчно читает CSV или NDJSON, не загружая файл в память.
+    Возвращает пары (номер строки, словарь значений), пустые значения CSV отбрасываются.
+    """
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        if file_format == "csv":
+            # Номер строки с учётом заголовка
+            for line, row in enumerate(csv.DictReader(file), start=2):
+                yield line, {key: value for key, value in row.items() if value != ""}
+        else:
+            for line, text in enumerate(file, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    row = json.loads(text)
+                except ValueError as exc:
+                    yield line, exc
+                    continue
+                yield line, row
+
+
+def build_instance(model, data):
+    """
+    Создаёт несохранённый объект модели. None для NOT NULL полей
+    заменяется значением по умолчанию (как при создании через форму).
+    """
+    for name, value in data.items():
+        field = model._meta.get_field(name)
+        if value is None and not field.null:
+            data[name] = field.get_default()
+    return model(**data)
+
+
+def copy_value(field, obj):
+    """
+    Значение поля в формате CSV для COPY: NULL - \\N, остальное в кавычках.
+    """
+    value = getattr(obj, field.attname)
+    if value is None:
+        return "\\N"
+    if isinstance(field, models.JSONField):
+        value = json.dumps(value, cls=field.encoder)
+    else:
+        value = field.get_db_prep_save(value, connection)
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def copy_insert(model, objs):
+    """
+    Загружает объекты в таблицу модели через PostgreSQL COPY FROM STDIN.
+    """
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    buffer = StringIO()
+    for obj in objs:
+        buffer.write(",".join(copy_value(field, obj) for field in fields) + "\n")
+    buffer.seek(0)
+
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(
+            f"COPY {quote(model._meta.db_table)} ({columns}) "
+            f"FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer,
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        "Массовый импорт пользователей или привычек из CSV/NDJSON. "
+        "Строки проверяются правилами сериализаторов API, загрузка выполняется "
+        "пачками через COPY (PostgreSQL) или bulk_create."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=("users", "habits"))
+        parser.add_argument("path", help="путь к CSV или NDJSON файлу")
+        parser.add_argument(
+            "--format",
+            choices=("csv", "ndjson"),
+            help="формат файла (по умолчанию - по расширению)",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="процессов для хэширования паролей (0 - в текущем процессе)",
+        )
+        parser.add_argument(
+            "--report",
+            help="файл отчёта NDJSON (по умолчанию <path>.report.ndjson)",
+        )
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="не использовать COPY даже на PostgreSQL",
+        )
+        parser.add_argument(
+            "--activate",
+            action="store_true",
+            help="сразу активировать импортируемых пользователей",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.exists(path):
+            raise CommandError(f"Файл {path} не найден.")
+
+        file_format = options["format"] or (
+            "csv" if path.lower().endswith(".csv") else "ndjson"
+        )
+        self.kind = options["kind"]
+        self.activate = options["activate"]
+        self.use_copy = connection.vendor == "postgresql" and not options["no_copy"]
+        self.seen = set()  # email/телефоны, уже встреченные в файле
+        self.stats = {"processed": 0, "imported": 0, "failed": 0}
+
+        workers = options["workers"] if self.kind == "users" else 0
+        # fork: дочерние процессы наследуют настроенный Django
+        self.pool = (
+            ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"))
+            if workers and workers > 1
+            else None
+        )
+
+        report_path = options["report"] or f"{path}.report.ndjson"
+        started = time.monotonic()
+        rows = read_rows(path, file_format)
+        try:
+            with open(report_path, "w", encoding="utf-8") as self.report:
+                while batch := list(islice(rows, options["batch_size"])):
+                    self.import_batch(batch)
+                    self.stats["elapsed"] = round(time.monotonic() - started, 2)
+                    self.write_report(progress=self.stats)
+                    self.stdout.write(
+                        "Обработано {processed}, загружено {imported}, "
+                        "ошибок {failed}".format(**self.stats)
+                    )
+                self.write_report(summary=self.stats)
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+
+        style = self.style.SUCCESS if not self.stats["failed"] else self.style.WARNING
+        self.stdout.write(
+            style(
+                f"Импорт завершён: загружено {self.stats['imported']}, "
+                f"ошибок {self.stats['failed']}. Отчёт: {report_path}"
+            )
+        )
+
+    def write_report(self, **record):
+        self.report.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    def reject(self, line, errors):
+        self.stats["failed"] += 1
+        self.write_report(line=line, errors=errors)
+
+    def import_batch(self, batch):
+        """
+        Проверяет и загружает одну пачку строк.
+        """
+        self.stats["processed"] += len(batch)
+        serializer_class = (
+            UserImportSerializer if self.kind == "users" else HabitImportSerializer
+        )
+
+        valid = []
+        for line, row in batch:
+            if not isinstance(row, dict):
+                self.reject(line, {"non_field_errors": [f"Некорректная строка: {row}"]})
+                continue
+            serializer = serializer_class(data=row)
+            if serializer.is_valid():
+                valid.append((line, dict(serializer.validated_data)))
+            else:
+                self.reject(line, serializer.errors)
+
+        prepare = self.prepare_users if self.kind == "users" else self.prepare_habits
+        valid = prepare(valid)
+        if not valid:
+            return
+
+        model = User if self.kind == "users" else Habit
+        objs = [build_instance(model, data) for _, data in valid]
+        try:
+            with transaction.atomic():
+                if self.use_copy:
+                    copy_insert(model, objs)
+                else:
+                    model.objects.bulk_create(objs)
+                if model is Habit:
+                    rollups.record(added=map(rollups.rollup_key, objs))
+        except DatabaseError as exc:
+            # Конфликт с параллельной записью - вся пачка считается ошибочной
+            for line, _ in valid:
+                self.reject(line, {"non_field_errors": [str(exc).strip()]})
+            return
+        self.stats["imported"] += len(objs)
+
+    def check_unique(self, valid, field):
+        """
+        Отбрасывает строки, у которых значение field уже есть в файле или в БД.
+        """
+        values = {str(data[field]) for _, data in valid if data.get(field)}
+        existing = {
+            str(value)
+            for value in User.objects.filter(**{f"{field}__in": values}).values_list(
+                field, flat=True
+            )
+        }
+        unique = []
+        for line, data in valid:
+            value = data.get(field)
+            key = (field, str(value))
+            if value and (key in self.seen or str(value) in existing):
+                self.reject(line, {field: ["Значение уже используется."]})
+                continue
+            if value:
+                self.seen.add(key)
+            unique.append((line, data))
+        return unique
+
+    def prepare_users(self, valid):
+        """
+        Проверяет уникальность и хэширует пароли пачкой (в пуле процессов).
+        """
+        # Телефон приводится к формату хранения в БД (E.164), чтобы разные
+        # записи одного номера считались дубликатами
+        phone_field = User._meta.get_field("phone")
+        for _, data in valid:
+            data["email"] = User.objects.normalize_email(data["email"])
+            if data.get("phone"):
+                data["phone"] = phone_field.get_prep_value(data["phone"])
+        for field in ("email", "phone"):
+            valid = self.check_unique(valid, field)
+
+        passwords = [data.pop("password", None) or None for _, data in valid]
+        if self.pool is not None:
+            hashes = self.pool.map(make_password, passwords, chunksize=64)
+        else:
+            hashes = map(make_password, passwords)
+
+        for (_, data), password in zip(valid, hashes):
+            data["password"] = password
+            data["is_active"] = self.activate
+        return valid
+
+    def prepare_habits(self, valid):
+        """
+        Подставляет владельцев привычек по email (один запрос на пачку).
+        """
+        emails = {data["owner_email"] for _, data in valid}
+        owners = dict(User.objects.filter(email__in=emails).values_list("email", "id"))
+        prepared = []
+        for line, data in valid:
+            owner_id = owners.get(data.pop("owner_email"))
+            if owner_id is None:
+                self.reject(line, {"owner_email": ["Пользователь не найден."]})
+                continue
+            data["owner_id"] = owner_id
+            prepared.append((line, data))
+        return prepared
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.2 on 2026-10-19 13:14
+
+from django.db import migrations, models
+
+from config.db_operations import AddIndexConcurrentlyIfPostgres
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ("users", "0003_alter_user_managers"),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfPostgres(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("tg_id__isnull", False)),
+                fields=["tg_id"],
+                name="user_tg_id_idx",
+            ),
+        ),
+    ]
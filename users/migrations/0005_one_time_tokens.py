@@ -0,0 +1,109 @@
+# Generated by Django 4.2.2 on 2026-10-19 13:20
+
+import hashlib
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def move_user_tokens(apps, schema_editor):
+    """
+    Переносит действующие токены из User.token в таблицу одноразовых токенов.
+    Для неактивных пользователей это подтверждение email, для активных - сброс пароля.
+    """
+    User = apps.get_model("users", "User")
+    OneTimeToken = apps.get_model("users", "OneTimeToken")
+
+    # время жизни на момент миграции (см. ONE_TIME_TOKEN_LIFETIME)
+    lifetime = {
+        "email_confirm": timedelta(days=3),
+        "password_reset": timedelta(hours=1),
+    }
+    now = timezone.now()
+    tokens = []
+    for user_id, token, is_active in (
+        User.objects.exclude(token__isnull=True)
+        .exclude(token="")
+        .values_list("id", "token", "is_active")
+        .iterator()
+    ):
+        purpose = "password_reset" if is_active else "email_confirm"
+        tokens.append(
+            OneTimeToken(
+                user_id=user_id,
+                purpose=purpose,
+                token_hash=hashlib.sha256(token.encode()).hexdigest(),
+                expires_at=now + lifetime[purpose],
+            )
+        )
+    OneTimeToken.objects.bulk_create(tokens, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0004_user_tg_id_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OneTimeToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "purpose",
+                    models.CharField(
+                        choices=[
+                            ("email_confirm", "Подтверждение email"),
+                            ("password_reset", "Сброс пароля"),
+                        ],
+                        max_length=20,
+                        verbose_name="назначение",
+                    ),
+                ),
+                (
+                    "token_hash",
+                    models.CharField(
+                        max_length=64, unique=True, verbose_name="хеш токена"
+                    ),
+                ),
+                (
+                    "expires_at",
+                    models.DateTimeField(db_index=True, verbose_name="истекает"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="создан"),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="one_time_tokens",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Одноразовый токен",
+                "verbose_name_plural": "Одноразовые токены",
+            },
+        ),
+        migrations.RunPython(move_user_tokens, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="user",
+            name="token",
+        ),
+    ]
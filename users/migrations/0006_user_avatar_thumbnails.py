@@ -0,0 +1,23 @@
+# Generated by Django 4.2.2 on 2026-10-19 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0005_one_time_tokens"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="avatar_thumbnails",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                help_text="пути к миниатюрам аватара по размерам (заполняется Celery)",
+                verbose_name="миниатюры аватара",
+            ),
+        ),
+    ]
@@ -1,8 +1,11 @@
+import hashlib
 import secrets
 
+from django.conf import settings
 from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import connection, models, transaction
+from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
 
 NULLABLE = {"blank": True, "null": True}
@@ -36,7 +39,6 @@ class CustomUserManager(BaseUserManager):
 
 class User(AbstractUser):
     username = None
-    token = models.CharField(max_length=32, blank=True, null=True)
     is_active = models.BooleanField(default=False)
 
     email = models.EmailField(
@@ -47,7 +49,7 @@ class User(AbstractUser):
         **NULLABLE,
         unique=True,
         verbose_name="номер телефона",
-        help_text="укажите телефон"
+        help_text="укажите телефон",
     )
     country = models.CharField(max_length=100, verbose_name="страна", blank=True)
     tg_nick = models.CharField(
@@ -63,12 +65,18 @@ class User(AbstractUser):
         upload_to="users/avatars/",
         verbose_name="аватар",
         help_text="Загрузите аватарку",
-        **NULLABLE
+        **NULLABLE,
+    )
+    avatar_thumbnails = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="миниатюры аватара",
+        help_text="пути к миниатюрам аватара по размерам (заполняется Celery)",
     )
 
-    def generate_token(self):
-        self.token = secrets.token_hex(16)
-        self.save()
+    def generate_token(self, purpose):
+        """Выпускает одноразовый токен пользователя для указанной цели."""
+        return OneTimeToken.objects.issue(self, purpose)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
@@ -78,3 +86,124 @@ class User(AbstractUser):
     class Meta:
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
+        indexes = [
+            # поиск пользователя (и его привычек) по telegram ID в боте
+            models.Index(
+                fields=["tg_id"],
+                condition=models.Q(tg_id__isnull=False),
+                name="user_tg_id_idx",
+            ),
+        ]
+
+
+class OneTimeTokenManager(models.Manager):
+    @staticmethod
+    def hash_token(token):
+        """Возвращает хеш токена, который хранится в БД вместо самого токена."""
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def issue(self, user, purpose):
+        """
+        Создаёт одноразовый токен для пользователя и возвращает его
+        в открытом виде (для ссылки в письме).
+        Ранее выпущенные токены с той же целью удаляются.
+        """
+        token = secrets.token_urlsafe(32)
+        lifetime = settings.ONE_TIME_TOKEN_LIFETIME[purpose]
+        with transaction.atomic():
+            self.filter(user=user, purpose=purpose).delete()
+            self.create(
+                user=user,
+                purpose=purpose,
+                token_hash=self.hash_token(token),
+                expires_at=timezone.now() + lifetime,
+            )
+        return token
+
+    def active(self, token, purpose):
+        """Действующие (не истёкшие) токены с данным значением и назначением."""
+        return self.filter(
+            token_hash=self.hash_token(token),
+            purpose=purpose,
+            expires_at__gt=timezone.now(),
+        )
+
+    def consume(self, token, purpose):
+        """
+        Атомарно удаляет действующий токен и возвращает id его пользователя.
+        Возвращает None, если токен не найден, истёк или выпущен для другой цели.
+        """
+        token_hash = self.hash_token(token)
+        now = timezone.now()
+
+        # DELETE ... RETURNING поддерживают PostgreSQL и SQLite начиная с 3.35
+        if connection.vendor == "sqlite":
+            supports_delete_returning = connection.Database.sqlite_version_info >= (3, 35)
+        else:
+            supports_delete_returning = connection.vendor == "postgresql"
+        if supports_delete_returning:
+            # один запрос вместо SELECT ... FOR UPDATE и DELETE
+            table = connection.ops.quote_name(self.model._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {table} "
+                    "WHERE token_hash = %s AND purpose = %s AND expires_at > %s "
+                    "RETURNING user_id",
+                    [
+                        token_hash,
+                        purpose,
+                        connection.ops.adapt_datetimefield_value(now),
+                    ],
+                )
+                row = cursor.fetchone()
+            return row[0] if row else None
+
+        with transaction.atomic():
+            token = (
+                self.select_for_update()
+                .filter(token_hash=token_hash, purpose=purpose, expires_at__gt=now)
+                .first()
+            )
+            if token is None:
+                return None
+            token.delete()
+            return token.user_id
+
+
+class OneTimeToken(models.Model):
+    """
+    Одноразовый токен для подтверждения email и сброса пароля.
+
+    Атрибуты:
+        user (ForeignKey): Пользователь, для которого выпущен токен.
+        purpose (str): Назначение токена.
+        token_hash (str): SHA-256 хеш токена (сам токен не хранится).
+        expires_at (DateTimeField): Время истечения токена.
+        created_at (DateTimeField): Время создания токена.
+    """
+
+    EMAIL_CONFIRM = "email_confirm"
+    PASSWORD_RESET = "password_reset"
+    PURPOSE_CHOICES = (
+        (EMAIL_CONFIRM, "Подтверждение email"),
+        (PASSWORD_RESET, "Сброс пароля"),
+    )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="one_time_tokens",
+        verbose_name="пользователь",
+    )
+    purpose = models.CharField(
+        max_length=20, choices=PURPOSE_CHOICES, verbose_name="назначение"
+    )
+    token_hash = models.CharField(max_length=64, unique=True, verbose_name="хеш токена")
+    expires_at = models.DateTimeField(db_index=True, verbose_name="истекает")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="создан")
+
+    objects = OneTimeTokenManager()
+
+    class Meta:
+        verbose_name = "Одноразовый токен"
+        verbose_name_plural = "Одноразовые токены"
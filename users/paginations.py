@@ -0,0 +1,14 @@
+from rest_framework.pagination import CursorPagination
+
+
+class UserCursorPaginator(CursorPagination):
+    """
+    Keyset-пагинация списка пользователей по id:
+    каждая страница выбирается запросом WHERE id > ... LIMIT ...
+    без OFFSET и без подсчёта общего количества записей.
+    """
+
+    ordering = "id"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
@@ -1,8 +1,8 @@
-import secrets
-
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
 
-from users.models import User
+from users.models import OneTimeToken, User
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -12,7 +12,6 @@ class UserSerializer(serializers.ModelSerializer):
 
     password = serializers.CharField(write_only=True, style={"input_type": "password"})
     id = serializers.IntegerField(read_only=True)
-    token = serializers.CharField(read_only=True)
     is_active = serializers.BooleanField(read_only=True)
     tg_id = serializers.IntegerField(allow_null=True, required=False)
     tg_nick = serializers.CharField(allow_null=True, required=False)
@@ -22,6 +21,37 @@ class UserSerializer(serializers.ModelSerializer):
         required=False,  # Необязательно для заполнения
         use_url=True,  # Возвращать полный URL (если настроен MEDIA_URL)
     )
+    avatar_thumbnails = serializers.SerializerMethodField()
+
+    def validate_avatar(self, value):
+        """
+        Ограничивает размер файла и количество пикселей аватара.
+        """
+        if value is None:
+            return value
+        if value.size > settings.AVATAR_MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(
+                f"Размер файла не должен превышать "
+                f"{settings.AVATAR_MAX_UPLOAD_SIZE // 1024} КБ."
+            )
+        # Django ImageField сохраняет в файле открытое изображение Pillow
+        image = getattr(value, "image", None)
+        pixels = image.width * image.height if image is not None else 0
+        if pixels > settings.AVATAR_MAX_PIXELS:
+            raise serializers.ValidationError("Слишком большое разрешение изображения.")
+        return value
+
+    def get_avatar_thumbnails(self, user) -> dict:
+        """
+        URL миниатюр аватара по размерам (пусто, пока миниатюры не готовы).
+        """
+        storage = User._meta.get_field("avatar").storage
+        request = self.context.get("request")
+        urls = {}
+        for label, name in user.avatar_thumbnails.items():
+            url = storage.url(name)
+            urls[label] = request.build_absolute_uri(url) if request else url
+        return urls
 
     def create(self, validated_data):
         email = validated_data.get("email")
@@ -36,7 +66,6 @@ class UserSerializer(serializers.ModelSerializer):
         user = User(**validated_data)
         user.set_password(password)
         user.is_active = False  # Пользователь не активен до подтверждения email
-        user.token = secrets.token_hex(16)  # Генерация токена для подтверждения email
         user.save()
         return user
 
@@ -51,11 +80,21 @@ class UserSerializer(serializers.ModelSerializer):
             "phone",  # Не обязателен для заполнения
             "country",  # Не обязателен для заполнения
             "avatar",  # Не обязателен для заполнения
+            "avatar_thumbnails",  # Только для чтения
             "is_active",  # Только для чтения
-            "token",  # Только для чтения
         )
 
 
+class UserListSerializer(serializers.ModelSerializer):
+    """
+    Облегчённый сериализатор для списка пользователей (без аватара и пароля).
+    """
+
+    class Meta:
+        model = User
+        fields = ("id", "email", "tg_nick", "country", "is_active")
+
+
 class PasswordResetSerializer(serializers.Serializer):
     """
     Сериализатор для отправки email на сброс пароля
@@ -66,15 +105,14 @@ class PasswordResetSerializer(serializers.Serializer):
     email = serializers.EmailField()
 
     def validate_email(self, value):
-        if not User.objects.filter(email=value).exists():
+        self.user = User.objects.filter(email=value).first()
+        if self.user is None:
             raise serializers.ValidationError("Пользователь с таким email не найден.")
         return value
 
     def save(self):
-        user = User.objects.get(email=self.validated_data["email"])
-        user.token = secrets.token_hex(16)  # Генерация токена для сброса пароля
-        user.save()
-        return user
+        """Возвращает токен для сброса пароля (в открытом виде)."""
+        return OneTimeToken.objects.issue(self.user, OneTimeToken.PASSWORD_RESET)
 
 
 class PasswordResetConfirmSerializer(serializers.Serializer):
@@ -88,12 +126,22 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
     new_password = serializers.CharField(write_only=True)
 
     def validate(self, data):
-        if not User.objects.filter(token=data["token"]).exists():
+        # Проверка не удаляет токен: он расходуется только в save()
+        if not OneTimeToken.objects.active(
+            data["token"], OneTimeToken.PASSWORD_RESET
+        ).exists():
             raise serializers.ValidationError("Неверный токен.")
         return data
 
     def save(self):
-        user = User.objects.get(token=self.validated_data["token"])
-        user.set_password(self.validated_data["new_password"])
-        user.token = None  # Удаляем токен после успешного сброса пароля
-        user.save()
+        # Токен удаляется в одной транзакции со сменой пароля,
+        # поэтому использовать его можно только один раз
+        with transaction.atomic():
+            user_id = OneTimeToken.objects.consume(
+                self.validated_data["token"], OneTimeToken.PASSWORD_RESET
+            )
+            if user_id is None:
+                raise serializers.ValidationError("Неверный токен.")
+            user = User.objects.get(pk=user_id)
+            user.set_password(self.validated_data["new_password"])
+            user.save()
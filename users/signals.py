@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.cache import invalidate_cached_user
+from users.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """
+    Сбрасывает кеш аутентификации при изменении или удалении пользователя
+    (в том числе при смене is_active и пароля).
+    """
+    invalidate_cached_user(instance.pk)
@@ -0,0 +1,262 @@
+import hashlib
+import json
+import logging
+from io import BytesIO
+from smtplib import (
+    SMTPConnectError,
+    SMTPException,
+    SMTPRecipientsRefused,
+    SMTPResponseException,
+    SMTPServerDisconnected,
+)
+
+from celery import shared_task
+from celery.utils.time import get_exponential_backoff_interval
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisCache
+from django.core.files.base import ContentFile
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils.timezone import now
+from PIL import Image, ImageOps
+from redis.exceptions import RedisError
+
+from users.cache import invalidate_cached_user
+from users.models import OneTimeToken, User
+
+logger = logging.getLogger(__name__)
+
+
+def queue_email(subject, message, recipient_list):
+    """
+    Ставит письмо в очередь на отправку после фиксации текущей транзакции,
+    чтобы ответ API не ждал SMTP-сервер.
+    """
+    email = {"subject": subject, "message": message, "recipient_list": recipient_list}
+    transaction.on_commit(lambda: push_email(email))
+
+
+def get_outbox_client():
+    """
+    Клиент Redis кэша по умолчанию, в котором копятся письма
+    (список EMAIL_OUTBOX_KEY), или None, если кэш хранится не в Redis.
+    """
+    if not isinstance(cache, RedisCache):
+        return None
+    return cache._cache.get_client(write=True)
+
+
+def push_email(email):
+    """
+    Добавляет письмо в список неотправленных: задача flush_email_outbox
+    отправляет их пачками. Без Redis письмо отправляется отдельной задачей.
+    """
+    client = get_outbox_client()
+    if client is not None:
+        try:
+            client.rpush(cache.make_key(settings.EMAIL_OUTBOX_KEY), json.dumps(email))
+            return
+        except RedisError as exc:
+            logger.warning("Не удалось добавить письмо в очередь Redis: %r", exc)
+    send_email_batch.delay([email])
+
+
+@shared_task
+def flush_email_outbox():
+    """
+    Периодическая задача (beat): забирает накопленные письма пачками
+    по EMAIL_BATCH_SIZE и ставит каждую пачку в задачу send_email_batch.
+    Пачка читается и удаляется из списка атомарно (MULTI/EXEC).
+    """
+    client = get_outbox_client()
+    if client is None:
+        return {"status": "Пропущено", "batches": 0}
+
+    key = cache.make_key(settings.EMAIL_OUTBOX_KEY)
+    size = settings.EMAIL_BATCH_SIZE
+    batches = 0
+    while True:
+        with client.pipeline() as pipeline:
+            pipeline.lrange(key, 0, size - 1)
+            pipeline.ltrim(key, size, -1)
+            items, _ = pipeline.execute()
+        if items:
+            try:
+                send_email_batch.delay([json.loads(item) for item in items])
+            except Exception:
+                # Пачка не попала в брокер - возвращаем её в начало списка
+                client.lpush(key, *reversed(items))
+                raise
+            batches += 1
+        if len(items) < size:
+            break
+
+    return {"status": "Завершено", "batches": batches}
+
+
+def is_transient_smtp_error(exc):
+    """
+    Ошибки соединения и временные ответы сервера (4xx) имеет смысл повторить,
+    постоянные отказы (5xx) и прочие ошибки SMTP - нет.
+    """
+    if isinstance(exc, (SMTPConnectError, SMTPServerDisconnected)):
+        return True
+    if isinstance(exc, SMTPRecipientsRefused):
+        return any(400 <= code < 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    # OSError, не относящийся к SMTP: сеть, таймаут, отказ в соединении
+    return not isinstance(exc, SMTPException)
+
+
+@shared_task(bind=True, max_retries=5)
+def send_email_batch(self, emails):
+    """
+    Отправляет пачку писем через одно SMTP-соединение.
+    Письма, не отправленные из-за временной ошибки, повторяются
+    с экспоненциальной задержкой; постоянные отказы не повторяются.
+
+    Arguments:
+        emails (list): словари с ключами subject, message, recipient_list
+    """
+    failed = []
+    rejected = 0
+    try:
+        with get_connection(fail_silently=False) as connection:
+            for email in emails:
+                try:
+                    EmailMessage(
+                        subject=email["subject"],
+                        body=email["message"],
+                        from_email=settings.DEFAULT_FROM_EMAIL,
+                        to=email["recipient_list"],
+                        connection=connection,
+                    ).send()
+                except OSError as exc:
+                    if is_transient_smtp_error(exc):
+                        logger.warning(
+                            "Ошибка при отправке email %s: %r",
+                            email["recipient_list"],
+                            exc,
+                        )
+                        failed.append(email)
+                    else:
+                        logger.error(
+                            "Письмо %s отклонено: %r", email["recipient_list"], exc
+                        )
+                        rejected += 1
+    except OSError as exc:
+        # Не удалось установить соединение - повторяем всю пачку
+        if not is_transient_smtp_error(exc):
+            logger.error("SMTP-сервер отклонил соединение: %r", exc)
+            raise
+        logger.warning("Ошибка соединения с SMTP-сервером: %r", exc)
+        failed = emails
+
+    if failed:
+        raise self.retry(
+            args=[failed],
+            countdown=get_exponential_backoff_interval(
+                factor=settings.EMAIL_RETRY_BACKOFF,
+                retries=self.request.retries,
+                maximum=settings.EMAIL_RETRY_BACKOFF_MAX,
+                full_jitter=True,
+            ),
+        )
+
+    return {"status": "Успешно", "sent": len(emails) - rejected, "rejected": rejected}
+
+
+@shared_task
+def purge_expired_tokens():
+    """
+    Периодическая задача для удаления истёкших одноразовых токенов.
+    Удаляет токены пачками, чтобы не держать долгие блокировки.
+    """
+    batch_size = settings.ONE_TIME_TOKEN_PURGE_BATCH_SIZE
+    expired = OneTimeToken.objects.filter(expires_at__lte=now())
+
+    total = 0
+    while True:
+        ids = list(expired.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            break
+        deleted, _ = OneTimeToken.objects.filter(id__in=ids).delete()
+        total += deleted
+
+    return {"status": "Завершено", "deleted": total}
+
+
+def queue_avatar_thumbnails(user):
+    """
+    Ставит генерацию миниатюр аватара в очередь после фиксации транзакции.
+    """
+    user_id, avatar_name = user.pk, user.avatar.name
+    transaction.on_commit(lambda: make_avatar_thumbnails.delay(user_id, avatar_name))
+
+
+@shared_task
+def make_avatar_thumbnails(user_id, avatar_name):
+    """
+    Генерирует квадратные JPEG-миниатюры аватара (AVATAR_THUMBNAIL_SIZES).
+
+    - Поворот по EXIF применяется к пикселям, сами метаданные (включая
+      геолокацию) в миниатюры не попадают - изображение перекодируется.
+    - Результат записывается, только если аватар не сменился за время работы.
+    - Прежние миниатюры пользователя удаляются.
+
+    Arguments:
+        user_id (int): ID пользователя
+        avatar_name (str): путь к исходному файлу аватара в хранилище
+    """
+    storage = User._meta.get_field("avatar").storage
+    max_size = max(settings.AVATAR_THUMBNAIL_SIZES.values())
+
+    try:
+        with storage.open(avatar_name) as file:
+            image = Image.open(file)
+            if image.width * image.height > settings.AVATAR_MAX_PIXELS:
+                return {"status": "Пропущено", "reason": "слишком большое изображение"}
+            # Для JPEG декодируем сразу в уменьшенном масштабе
+            image.draft("RGB", (max_size, max_size))
+            image = ImageOps.exif_transpose(image).convert("RGB")
+    except FileNotFoundError:
+        return {"status": "Пропущено", "reason": "файл не найден"}
+
+    directory = f"users/avatars/thumbs/{user_id}"
+    digest = hashlib.sha256(avatar_name.encode()).hexdigest()[:12]
+    thumbnails = {}
+    for label, size in settings.AVATAR_THUMBNAIL_SIZES.items():
+        buffer = BytesIO()
+        thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        thumbnail.save(
+            buffer,
+            "JPEG",
+            quality=settings.AVATAR_THUMBNAIL_QUALITY,
+            optimize=True,
+        )
+        name = f"{directory}/{label}-{digest}.jpg"
+        if storage.exists(name):
+            storage.delete(name)
+        thumbnails[label] = storage.save(name, ContentFile(buffer.getvalue()))
+
+    updated = User.objects.filter(pk=user_id, avatar=avatar_name).update(
+        avatar_thumbnails=thumbnails
+    )
+    if not updated:
+        # Аватар сменили или пользователя удалили - миниатюры не нужны
+        for name in thumbnails.values():
+            storage.delete(name)
+        return {"status": "Пропущено", "reason": "аватар изменился"}
+
+    # update() не отправляет post_save, поэтому сбрасываем кэш вручную
+    invalidate_cached_user(user_id)
+
+    _, files = storage.listdir(directory)
+    for filename in files:
+        name = f"{directory}/{filename}"
+        if name not in thumbnails.values():
+            storage.delete(name)
+
+    return {"status": "Успешно", "thumbnails": thumbnails}
@@ -1,10 +1,35 @@
 import json
-
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from smtplib import SMTPDataError, SMTPRecipientsRefused, SMTPResponseException
+from unittest.mock import MagicMock, patch
+
+from celery.exceptions import Retry
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from redis.exceptions import RedisError
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from users.models import User
+from config.throttling import get_rejection_counts
+from habits.models import Habit
+from users.cache import get_cached_user
+from users.models import OneTimeToken, User
+from users.serializers import PasswordResetConfirmSerializer
+from users.tasks import (
+    flush_email_outbox,
+    make_avatar_thumbnails,
+    purge_expired_tokens,
+    queue_email,
+    send_email_batch,
+)
 
 #  тестирование методов модели User
 
@@ -35,10 +60,16 @@ class UserModelTest(TestCase):
 
     def test_generate_token(self):
         """
-        Тест генерации токена.
+        Тест генерации токена: в БД хранится только хеш.
         """
-        self.user.generate_token()
-        self.assertIsNotNone(self.user.token)
+        token = self.user.generate_token(OneTimeToken.PASSWORD_RESET)
+        self.assertIsNotNone(token)
+        self.assertFalse(OneTimeToken.objects.filter(token_hash=token).exists())
+        self.assertTrue(
+            OneTimeToken.objects.filter(
+                user=self.user, token_hash=OneTimeToken.objects.hash_token(token)
+            ).exists()
+        )
 
 
 #  Тесты для регистрации пользователя
@@ -69,6 +100,25 @@ class UserRegisterAPIViewTest(APITestCase):
             user.is_active
         )  # Пользователь должен быть неактивным по умолчанию
 
+    def test_register_email_sent_after_commit(self):
+        """
+        Тест: письмо с подтверждением ставится в очередь только после фиксации транзакции.
+        """
+        data = {"email": "newuser@example.com", "password": "newpassword123"}
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(
+                "/users/register/",
+                data=json.dumps(data),
+                content_type="application/json",
+            )
+            self.assertEqual(len(mail.outbox), 0)
+
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["newuser@example.com"])
+
 
 #  Тесты для подтверждения email
 
@@ -76,14 +126,15 @@ class UserRegisterAPIViewTest(APITestCase):
 class EmailVerificationAPIViewTest(APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(
-            email="test@example.com", password="password123", token="testtoken"
+            email="test@example.com", password="password123"
         )
+        self.token = self.user.generate_token(OneTimeToken.EMAIL_CONFIRM)
 
     def test_email_verification(self):
         """
         Тест подтверждения email.
         """
-        response = self.client.get(f"/users/email-confirm/{self.user.token}/")
+        response = self.client.get(f"/users/email-confirm/{self.token}/")
 
         # Проверяем статус ответа
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -91,7 +142,25 @@ class EmailVerificationAPIViewTest(APITestCase):
         # Проверяем, что пользователь активирован и токен удалён
         self.user.refresh_from_db()
         self.assertTrue(self.user.is_active)
-        self.assertIsNone(self.user.token)
+        self.assertFalse(OneTimeToken.objects.filter(user=self.user).exists())
+
+    def test_email_verification_token_used_once(self):
+        """
+        Тест: повторное использование токена невозможно.
+        """
+        self.client.get(f"/users/email-confirm/{self.token}/")
+        response = self.client.get(f"/users/email-confirm/{self.token}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_email_verification_expired_token(self):
+        """
+        Тест: истёкший токен не принимается.
+        """
+        OneTimeToken.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.client.get(f"/users/email-confirm/{self.token}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
 
 
 #  Тесты для сброса пароля
@@ -107,33 +176,39 @@ class PasswordResetAPIViewTest(APITestCase):
         """
         data = {"email": "test@example.com"}
 
-        response = self.client.post(
-            "/users/password-reset/",
-            data=json.dumps(data),
-            content_type="application/json",
-        )
+        # Письмо ставится в очередь после фиксации транзакции
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/users/password-reset/",
+                data=json.dumps(data),
+                content_type="application/json",
+            )
         # Проверяем статус ответа
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        # Проверяем, что токен сгенерирован
-        self.user.refresh_from_db()
-        self.assertIsNotNone(self.user.token)
+        # Проверяем, что токен сгенерирован и отправлен на почту
+        token = OneTimeToken.objects.get(
+            user=self.user, purpose=OneTimeToken.PASSWORD_RESET
+        )
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertNotIn(token.token_hash, mail.outbox[0].body)
 
 
 class PasswordResetConfirmAPIViewTest(APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(
-            email="test@example.com", password="password123", token="testtoken"
+            email="test@example.com", password="password123"
         )
+        self.token = self.user.generate_token(OneTimeToken.PASSWORD_RESET)
 
     def test_password_reset_confirm(self):
         """
         Тест подтверждения сброса пароля.
         """
-        data = {"token": "testtoken", "new_password": "newpassword123"}
+        data = {"token": self.token, "new_password": "newpassword123"}
 
         response = self.client.post(
-            f"/users/password-reset-confirm/{self.user.token}/",
+            f"/users/password-reset-confirm/{self.token}/",
             data=json.dumps(data),
             content_type="application/json",
         )
@@ -145,3 +220,676 @@ class PasswordResetConfirmAPIViewTest(APITestCase):
         self.user.refresh_from_db()
 
         self.assertTrue(self.user.check_password("newpassword123"))
+        self.assertFalse(OneTimeToken.objects.filter(user=self.user).exists())
+
+    def test_password_reset_confirm_invalid_data_keeps_token(self):
+        """
+        Тест: токен не расходуется, если запрос не прошёл проверку.
+        """
+        response = self.client.post(
+            f"/users/password-reset-confirm/{self.token}/",
+            data=json.dumps({}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(OneTimeToken.objects.filter(user=self.user).exists())
+
+        serializer = PasswordResetConfirmSerializer(
+            data={"token": self.token, "new_password": "newpassword123"}
+        )
+        self.assertTrue(serializer.is_valid())
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("newpassword123"))
+        self.assertFalse(OneTimeToken.objects.filter(user=self.user).exists())
+
+    def test_password_reset_confirm_wrong_purpose(self):
+        """
+        Тест: токен подтверждения email не подходит для сброса пароля.
+        """
+        token = self.user.generate_token(OneTimeToken.EMAIL_CONFIRM)
+        response = self.client.post(
+            f"/users/password-reset-confirm/{token}/",
+            data=json.dumps({"new_password": "newpassword123"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SendEmailBatchTaskTest(TestCase):
+    def setUp(self):
+        self.emails = [
+            {"subject": "Тема", "message": "Текст", "recipient_list": [f"u{i}@ex.com"]}
+            for i in range(3)
+        ]
+
+    def test_send_email_batch(self):
+        """
+        Тест отправки пачки писем через одно соединение.
+        """
+        with patch("users.tasks.get_connection", wraps=mail.get_connection) as mocked:
+            result = send_email_batch(self.emails)
+        mocked.assert_called_once()
+        self.assertEqual(result["sent"], 3)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_retry_only_failed_emails(self):
+        """
+        Тест: повторно отправляются только письма, которые не удалось отправить.
+        """
+        original_send = mail.EmailMessage.send
+
+        def send(message, *args, **kwargs):
+            if message.to == ["u1@ex.com"]:
+                raise SMTPResponseException(451, b"temporary failure")
+            return original_send(message, *args, **kwargs)
+
+        with (
+            patch("users.tasks.EmailMessage.send", autospec=True, side_effect=send),
+            patch.object(send_email_batch, "retry", side_effect=Retry) as retry,
+            self.assertLogs("users.tasks", "WARNING"),
+        ):
+            with self.assertRaises(Retry):
+                send_email_batch(self.emails)
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(retry.call_args.kwargs["args"], [[self.emails[1]]])
+
+    def test_permanent_errors_not_retried(self):
+        """
+        Тест: постоянные отказы (5xx) записываются в лог и не повторяются.
+        """
+        original_send = mail.EmailMessage.send
+
+        def send(message, *args, **kwargs):
+            if message.to == ["u0@ex.com"]:
+                raise SMTPRecipientsRefused({"u0@ex.com": (550, b"no such user")})
+            if message.to == ["u1@ex.com"]:
+                raise SMTPDataError(554, b"rejected")
+            return original_send(message, *args, **kwargs)
+
+        with (
+            patch("users.tasks.EmailMessage.send", autospec=True, side_effect=send),
+            patch.object(send_email_batch, "retry", side_effect=Retry) as retry,
+            self.assertLogs("users.tasks", "ERROR") as logs,
+        ):
+            result = send_email_batch(self.emails)
+
+        retry.assert_not_called()
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual((result["sent"], result["rejected"]), (1, 2))
+
+    def test_connection_error_retries_batch(self):
+        """
+        Тест: при ошибке соединения повторяется вся пачка.
+        """
+        with (
+            patch("users.tasks.get_connection", side_effect=ConnectionRefusedError),
+            patch.object(send_email_batch, "retry", side_effect=Retry) as retry,
+            self.assertLogs("users.tasks", "WARNING"),
+        ):
+            with self.assertRaises(Retry):
+                send_email_batch(self.emails)
+
+        self.assertEqual(retry.call_args.kwargs["args"], [self.emails])
+
+
+class EmailOutboxTest(TestCase):
+    def setUp(self):
+        self.emails = [
+            {"subject": "Тема", "message": "Текст", "recipient_list": [f"u{i}@ex.com"]}
+            for i in range(3)
+        ]
+        self.client = MagicMock()
+        patcher = patch("users.tasks.get_outbox_client", return_value=self.client)
+        self.get_client = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_queue_email_pushes_to_outbox(self):
+        """
+        Тест: письмо добавляется в список Redis после фиксации транзакции.
+        """
+        with (
+            patch("users.tasks.send_email_batch.delay") as delay,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            queue_email(**self.emails[0])
+            self.client.rpush.assert_not_called()
+
+        key, value = self.client.rpush.call_args.args
+        self.assertEqual(json.loads(value), self.emails[0])
+        delay.assert_not_called()
+
+    def test_queue_email_without_redis(self):
+        """
+        Тест: без Redis (или при его ошибке) письмо отправляется сразу.
+        """
+        self.get_client.return_value = None
+        with self.captureOnCommitCallbacks(execute=True):
+            queue_email(**self.emails[0])
+        self.assertEqual(len(mail.outbox), 1)
+
+        self.get_client.return_value = self.client
+        self.client.rpush.side_effect = RedisError
+        with (
+            self.assertLogs("users.tasks", "WARNING"),
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            queue_email(**self.emails[1])
+        self.assertEqual(len(mail.outbox), 2)
+
+    @override_settings(EMAIL_BATCH_SIZE=2)
+    def test_flush_sends_batches(self):
+        """
+        Тест: накопленные письма отправляются пачками по EMAIL_BATCH_SIZE.
+        """
+        items = [json.dumps(email) for email in self.emails]
+        pipeline = self.client.pipeline.return_value.__enter__.return_value
+        pipeline.execute.side_effect = [[items[:2], True], [items[2:], True]]
+
+        with patch("users.tasks.send_email_batch.delay") as delay:
+            result = flush_email_outbox()
+
+        self.assertEqual(result["batches"], 2)
+        self.assertEqual(
+            [call.args[0] for call in delay.call_args_list],
+            [self.emails[:2], self.emails[2:]],
+        )
+
+    def test_flush_returns_batch_on_broker_error(self):
+        """
+        Тест: пачка, не попавшая в брокер, возвращается в начало списка.
+        """
+        items = [json.dumps(email) for email in self.emails]
+        pipeline = self.client.pipeline.return_value.__enter__.return_value
+        pipeline.execute.return_value = [items, True]
+
+        with (
+            patch("users.tasks.send_email_batch.delay", side_effect=ConnectionError),
+            self.assertRaises(ConnectionError),
+        ):
+            flush_email_outbox()
+
+        self.assertEqual(self.client.lpush.call_args.args[1:], tuple(reversed(items)))
+
+
+class PurgeExpiredTokensTaskTest(TestCase):
+    def test_purge_expired_tokens(self):
+        """
+        Тест удаления истёкших токенов пачками.
+        """
+        user = User.objects.create_user(
+            email="test@example.com", password="password123"
+        )
+        user.generate_token(OneTimeToken.EMAIL_CONFIRM)
+        user.generate_token(OneTimeToken.PASSWORD_RESET)
+        OneTimeToken.objects.filter(purpose=OneTimeToken.EMAIL_CONFIRM).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        with self.settings(ONE_TIME_TOKEN_PURGE_BATCH_SIZE=1):
+            result = purge_expired_tokens()
+
+        self.assertEqual(result["deleted"], 1)
+        self.assertEqual(
+            list(OneTimeToken.objects.values_list("purpose", flat=True)),
+            [OneTimeToken.PASSWORD_RESET],
+        )
+
+
+#  Тесты для кеширующей JWT-аутентификации
+
+
+class CachedJWTAuthenticationTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="password123", is_active=True
+        )
+        response = self.client.post(
+            "/users/login/",
+            data=json.dumps({"email": "test@example.com", "password": "password123"}),
+            content_type="application/json",
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def test_user_query_skipped_when_cached(self):
+        """
+        Тест: повторный запрос не загружает пользователя из БД.
+        """
+        response = self.client.get(f"/users/{self.user.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(get_cached_user(self.user.id))
+
+        # Остаётся только запрос самого представления
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/users/{self.user.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cache_invalidated_on_deactivation(self):
+        """
+        Тест: после деактивации пользователя токен перестаёт работать.
+        """
+        self.client.get(f"/users/{self.user.id}/")
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(get_cached_user(self.user.id))
+
+        response = self.client.get(f"/users/{self.user.id}/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cache_invalidated_on_delete(self):
+        """
+        Тест: после удаления пользователя токен перестаёт работать.
+        """
+        response = self.client.delete(f"/users/delete/{self.user.id}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response = self.client.get("/users/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+#  Тесты для списка и выгрузки пользователей
+
+
+class UserListAPIViewTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="user0@example.com", password="password123", is_active=True
+        )
+        User.objects.bulk_create(
+            User(email=f"user{index}@example.com", password="!")
+            for index in range(1, 5)
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_user_list_cursor_pagination(self):
+        """
+        Тест: список отдаётся страницами с курсором на следующую страницу.
+        """
+        response = self.client.get("/users/", {"page_size": 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertNotIn("count", response.data)
+        self.assertIsNotNone(response.data["next"])
+
+        response = self.client.get(response.data["next"])
+        emails = [item["email"] for item in response.data["results"]]
+        self.assertEqual(emails, ["user3@example.com", "user4@example.com"])
+        self.assertIsNone(response.data["next"])
+
+    def test_user_list_lean_fields(self):
+        """
+        Тест: в списке нет тяжёлых и закрытых полей.
+        """
+        response = self.client.get("/users/")
+        item = response.data["results"][0]
+        self.assertNotIn("avatar", item)
+        self.assertNotIn("password", item)
+
+
+class UserExportAPIViewTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password="adminpassword"
+        )
+        User.objects.bulk_create(
+            User(email=f"user{index}@example.com", password="!") for index in range(5)
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def test_export_forbidden_for_regular_user(self):
+        """
+        Тест: выгрузка доступна только администраторам.
+        """
+        user = User.objects.get(email="user0@example.com")
+        self.client.force_authenticate(user=user)
+        response = self.client.get("/users/export/csv/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @patch("django.conf.settings.USERS_EXPORT_CHUNK_SIZE", 2)
+    def test_export_csv(self):
+        """
+        Тест: CSV выгружается потоком со всеми пользователями.
+        """
+        response = self.client.get("/users/export/csv/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:2], ["id", "email"])
+        self.assertEqual(len(lines), User.objects.count() + 1)
+
+    @patch("django.conf.settings.USERS_EXPORT_CHUNK_SIZE", 2)
+    def test_export_ndjson(self):
+        """
+        Тест: NDJSON содержит по одному объекту на строку.
+        """
+        response = self.client.get("/users/export/ndjson/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        emails = [json.loads(line)["email"] for line in lines]
+        self.assertEqual(
+            emails, list(User.objects.values_list("email", flat=True).order_by("id"))
+        )
+
+    def test_export_unknown_format(self):
+        """
+        Тест: неизвестный формат выгрузки.
+        """
+        response = self.client.get("/users/export/xml/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+#  Тесты для миниатюр аватара
+
+
+def make_jpeg(width=400, height=200, orientation=None):
+    """
+    Создаёт JPEG с EXIF (ориентация и геолокация) для загрузки.
+    """
+    exif = Image.Exif()
+    exif[0x0110] = "Test Camera"  # Model
+    exif[0x8825] = {1: "N"}  # GPSInfo
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), "red").save(buffer, "JPEG", exif=exif)
+    return SimpleUploadedFile("avatar.jpg", buffer.getvalue(), "image/jpeg")
+
+
+class AvatarThumbnailsTest(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            email="test@example.com", password="password123", is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def upload_avatar(self, avatar):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.patch(
+                f"/users/update/{self.user.id}/",
+                {"avatar": avatar},
+                format="multipart",
+            )
+
+    def test_thumbnails_generated_without_exif(self):
+        """
+        Тест: после загрузки генерируются миниатюры без EXIF с учётом поворота.
+        """
+        response = self.upload_avatar(make_jpeg(orientation=6))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.user.refresh_from_db()
+        self.assertEqual(set(self.user.avatar_thumbnails), {"small", "medium"})
+        with self.user.avatar.storage.open(self.user.avatar_thumbnails["small"]) as f:
+            thumbnail = Image.open(f)
+            thumbnail.load()
+        self.assertEqual(thumbnail.size, (64, 64))
+        self.assertEqual(len(thumbnail.getexif()), 0)
+
+        response = self.client.get(f"/users/{self.user.id}/")
+        self.assertTrue(
+            response.data["avatar_thumbnails"]["medium"].startswith(
+                "http://testserver/media/users/avatars/thumbs/"
+            )
+        )
+
+    def test_old_thumbnails_removed(self):
+        """
+        Тест: при смене аватара прежние миниатюры удаляются.
+        """
+        self.upload_avatar(make_jpeg())
+        self.user.refresh_from_db()
+        old_thumbnails = self.user.avatar_thumbnails
+
+        self.upload_avatar(make_jpeg(width=100, height=300))
+        self.user.refresh_from_db()
+        storage = self.user.avatar.storage
+        self.assertNotEqual(self.user.avatar_thumbnails, old_thumbnails)
+        for name in old_thumbnails.values():
+            self.assertFalse(storage.exists(name))
+
+    @override_settings(AVATAR_MAX_UPLOAD_SIZE=100)
+    def test_avatar_too_large(self):
+        """
+        Тест: слишком большой файл отклоняется.
+        """
+        response = self.upload_avatar(make_jpeg())
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.avatar)
+
+    def test_thumbnails_skipped_when_avatar_changed(self):
+        """
+        Тест: задача не записывает миниатюры, если аватар успел смениться.
+        """
+        self.user.avatar = make_jpeg()
+        self.user.save()
+
+        result = make_avatar_thumbnails(self.user.id, "users/avatars/other.jpg")
+        self.assertEqual(result["status"], "Пропущено")
+
+        self.user.avatar = make_jpeg()
+        self.user.save()
+        stale_name = self.user.avatar.name
+        self.user.avatar = make_jpeg()
+        self.user.save()
+
+        result = make_avatar_thumbnails(self.user.id, stale_name)
+        self.assertEqual(result["status"], "Пропущено")
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar_thumbnails, {})
+
+
+#  Тесты для ограничения частоты запросов
+
+
+@override_settings(
+    THROTTLE_RATES={
+        "login": "5/min",
+        "login_account": "2/min",
+        "password_reset": "1/hour",
+    }
+)
+class AuthThrottleTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(
+            email="test@example.com", password="password123", is_active=True
+        )
+
+    def login(self, email, ip="10.0.0.1"):
+        return self.client.post(
+            "/users/login/",
+            data=json.dumps({"email": email, "password": "wrong"}),
+            content_type="application/json",
+            HTTP_X_FORWARDED_FOR=ip,
+        )
+
+    def test_login_throttled_per_account(self):
+        """
+        Тест: попытки входа в одну учётную запись ограничены даже с разных IP.
+        """
+        self.assertEqual(self.login("test@example.com", "10.0.0.1").status_code, 401)
+        self.assertEqual(self.login("TEST@example.com", "10.0.0.2").status_code, 401)
+
+        response = self.login("test@example.com", "10.0.0.3")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        # Другая учётная запись не затронута
+        self.assertEqual(self.login("other@example.com", "10.0.0.3").status_code, 401)
+
+    def test_login_throttled_per_ip(self):
+        """
+        Тест: попытки входа с одного IP ограничены для любых учётных записей.
+        """
+        for index in range(5):
+            self.assertEqual(self.login(f"user{index}@example.com").status_code, 401)
+
+        response = self.login("user5@example.com")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_rejected_requests_counted(self):
+        """
+        Тест: отклонённые запросы учитываются в счётчиках по scope.
+        """
+        for _ in range(2):
+            response = self.client.post(
+                "/users/password-reset/", {"email": "test@example.com"}, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        self.assertEqual(
+            get_rejection_counts(["password_reset", "login"]),
+            {"password_reset": 1, "login": 0},
+        )
+
+    def test_limit_released_after_window(self):
+        """
+        Тест: после истечения окна клиент снова может выполнять запросы.
+        """
+        with patch("config.throttling.time.time", return_value=1000.0):
+            self.login("test@example.com")
+            self.login("test@example.com")
+            for _ in range(3):
+                self.assertEqual(self.login("test@example.com").status_code, 429)
+
+        # Через два окна счётчики предыдущих окон не учитываются
+        with patch("config.throttling.time.time", return_value=1000.0 + 120):
+            self.assertEqual(self.login("test@example.com").status_code, 401)
+
+
+#  Тесты для команды импорта
+
+
+class ImportDataCommandTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        User.objects.create_user(email="exists@example.com", password="password123")
+
+    def write(self, name, content):
+        path = f"{self.tmpdir}/{name}"
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        return path
+
+    def import_data(self, kind, path, *args):
+        report = f"{self.tmpdir}/report.ndjson"
+        call_command(
+            "import_data",
+            kind,
+            path,
+            "--workers=0",
+            f"--report={report}",
+            *args,
+            stdout=StringIO(),
+        )
+        with open(report, encoding="utf-8") as file:
+            return [json.loads(line) for line in file]
+
+    def test_import_users_csv(self):
+        """
+        Тест: пользователи загружаются пачками, ошибочные строки попадают в отчёт.
+        """
+        path = self.write(
+            "users.csv",
+            "email,password,tg_id,country\n"
+            "new1@Example.com,secret123,1,RU\n"
+            "new2@example.com,,,\n"
+            "bad-email,secret123,,\n"
+            "exists@example.com,secret123,,\n"
+            "new1@example.com,secret123,,\n"
+            "new3@example.com,secret123,not-a-number,\n",
+        )
+        report = self.import_data("users", path, "--batch-size=2")
+
+        summary = report[-1]["summary"]
+        self.assertEqual((summary["imported"], summary["failed"]), (2, 4))
+        self.assertEqual(
+            sorted(record["line"] for record in report if "line" in record),
+            [4, 5, 6, 7],
+        )
+        self.assertEqual(len([record for record in report if "progress" in record]), 3)
+
+        user = User.objects.get(email="new1@example.com")
+        self.assertTrue(user.check_password("secret123"))
+        self.assertFalse(user.is_active)
+        self.assertFalse(
+            User.objects.get(email="new2@example.com").has_usable_password()
+        )
+
+    def test_import_users_duplicate_phone(self):
+        """
+        Тест: разные записи одного телефона считаются дубликатами.
+        """
+        User.objects.create_user(
+            email="phone@example.com", password="password123", phone="+79000000001"
+        )
+        path = self.write(
+            "users.csv",
+            "email,phone\n"
+            "new1@example.com,+7 900 000-00-00\n"
+            "new2@example.com,+79000000000\n"
+            "new3@example.com,+7 (900) 000-00-01\n",
+        )
+        report = self.import_data("users", path)
+
+        summary = report[-1]["summary"]
+        self.assertEqual((summary["imported"], summary["failed"]), (1, 2))
+        self.assertEqual(
+            sorted(record["line"] for record in report if "line" in record), [3, 4]
+        )
+        self.assertEqual(
+            str(User.objects.get(email="new1@example.com").phone), "+79000000000"
+        )
+
+    def test_import_habits_ndjson(self):
+        """
+        Тест: привычки проверяются HabitValidator, владелец ищется по email.
+        """
+        rows = [
+            {
+                "owner_email": "exists@example.com",
+                "location": "Дом",
+                "time": "07:00",
+                "action": "Бег",
+                "duration": 60,
+            },
+            {
+                "owner_email": "exists@example.com",
+                "location": "Дом",
+                "time": "07:00",
+                "action": "Бег",
+                "duration": 600,
+            },
+            {
+                "owner_email": "missing@example.com",
+                "location": "Дом",
+                "time": "07:00",
+                "action": "Бег",
+                "duration": 60,
+            },
+        ]
+        path = self.write(
+            "habits.ndjson",
+            "\n".join(json.dumps(row) for row in rows) + "\nnot json\n",
+        )
+        report = self.import_data("habits", path)
+
+        errors = {
+            record["line"]: record["errors"] for record in report if "line" in record
+        }
+        self.assertEqual(set(errors), {2, 3, 4})
+        self.assertIn("owner_email", errors[3])
+
+        habit = Habit.objects.get()
+        self.assertEqual(habit.owner.email, "exists@example.com")
+        self.assertEqual(habit.frequency, 1)
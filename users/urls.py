@@ -1,13 +1,15 @@
 from django.urls import path
 from rest_framework.permissions import AllowAny
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
 
 from users.apps import UsersConfig
 from users.views import (
     EmailVerificationAPIView,
+    LoginAPIView,
     PasswordResetAPIView,
     PasswordResetConfirmAPIView,
     UserDestroyAPIView,
+    UserExportAPIView,
     UserListAPIView,
     UserRegisterAPIView,
     UserRetrieveAPIView,
@@ -31,14 +33,11 @@ urlpatterns = [
         name="password_reset_confirm",
     ),
     path("", UserListAPIView.as_view(), name="user-list"),
+    path("export/<str:file_format>/", UserExportAPIView.as_view(), name="user-export"),
     path("<int:pk>/", UserRetrieveAPIView.as_view(), name="user-retrieve"),
     path("update/<int:pk>/", UserUpdateAPIView.as_view(), name="user-update"),
     path("delete/<int:pk>/", UserDestroyAPIView.as_view(), name="user-delete"),
-    path(
-        "login/",
-        TokenObtainPairView.as_view(permission_classes=(AllowAny,)),
-        name="login",
-    ),
+    path("login/", LoginAPIView.as_view(), name="login"),
     path(
         "token/refresh/",
         TokenRefreshView.as_view(permission_classes=(AllowAny,)),
@@ -1,21 +1,38 @@
-import secrets
-
-from django.core.mail import send_mail
-from django.shortcuts import get_object_or_404
+import csv
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from djangorestframework_camel_case.parser import (
+    CamelCaseJSONParser,
+    CamelCaseMultiPartParser,
+)
 from rest_framework import generics
+from rest_framework.exceptions import NotFound
 from rest_framework.generics import CreateAPIView
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND
 from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenObtainPairView
 
-from config.settings import DEFAULT_FROM_EMAIL
-from users.models import User
+from config.throttling import AUTH_THROTTLE_CLASSES
+from habits import rollups
+from users.cache import invalidate_cached_user
+from users.models import OneTimeToken, User
+from users.paginations import UserCursorPaginator
 from users.serializers import (
     PasswordResetConfirmSerializer,
     PasswordResetSerializer,
+    UserListSerializer,
     UserSerializer,
 )
+from users.tasks import queue_avatar_thumbnails, queue_email
+
+# Представления, принимающие аватар, поддерживают multipart/form-data.
+# Крупные файлы Django пишет во временный файл (FILE_UPLOAD_MAX_MEMORY_SIZE)
+AVATAR_UPLOAD_PARSERS = (CamelCaseJSONParser, CamelCaseMultiPartParser)
 
 
 class UserCreateAPIView(CreateAPIView):
@@ -29,11 +46,91 @@ class UserCreateAPIView(CreateAPIView):
 
 
 class UserListAPIView(generics.ListAPIView):
-    serializer_class = UserSerializer
-    queryset = User.objects.all()
+    """
+    Список пользователей с keyset-пагинацией.
+    Из БД выбираются только колонки, нужные облегчённому сериализатору.
+    """
+
+    serializer_class = UserListSerializer
+    queryset = User.objects.only(*UserListSerializer.Meta.fields)
+    pagination_class = UserCursorPaginator
     permission_classes = [IsAuthenticated]
 
 
+class _Echo:
+    """Псевдо-файл для csv.writer: возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class UserExportAPIView(APIView):
+    """
+    Потоковая выгрузка пользователей для администраторов.
+
+    - Формат задаётся в URL: csv или ndjson.
+    - Таблица читается пачками по id (USERS_EXPORT_CHUNK_SIZE),
+      поэтому расход памяти не зависит от количества пользователей.
+    """
+
+    permission_classes = (IsAdminUser,)
+    export_fields = (
+        "id",
+        "email",
+        "phone",
+        "country",
+        "tg_nick",
+        "tg_id",
+        "is_active",
+        "date_joined",
+    )
+    content_types = {
+        "csv": "text/csv; charset=utf-8",
+        "ndjson": "application/x-ndjson",
+    }
+
+    def get(self, request, file_format):
+        if file_format not in self.content_types:
+            raise NotFound(f"Неизвестный формат выгрузки: {file_format}.")
+
+        rows = getattr(self, f"iter_{file_format}")()
+        response = StreamingHttpResponse(
+            rows, content_type=self.content_types[file_format]
+        )
+        response["Content-Disposition"] = f'attachment; filename="users.{file_format}"'
+        return response
+
+    def iter_rows(self):
+        """
+        Читает пользователей пачками по возрастанию id (keyset, без OFFSET).
+        """
+        chunk_size = settings.USERS_EXPORT_CHUNK_SIZE
+        last_id = 0
+        while True:
+            chunk = list(
+                User.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list(*self.export_fields)[:chunk_size]
+            )
+            yield from chunk
+            if len(chunk) < chunk_size:
+                break
+            last_id = chunk[-1][0]
+
+    def iter_csv(self):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(self.export_fields)
+        for row in self.iter_rows():
+            yield writer.writerow(
+                ["" if value is None else str(value) for value in row]
+            )
+
+    def iter_ndjson(self):
+        for row in self.iter_rows():
+            data = dict(zip(self.export_fields, row))
+            yield json.dumps(data, default=str, ensure_ascii=False) + "\n"
+
+
 class UserRetrieveAPIView(generics.RetrieveAPIView):
     serializer_class = UserSerializer
     queryset = User.objects.all()
@@ -45,6 +142,17 @@ class UserUpdateAPIView(generics.UpdateAPIView):
     serializer_class = UserSerializer
     queryset = User.objects.all()
     permission_classes = [IsAuthenticated]
+    parser_classes = AVATAR_UPLOAD_PARSERS
+
+    def perform_update(self, serializer):
+        if "avatar" not in serializer.validated_data:
+            serializer.save()
+            return
+
+        # Миниатюры прежнего аватара больше не актуальны
+        user = serializer.save(avatar_thumbnails={})
+        if user.avatar:
+            queue_avatar_thumbnails(user)
 
 
 class UserDestroyAPIView(generics.DestroyAPIView):
@@ -52,6 +160,25 @@ class UserDestroyAPIView(generics.DestroyAPIView):
     queryset = User.objects.all()
     permission_classes = [IsAuthenticated]
 
+    def perform_destroy(self, instance):
+        """
+        Удаляет пользователя с привычками; счётчики привычек
+        обновляются одной записью на всё каскадное удаление.
+        """
+        with transaction.atomic(), rollups.batch():
+            instance.delete()
+
+
+class LoginAPIView(TokenObtainPairView):
+    """
+    Получение пары JWT-токенов по email и паролю
+    с ограничением частоты попыток по IP и по учётной записи.
+    """
+
+    permission_classes = (AllowAny,)
+    throttle_classes = AUTH_THROTTLE_CLASSES
+    throttle_scope = "login"
+
 
 class UserRegisterAPIView(CreateAPIView):
     """
@@ -60,27 +187,33 @@ class UserRegisterAPIView(CreateAPIView):
     - Принимает email, пароль и другие данные пользователя.
     - Создаёт нового пользователя с полем `is_active=False`.
     - Генерирует токен для подтверждения email.
-    - Отправляет письмо со ссылкой для подтверждения email.
+    - Ставит в очередь генерацию миниатюр аватара, если он загружен.
+    - Ставит в очередь письмо со ссылкой для подтверждения email
+      (отправляется Celery после фиксации транзакции).
     """
 
     serializer_class = UserSerializer
     permission_classes = (AllowAny,)
+    parser_classes = AVATAR_UPLOAD_PARSERS
+    throttle_classes = AUTH_THROTTLE_CLASSES
+    throttle_scope = "register"
 
+    @transaction.atomic
     def perform_create(self, serializer):
         user = serializer.save()
+        if user.avatar:
+            queue_avatar_thumbnails(user)
 
         # Генерация токена
-        user.token = secrets.token_hex(16)
-        user.save()
+        token = OneTimeToken.objects.issue(user, OneTimeToken.EMAIL_CONFIRM)
 
         # Отправка письма с подтверждением email
         host = self.request.get_host()
-        url = f"http://{host}/users/email-confirm/{user.token}/"
+        url = f"http://{host}/users/email-confirm/{token}/"
 
-        send_mail(
+        queue_email(
             subject="Подтверждение почты",
             message=f"Привет! Перейдите по ссылке для подтверждения почты: {url}",
-            from_email=DEFAULT_FROM_EMAIL,
             recipient_list=[user.email],
         )
 
@@ -92,25 +225,26 @@ class PasswordResetAPIView(APIView):
     - Принимает email пользователя.
     - Проверяет существование пользователя с указанным email.
     - Генерирует токен для сброса пароля.
-    - Отправляет письмо с инструкцией по сбросу пароля.
+    - Ставит в очередь письмо с инструкцией по сбросу пароля.
     """
 
     permission_classes = (AllowAny,)
+    throttle_classes = AUTH_THROTTLE_CLASSES
+    throttle_scope = "password_reset"
 
     def post(self, request):
         serializer = PasswordResetSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        user = serializer.save()  # Генерация токена
+        token = serializer.save()  # Генерация токена
 
         host = request.get_host()
-        url = f"http://{host}/users/password-reset-confirm/{user.token}/"
+        url = f"http://{host}/users/password-reset-confirm/{token}/"
 
-        send_mail(
+        queue_email(
             subject="Сброс пароля",
             message=f"Для сброса пароля перейдите по ссылке: {url}",
-            from_email=DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
+            recipient_list=[serializer.validated_data["email"]],
         )
 
         return Response(
@@ -144,24 +278,23 @@ class EmailVerificationAPIView(APIView):
     Представление для подтверждения email.
 
     - Принимает токен из ссылки, отправленной на email пользователя.
+    - Удаляет токен (одним запросом DELETE ... RETURNING).
     - Активирует пользователя (`is_active=True`) при успешной проверке токена.
-    - Удаляет токен после успешного подтверждения.
     """
 
     permission_classes = (AllowAny,)
 
     def get(self, request, token):
-        # Пытаемся найти пользователя с указанным токеном
-        user = get_object_or_404(User, token=token)
+        user_id = OneTimeToken.objects.consume(token, OneTimeToken.EMAIL_CONFIRM)
+        if user_id is None:
+            return Response({"error": "Неверный токен."}, status=HTTP_404_NOT_FOUND)
 
-        if user.is_active:
+        # Активируем пользователя, если он ещё не активен
+        if not User.objects.filter(pk=user_id, is_active=False).update(is_active=True):
             return Response(
                 {"error": "Email уже подтверждён."}, status=HTTP_400_BAD_REQUEST
             )
-
-        # Активируем пользователя и удаляем токен
-        user.is_active = True
-        user.token = None
-        user.save()
+        # update() не вызывает сигналы, поэтому кеш сбрасываем вручную
+        invalidate_cached_user(user_id)
 
         return Response({"message": "Email успешно подтверждён!"}, status=HTTP_200_OK)